@@ -0,0 +1,70 @@
+import time
+import uuid
+import asyncio
+from typing import Any
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+from strava_agent.graph import _estimate_tokens
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for the Ollama chat model.
+
+    Each question in `scripts` maps to a list of tool-call steps followed by a
+    final answer. On every call the model looks up the latest user question,
+    counts the tool-call steps already taken in this turn (including any made
+    by the fast-path router) and emits the next step, or the answer once the
+    steps are used up. Unknown questions are answered directly.
+
+    Generation time is simulated as `prompt_token_delay` seconds per prompt
+    token plus `token_delay` seconds per output token, so the benchmark shows
+    how graph changes move the number and size of LLM calls.
+    """
+
+    scripts: dict = {}
+    token_delay: float = 0.0
+    prompt_token_delay: float = 0.0
+    calls: list = []
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _next_message(self, messages) -> AIMessage:
+        turn_start = max((i for i, m in enumerate(messages) if isinstance(m, HumanMessage)), default=0)
+        question = str(messages[turn_start].content)
+        script = self.scripts.get(question, {})
+        steps = script.get("steps", [])
+        taken = sum(1 for m in messages[turn_start:] if isinstance(m, AIMessage) and m.tool_calls)
+
+        if taken < len(steps):
+            tool_calls = [
+                {"name": call["name"], "args": call["args"], "id": f"call_{uuid.uuid4().hex[:8]}", "type": "tool_call"}
+                for call in steps[taken]
+            ]
+            return AIMessage(content="", tool_calls=tool_calls)
+        return AIMessage(content=script.get("answer", "I can't answer that from your Strava data."))
+
+    def _plan(self, messages):
+        """Pick the reply and record the call; returns (message, simulated seconds)."""
+        message = self._next_message(messages)
+        prompt_tokens = sum(_estimate_tokens(m) for m in messages)
+        output_tokens = _estimate_tokens(message)
+        self.calls.append({"prompt_tokens": prompt_tokens, "output_tokens": output_tokens})
+        return message, prompt_tokens * self.prompt_token_delay + output_tokens * self.token_delay
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        message, delay = self._plan(messages)
+        time.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        message, delay = self._plan(messages)
+        await asyncio.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=message)])
@@ -0,0 +1,243 @@
+"""
+Benchmark the agent loop end to end without Strava or Ollama.
+
+Replays a recorded Strava session through a local HTTP stub and drives
+build_graph with a scripted chat model, then reports turn latency (p50/p95),
+tool and LLM call counts, prompt sizes and DuckDB write times for the
+question corpus in questions.json.
+
+Usage: uv run python -m benchmarks.run [--repeat 5] [--token-delay 0.02] [--json out.json]
+"""
+import os
+import re
+import math
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import tempfile
+from collections import defaultdict
+from functools import wraps
+from pathlib import Path
+from unittest.mock import patch
+
+from .strava_stub import StravaStub
+from .fake_llm import ScriptedChatModel
+
+QUESTIONS = Path(__file__).parent / "questions.json"
+_STRAVA_API = "https://www.strava.com/api/v3"
+_PLACEHOLDER = re.compile(r"\{(start|end):([^}]+)\}")
+
+
+def percentile(values, q: float) -> float:
+    """Nearest-rank percentile; 0 for an empty list."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def load_scripts(path=QUESTIONS) -> dict:
+    """Load the corpus, resolving "{start:<period>}"/"{end:<period>}" placeholders to dates."""
+    from strava_agent.periods import resolve_period
+
+    def _resolve(value):
+        if not isinstance(value, str):
+            return value
+
+        def _date(match):
+            start, end, _ = resolve_period(match.group(2))
+            return (start if match.group(1) == "start" else end).isoformat()
+
+        return _PLACEHOLDER.sub(_date, value)
+
+    scripts = {}
+    for entry in json.loads(Path(path).read_text()):
+        steps = [[{"name": c["name"], "args": {k: _resolve(v) for k, v in c["args"].items()}} for c in step]
+                 for step in entry["steps"]]
+        scripts[entry["question"]] = {"steps": steps, "answer": entry["answer"]}
+    return scripts
+
+
+class WriteTimer:
+    """Wraps DuckDB write methods and records their wall time per operation."""
+
+    def __init__(self):
+        self.samples = defaultdict(list)
+        self._patches = []
+
+    def wrap(self, owner, name: str, label: str):
+        original = getattr(owner, name)
+        samples = self.samples[label]
+
+        @wraps(original)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                samples.append(time.perf_counter() - started)
+
+        self._patches.append(patch.object(owner, name, timed))
+
+    def __enter__(self):
+        for p in self._patches:
+            p.start()
+        return self
+
+    def __exit__(self, *exc):
+        for p in reversed(self._patches):
+            p.stop()
+
+
+def _redirect_sessions(stub_url: str):
+    """Patch the shared requests session so stravalib's sync calls also go to the stub."""
+    from strava_agent import client as client_module
+
+    class _StubAdapter(client_module._ScheduledAdapter):
+        def send(self, request, **kwargs):
+            request.url = request.url.replace(_STRAVA_API, stub_url, 1)
+            return super().send(request, **kwargs)
+
+    original = client_module._build_session
+
+    def build():
+        session = original()
+        session.mount(client_module._API_PREFIX, _StubAdapter(client_module.get_scheduler()))
+        return session
+
+    return patch.object(client_module, "_build_session", build)
+
+
+async def run_corpus(app, model, logger, scripts, repeat: int):
+    """Ask every question `repeat` times, each in a new thread; returns per-turn records."""
+    from langchain_core.messages import HumanMessage, SystemMessage, ToolMessage
+    from strava_agent.prompts import get_system_prompt
+
+    records = []
+    for iteration in range(repeat):
+        for question in scripts:
+            thread_id = str(uuid.uuid4())
+            config = {"configurable": {"thread_id": thread_id}}
+            logger.log(thread_id, "user", question)
+            calls_before = len(model.calls)
+            started = time.perf_counter()
+            state = await app.ainvoke({"messages": [SystemMessage(content=get_system_prompt()), HumanMessage(content=question)]}, config)
+            elapsed = time.perf_counter() - started
+            logger.log(thread_id, "assistant", state["messages"][-1].content)
+            llm_calls = model.calls[calls_before:]
+            records.append({
+                "question": question,
+                "iteration": iteration,
+                "latency": elapsed,
+                "tool_calls": sum(isinstance(m, ToolMessage) for m in state["messages"]),
+                "llm_calls": len(llm_calls),
+                "prompt_tokens": max((c["prompt_tokens"] for c in llm_calls), default=0),
+            })
+    return records
+
+
+def summarize(records, writes) -> dict:
+    by_question = defaultdict(list)
+    for record in records:
+        by_question[record["question"]].append(record)
+
+    latencies = [r["latency"] for r in records]
+    return {
+        "turns": len(records),
+        "latency_p50": percentile(latencies, 50),
+        "latency_p95": percentile(latencies, 95),
+        "questions": {
+            question: {
+                "latency_p50": percentile([r["latency"] for r in rs], 50),
+                "latency_p95": percentile([r["latency"] for r in rs], 95),
+                "tool_calls": rs[-1]["tool_calls"],
+                "llm_calls": rs[-1]["llm_calls"],
+                "max_prompt_tokens": max(r["prompt_tokens"] for r in rs),
+            }
+            for question, rs in by_question.items()
+        },
+        "duckdb_writes": {
+            label: {
+                "count": len(samples),
+                "total_ms": sum(samples) * 1000,
+                "p50_ms": percentile(samples, 50) * 1000,
+                "p95_ms": percentile(samples, 95) * 1000,
+            }
+            for label, samples in writes.samples.items() if samples
+        },
+    }
+
+
+def print_report(summary: dict):
+    print(f"Turns: {summary['turns']}  p50 {summary['latency_p50'] * 1000:.0f} ms  p95 {summary['latency_p95'] * 1000:.0f} ms")
+    print()
+    print(f"{'question':<58} {'p50 ms':>8} {'p95 ms':>8} {'tools':>6} {'llm':>4} {'prompt tok':>10}")
+    for question, q in summary["questions"].items():
+        print(f"{question[:58]:<58} {q['latency_p50'] * 1000:>8.0f} {q['latency_p95'] * 1000:>8.0f} "
+              f"{q['tool_calls']:>6} {q['llm_calls']:>4} {q['max_prompt_tokens']:>10}")
+    print()
+    print(f"{'duckdb write':<28} {'count':>6} {'total ms':>9} {'p50 ms':>7} {'p95 ms':>7}")
+    for label, w in summary["duckdb_writes"].items():
+        print(f"{label:<28} {w['count']:>6} {w['total_ms']:>9.1f} {w['p50_ms']:>7.2f} {w['p95_ms']:>7.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5, help="Times each question is asked (the first pass syncs cold)")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Simulated seconds per generated token")
+    parser.add_argument("--prompt-token-delay", type=float, default=0.0002, help="Simulated seconds per prompt token")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated Strava round trip in seconds")
+    parser.add_argument("--no-fast-path", action="store_true", help="Disable the deterministic router")
+    parser.add_argument("--questions", default=str(QUESTIONS), help="Question corpus (JSON)")
+    parser.add_argument("--json", help="Also write the summary to this file")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp, StravaStub(latency=args.latency) as stub:
+        os.environ.update({
+            "DUCKDB_PATH": str(Path(tmp) / "bench.duckdb"),
+            "STRAVA_ACCESS_TOKEN": "bench",
+            "STRAVA_API_URL": stub.url,
+        })
+
+        from strava_agent.client import reset_client
+        from strava_agent.graph import build_graph
+        from strava_agent.checkpoint import DuckDBSaver
+        from strava_agent.store import ActivityStore
+        from strava_agent.logger import BufferedWriter, InteractionLogger
+        from strava_agent.tools import get_athlete_stats, get_activities_in_range, get_activity_information, get_activities_details, aggregate_activities, get_top_activities, analyze_streams, get_personal_records, get_training_trends
+
+        scripts = load_scripts(args.questions)
+        model = ScriptedChatModel(scripts=scripts, token_delay=args.token_delay, prompt_token_delay=args.prompt_token_delay)
+        tools = [get_athlete_stats, get_activities_in_range, get_activity_information, get_activities_details, aggregate_activities, get_top_activities, analyze_streams, get_personal_records, get_training_trends]
+
+        writes = WriteTimer()
+        writes.wrap(ActivityStore, "upsert", "activity_store.upsert")
+        writes.wrap(ActivityStore, "mark_synced", "activity_store.mark_synced")
+        writes.wrap(DuckDBSaver, "put", "checkpoint.put")
+        writes.wrap(DuckDBSaver, "put_writes", "checkpoint.put_writes")
+        writes.wrap(BufferedWriter, "_write", "buffered_writer.batch")
+
+        reset_client()
+        with writes, _redirect_sessions(stub.url):
+            checkpointer = DuckDBSaver()
+            logger = InteractionLogger()
+            app = build_graph(model, tools=tools, checkpointer=checkpointer, fast_path=not args.no_fast_path)
+            records = asyncio.run(run_corpus(app, model, logger, scripts, args.repeat))
+            logger.close()
+            checkpointer.close()
+        reset_client()
+
+        summary = summarize(records, writes)
+        summary["strava_requests"] = len(stub.requests)
+
+    print_report(summary)
+    print(f"\nStrava requests served by the stub: {summary['strava_requests']}")
+    if args.json:
+        Path(args.json).write_text(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
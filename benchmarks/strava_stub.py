@@ -0,0 +1,147 @@
+import json
+import re
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs
+
+RECORDING = Path(__file__).parent / "fixtures" / "strava_recording.json"
+
+_DATE_FIELDS = ("start_date", "start_date_local")
+_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def _shift(activity: dict, days: int) -> dict:
+    shifted = dict(activity)
+    for field in _DATE_FIELDS:
+        value = datetime.strptime(activity[field], _FORMAT) + timedelta(days=days)
+        shifted[field] = value.strftime(_FORMAT)
+    return shifted
+
+
+def _epoch(value: str) -> int:
+    return int(datetime.strptime(value, _FORMAT).replace(tzinfo=timezone.utc).timestamp())
+
+
+def _streams(activity: dict, interval: int = 5) -> dict:
+    """Synthesize 5-second streams consistent with an activity summary (seeded by its id)."""
+    rng = random.Random(activity["id"])
+    samples = max(2, activity["moving_time"] // interval)
+    speed = activity["average_speed"]
+    time_s, distance, heartrate, altitude, velocity = [], [], [], [], []
+    covered, elevation = 0.0, 100.0
+    for i in range(samples):
+        current = max(0.1, speed * rng.uniform(0.85, 1.15))
+        covered += current * interval
+        elevation += rng.uniform(-1.5, 1.5)
+        time_s.append(i * interval)
+        distance.append(round(min(covered, activity["distance"]), 1))
+        heartrate.append(int(135 + 25 * (current / speed - 1) * 4 + rng.uniform(-8, 8)))
+        altitude.append(round(elevation, 1))
+        velocity.append(round(current, 2))
+    data = {"time": time_s, "distance": distance, "heartrate": heartrate, "altitude": altitude, "velocity_smooth": velocity}
+    return {key: {"data": values, "series_type": "distance", "original_size": samples, "resolution": "high"}
+            for key, values in data.items()}
+
+
+class StravaStub:
+    """
+    Local HTTP server that replays a recorded Strava API session.
+
+    Serves /api/v3/athlete, /athlete/activities (with after/before/page/per_page),
+    /activities/{id}, /activities/{id}/streams (synthesized from the summary)
+    and /athletes/{id}/stats from a JSON recording. Activity dates are shifted
+    so the recording ends yesterday, which keeps relative questions like "last
+    week" meaningful. `latency` seconds are added to every response to stand
+    in for the network round trip.
+    """
+
+    def __init__(self, recording=RECORDING, latency: float = 0.05, today: date = None):
+        data = json.loads(Path(recording).read_text())
+        today = today or date.today()
+        days = (today - timedelta(days=1) - date.fromisoformat(data["recorded_at"])).days
+        self.athlete = data["athlete"]
+        self.stats = data["stats"]
+        self.activities = [_shift(a, days) for a in data["activities"]]
+        self.by_id = {a["id"]: a for a in self.activities}
+        self.latency = latency
+        self.requests = []
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v3"
+
+    def start(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stub.requests.append(self.path)
+                time.sleep(stub.latency)
+                status, body = stub.respond(self.path)
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.send_header("X-RateLimit-Limit", "600,30000")
+                self.send_header("X-RateLimit-Usage", "1,1")
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="strava-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def respond(self, raw_path: str):
+        """Return (status, JSON body) for a request path with its query string."""
+        parsed = urlparse(raw_path)
+        path = parsed.path.removeprefix("/api/v3")
+        query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+
+        if path == "/athlete":
+            return 200, self.athlete
+        if path == "/athlete/activities":
+            return 200, self._list(query)
+        if match := re.fullmatch(r"/activities/(\d+)", path):
+            activity = self.by_id.get(int(match.group(1)))
+            if activity is None:
+                return 404, {"message": "Record Not Found"}
+            return 200, {**activity, "resource_state": 3, "description": None, "calories": 0.0}
+        if match := re.fullmatch(r"/activities/(\d+)/streams", path):
+            activity = self.by_id.get(int(match.group(1)))
+            if activity is None:
+                return 404, {"message": "Record Not Found"}
+            return 200, _streams(activity)
+        if re.fullmatch(r"/athletes/\d+/stats", path):
+            return 200, self.stats
+        return 404, {"message": "Resource Not Found"}
+
+    def _list(self, query):
+        after = int(query.get("after", 0))
+        before = int(query.get("before", 2 ** 62))
+        per_page = int(query.get("per_page", 30))
+        page = int(query.get("page", 1))
+        matching = [a for a in self.activities if after < _epoch(a["start_date"]) < before]
+        return matching[(page - 1) * per_page:page * per_page]
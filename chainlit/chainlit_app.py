@@ -1,15 +1,21 @@
 import os
 import time
+import asyncio
 
 from dotenv import load_dotenv
 import chainlit as cl
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
+from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, AIMessageChunk, ToolMessage, RemoveMessage
 
 from strava_agent.graph import build_graph
 from strava_agent.llm import get_llm
-from strava_agent.tools import get_athlete_stats, get_activities_in_range, get_activity_information
+from strava_agent.tools import get_athlete_stats, get_activities_in_range, get_activity_information, get_activities_details, aggregate_activities, get_top_activities, analyze_streams, get_personal_records, get_training_trends
 from strava_agent.prompts import get_system_prompt
 from strava_agent.logger import InteractionLogger
+from strava_agent.checkpoint import get_checkpointer
+from strava_agent.cache import get_answer_cache
+from strava_agent.store import get_store
+from strava_agent.telemetry import serve_metrics
+from strava_agent.webhook import serve_webhook
 from strava_agent.authenticate import authenticate
 from duckdb_layer import DuckDBDataLayer
 
@@ -21,9 +27,15 @@ model = os.getenv("LLM_MODEL", "qwen3:8b")
 temperature = float(os.getenv("LLM_TEMPERATURE", "0"))
 llm = get_llm(model=model, temperature=temperature)
 
-tools = [get_athlete_stats, get_activities_in_range, get_activity_information]
-app = build_graph(llm, tools=tools)
+tools = [get_athlete_stats, get_activities_in_range, get_activity_information, get_activities_details, aggregate_activities, get_top_activities, analyze_streams, get_personal_records, get_training_trends]
+# Conversation state is checkpointed per thread, so a thread resumes after a reconnect or restart
+app = build_graph(llm, tools=tools, checkpointer=get_checkpointer())
 logger = InteractionLogger()
+answer_cache = get_answer_cache()
+# Span totals are exposed for Prometheus when METRICS_PORT is set
+serve_metrics()
+# Strava push events keep the local store and caches fresh when WEBHOOK_PORT is set
+serve_webhook()
 
 # Initialize Chainlit Data Layer for History
 cl.data_layer = DuckDBDataLayer(os.getenv("DUCKDB_PATH", "interactions.duckdb"))
@@ -49,8 +61,6 @@ async def on_chat_start():
     await start_chat_session()
 
 async def start_chat_session():
-    system_message = SystemMessage(content=get_system_prompt())
-    cl.user_session.set("history", [system_message])
     await cl.Message(content="Hello! I'm your Strava assistant. Ask me about your activities!").send()
 
 @cl.action_callback("auth_strava")
@@ -64,6 +74,20 @@ async def on_auth_action(action):
     else:
         await cl.Message(content="Authentication failed.").send()
 
+@cl.on_chat_resume
+async def on_chat_resume(thread):
+    # Nothing to rebuild: the graph state is restored from the checkpoint on the next message
+    pass
+
+@cl.on_chat_end
+async def on_chat_end():
+    # The user disconnected: cancel the running turn so its tool calls stop using the Strava quota
+    task = cl.user_session.get("turn_task")
+    if task is not None and not task.done():
+        task.cancel()
+    # Write the steps still waiting for the debounce so the thread history is complete
+    await cl.data_layer.flush()
+
 @cl.on_message
 async def on_message(message: cl.Message):
     session_id = cl.user_session.get("id")
@@ -71,39 +95,88 @@ async def on_message(message: cl.Message):
     # Log user message
     await cl.make_async(logger.log)(session_id, "user", message.content)
 
-    history = cl.user_session.get("history")
-    history.append(HumanMessage(content=message.content))
+    # Only the new message is sent; the rest of the conversation comes from the checkpoint
+    config = {"configurable": {"thread_id": cl.context.session.thread_id}}
+    state = await app.aget_state(config)
+    known_ids = {m.id for m in state.values.get("messages", [])}
+    inputs = [HumanMessage(content=message.content)]
+    first_turn = not state.values.get("messages")
+    if first_turn:
+        inputs.insert(0, SystemMessage(content=get_system_prompt()))
+
+        # Standalone questions can be answered from the cache; follow-ups depend on the conversation
+        data_version = await asyncio.to_thread(get_store().data_version)
+        cached = await asyncio.to_thread(answer_cache.get, message.content, data_version)
+        if cached:
+            # Record the turn so follow-up questions still have it as context
+            await app.aupdate_state(config, {"messages": inputs + [AIMessage(content=cached)]}, as_node="agent")
+            await cl.Message(content=cached).send()
+            await cl.make_async(logger.log)(session_id, "assistant", cached)
+            return
     
     # Show a loading indicator
     msg = cl.Message(content="")
     await msg.send()
+    tool_failed = False
     
-    # Stream the graph to show node transitions
-    # stream_mode="updates" yields the output of each node as it finishes
-    async for output in app.astream({"messages": history}, stream_mode="updates"):
-        for node_name, state_update in output.items():
+    # Stream tokens and node updates together:
+    # - "messages" yields LLM tokens as they are generated, for time-to-first-token
+    # - "updates" yields the output of each node as it finishes, for steps
+    cl.user_session.set("turn_task", asyncio.current_task())
+    try:
+        async for mode, chunk in app.astream({"messages": inputs}, config, stream_mode=["messages", "updates"]):
+            if mode == "messages":
+                token, metadata = chunk
+                if metadata.get("langgraph_node") == "agent" and isinstance(token, AIMessageChunk) and token.content:
+                    await msg.stream_token(token.content)
+                continue
+
+            for node_name, state_update in chunk.items():
+                if not state_update:
+                    continue
+
+                new_messages = state_update["messages"]
             
-            # Append new messages to history
-            new_messages = state_update["messages"]
+                # If it's the agent node, it contains the AI response
+                if node_name == "agent":
+                    for m in new_messages:
+                        if isinstance(m, AIMessage) and m.tool_calls:
+                            # Text streamed before a tool call is not the answer; clear it
+                            if msg.content:
+                                msg.content = ""
+                                await msg.update()
+                        elif isinstance(m, AIMessage) and m.content:
+                            msg.content = m.content
+                            await msg.update()
             
-            # If it's the agent node, it contains the AI response
-            if node_name == "agent":
-                for m in new_messages:
-                    if isinstance(m, AIMessage) and m.content:
-                        msg.content = m.content
-                        await msg.update()
+                # If it's the tools node, show each tool result as a step
+                elif node_name == "tools":
+                    for m in new_messages:
+                        if isinstance(m, ToolMessage):
+                            tool_failed = tool_failed or m.content.startswith("Error:")
+                            async with cl.Step(name=m.name, type="tool") as step:
+                                step.output = m.content
             
-            # If it's the post_process node, it contains the system analysis
-            elif node_name == "post_process":
-                for m in new_messages:
-                    if isinstance(m, SystemMessage):
-                        async with cl.Step(name="System Analysis", type="llm") as step:
-                            step.output = m.content
-
-            # Add to session history so follow-ups work
-            history.extend(new_messages)
-            cl.user_session.set("history", history)
+                # If it's the post_process node, it contains the system analysis
+                elif node_name == "post_process":
+                    for m in new_messages:
+                        if isinstance(m, SystemMessage):
+                            async with cl.Step(name="System Analysis", type="llm") as step:
+                                step.output = m.content
+    except asyncio.CancelledError:
+        # Drop the unfinished turn from the checkpoint so the thread doesn't end on a dangling tool call
+        stale = [RemoveMessage(id=m.id) for m in (await app.aget_state(config)).values.get("messages", [])
+                 if m.id not in known_ids]
+        if stale:
+            await app.aupdate_state(config, {"messages": stale}, as_node="agent")
+        raise
+    finally:
+        cl.user_session.set("turn_task", None)
 
     # Log assistant response
     if msg.content:
-        await cl.make_async(logger.log)(session_id, "assistant", msg.content)
\ No newline at end of file
+        await cl.make_async(logger.log)(session_id, "assistant", msg.content)
+        if first_turn and not tool_failed:
+            # Keyed on the data version after the turn, which may have synced new activities
+            data_version = await asyncio.to_thread(get_store().data_version)
+            await asyncio.to_thread(answer_cache.put, message.content, data_version, msg.content)
\ No newline at end of file
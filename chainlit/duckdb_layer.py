@@ -1,16 +1,140 @@
+import os
 import duckdb
 import json
+import asyncio
+import threading
 from typing import Optional, List, Dict, Any
 import chainlit.data as cl_data
 from chainlit.types import ThreadDict, Pagination, PaginatedResponse, PageInfo
 
+# SQL texts shared by the methods below. These are plain string constants, not prepared
+# statements: DuckDB parses each one again on every execute.
+INSERT_THREAD = "INSERT INTO cl_threads VALUES (?, ?, ?, ?, ?, ?, ?)"
+UPDATE_THREAD_NAME = "UPDATE cl_threads SET name = ? WHERE id = ?"
+SELECT_THREAD = "SELECT * FROM cl_threads WHERE id = ?"
+SELECT_THREAD_CURSOR = "SELECT createdAt FROM cl_threads WHERE id = ?"
+SELECT_THREAD_STEPS = "SELECT * FROM cl_steps WHERE threadId = ? ORDER BY createdAt ASC"
+SELECT_THREAD_AUTHOR = "SELECT userIdentifier FROM cl_threads WHERE id = ?"
+DELETE_THREAD = "DELETE FROM cl_threads WHERE id = ?"
+DELETE_THREAD_STEPS = "DELETE FROM cl_steps WHERE threadId = ?"
+UPSERT_STEP = "INSERT OR REPLACE INTO cl_steps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+UPDATE_STEP = "UPDATE cl_steps SET output = ?, end_time = ?, metadata = ?, isError = ?, input = ? WHERE id = ?"
+DELETE_STEP = "DELETE FROM cl_steps WHERE id = ?"
+SELECT_USER = "SELECT * FROM cl_users WHERE identifier = ?"
+INSERT_USER = "INSERT INTO cl_users VALUES (?, ?, ?, ?)"
+INSERT_ELEMENT = "INSERT INTO cl_elements VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+SELECT_ELEMENT = "SELECT * FROM cl_elements WHERE id = ?"
+DELETE_ELEMENT = "DELETE FROM cl_elements WHERE id = ?"
+UPSERT_FEEDBACK = """
+    INSERT INTO cl_feedback VALUES (?, ?, ?, ?)
+    ON CONFLICT (id) DO UPDATE SET value = excluded.value, comment = excluded.comment
+"""
+DELETE_FEEDBACK = "DELETE FROM cl_feedback WHERE id = ?"
+
 class DuckDBDataLayer(cl_data.BaseDataLayer):
-    def __init__(self, db_path: str):
+    """
+    Chainlit data layer backed by a single DuckDB connection.
+
+    The database file is opened once. Each worker thread gets its own cursor
+    on that connection (a cheap handle on the same database instance), and
+    every query runs in asyncio.to_thread so the event loop never blocks on I/O.
+
+    Step writes are coalesced: create_step/update_step merge into an in-memory
+    buffer keyed by step id, which is written once when the step ends or after
+    `flush_interval` seconds. Reads that include steps flush the buffer first;
+    flush() and close() write whatever is still buffered.
+    """
+
+    def __init__(self, db_path: str, flush_interval: float = None):
         self.db_path = db_path
+        self.flush_interval = (
+            flush_interval if flush_interval is not None else float(os.getenv("STEP_FLUSH_INTERVAL", "0.5"))
+        )
+        self._con = duckdb.connect(db_path)
+        self._local = threading.local()
+        # step id -> (merged step dict, whether the step was created in the buffer)
+        self._pending_steps = {}
+        self._flush_lock = asyncio.Lock()
+        self._flush_task = None
         self._init_db()
 
+    def _cursor(self):
+        """Return this thread's cursor on the shared connection."""
+        cursor = getattr(self._local, "cursor", None)
+        if cursor is None:
+            cursor = self._local.cursor = self._con.cursor()
+        return cursor
+
+    def _execute_sync(self, statements):
+        """Run (sql, params) pairs in one transaction; return the last statement's rows."""
+        cursor = self._cursor()
+        cursor.begin()
+        try:
+            rows = None
+            for sql, params in statements:
+                rows = cursor.execute(sql, params).fetchall()
+            cursor.commit()
+            return rows
+        except Exception:
+            cursor.rollback()
+            raise
+
+    async def _execute(self, *statements):
+        return await asyncio.to_thread(self._execute_sync, statements)
+
+    async def _fetchall(self, sql, params=()):
+        return await self._execute((sql, params))
+
+    async def _fetchone(self, sql, params=()):
+        rows = await self._execute((sql, params))
+        return rows[0] if rows else None
+
+    @staticmethod
+    def _step_statement(step_dict, created):
+        if created:
+            return (UPSERT_STEP, (
+                step_dict.get("id"), step_dict.get("threadId"), step_dict.get("parentId"), step_dict.get("type"),
+                step_dict.get("name"), step_dict.get("createdAt"), step_dict.get("start"), step_dict.get("end"),
+                step_dict.get("input"), step_dict.get("output"), json.dumps(step_dict.get("metadata")),
+                step_dict.get("isError"), str(step_dict.get("showInput")), step_dict.get("language"), step_dict.get("indent")
+            ))
+        return (UPDATE_STEP, (
+            step_dict.get("output"), step_dict.get("end"), json.dumps(step_dict.get("metadata")),
+            step_dict.get("isError"), step_dict.get("input"), step_dict.get("id")
+        ))
+
+    def _buffer_step(self, step_dict, created):
+        step_id = step_dict.get("id")
+        pending = self._pending_steps.get(step_id)
+        if pending:
+            merged, was_created = pending
+            merged.update(step_dict)
+            created = created or was_created
+        else:
+            merged = dict(step_dict)
+        self._pending_steps[step_id] = (merged, created)
+
+    async def _schedule_flush(self, step_dict):
+        # A finished step is written right away; in-progress updates wait for the debounce
+        if step_dict.get("end"):
+            await self._flush_steps([step_dict.get("id")])
+        elif self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._debounced_flush())
+
+    async def _debounced_flush(self):
+        await asyncio.sleep(self.flush_interval)
+        await self._flush_steps()
+
+    async def _flush_steps(self, step_ids=None):
+        """Write buffered steps (all of them, or only `step_ids`) in one transaction."""
+        async with self._flush_lock:
+            ids = list(self._pending_steps) if step_ids is None else [i for i in step_ids if i in self._pending_steps]
+            statements = [self._step_statement(*self._pending_steps.pop(i)) for i in ids]
+            if statements:
+                await self._execute(*statements)
+
     def _init_db(self):
-        with duckdb.connect(self.db_path) as con:
+        with self._con.cursor() as con:
             con.execute("""
                 CREATE TABLE IF NOT EXISTS cl_threads (
                     id TEXT PRIMARY KEY,
@@ -63,19 +187,58 @@ class DuckDBDataLayer(cl_data.BaseDataLayer):
                     value INT,
                     comment TEXT
                 );
+                -- Secondary indexes are not created: DuckDB plans these queries as sequential scans
+                -- (with TOP_N for the thread list) either way, so they would only add write cost
+                DROP INDEX IF EXISTS idx_cl_threads_created;
+                DROP INDEX IF EXISTS idx_cl_threads_user;
+                DROP INDEX IF EXISTS idx_cl_steps_thread;
+                DROP INDEX IF EXISTS idx_cl_feedback_for;
             """)
 
     async def list_threads(self, pagination: Pagination, filter: Any) -> PaginatedResponse[ThreadDict]:
         limit = pagination.first or 20
         
-        with duckdb.connect(self.db_path) as con:
-            # Fetch threads ordered by creation date
-            rows = con.execute(f"""
-                SELECT id, createdAt, name, userId, userIdentifier, tags, metadata 
-                FROM cl_threads 
-                ORDER BY createdAt DESC 
-                LIMIT {limit}
-            """).fetchall()
+        # Keyset pagination on (createdAt, id): the cursor is the id of the last thread on the
+        # previous page. DuckDB plans this as a scan with TOP_N, which keeps only `limit + 1` rows
+        # instead of sorting the table and skipping an OFFSET that grows with each page.
+        # createdAt is an ISO-8601 string, so text order is chronological order.
+        where = []
+        params = []
+        if pagination.cursor:
+            cursor_row = await self._fetchone(SELECT_THREAD_CURSOR, [pagination.cursor])
+            if cursor_row:
+                where.append("(createdAt < ? OR (createdAt = ? AND id < ?))")
+                params += [cursor_row[0], cursor_row[0], pagination.cursor]
+        
+        user_id = getattr(filter, "userId", None)
+        if user_id:
+            where.append("userId = ?")
+            params.append(user_id)
+        
+        search = getattr(filter, "search", None)
+        if search:
+            where.append("name ILIKE ?")
+            params.append(f"%{search}%")
+        
+        feedback = getattr(filter, "feedback", None)
+        if feedback is not None:
+            where.append("""id IN (
+                SELECT s.threadId FROM cl_steps s JOIN cl_feedback f ON f.forId = s.id WHERE f.value = ?
+            )""")
+            params.append(feedback)
+        
+        where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+        # Fetch one extra row to know whether another page exists
+        rows = await self._fetchall(f"""
+            SELECT id, createdAt, name, userId, userIdentifier, tags, metadata 
+            FROM cl_threads 
+            {where_sql}
+            ORDER BY createdAt DESC, id DESC 
+            LIMIT ?
+        """, params + [limit + 1])
+        
+        has_next_page = len(rows) > limit
+        rows = rows[:limit]
             
         threads = []
         for row in rows:
@@ -89,15 +252,20 @@ class DuckDBDataLayer(cl_data.BaseDataLayer):
                 "metadata": json.loads(row[6]) if row[6] else None
             })
             
-        return PaginatedResponse(data=threads, pageInfo=PageInfo(hasNextPage=False, endCursor=None))
+        return PaginatedResponse(data=threads, pageInfo=PageInfo(
+            hasNextPage=has_next_page,
+            startCursor=threads[0]["id"] if threads else None,
+            endCursor=threads[-1]["id"] if threads else None,
+        ))
 
     async def get_thread(self, thread_id: str) -> Optional[ThreadDict]:
-        with duckdb.connect(self.db_path) as con:
-            thread_row = con.execute("SELECT * FROM cl_threads WHERE id = ?", [thread_id]).fetchone()
-            if not thread_row:
-                return None
-            
-            steps_rows = con.execute("SELECT * FROM cl_steps WHERE threadId = ? ORDER BY createdAt ASC", [thread_id]).fetchall()
+        # Buffered steps are written first so the thread view is consistent
+        await self._flush_steps()
+        thread_row = await self._fetchone(SELECT_THREAD, [thread_id])
+        if not thread_row:
+            return None
+        
+        steps_rows = await self._fetchall(SELECT_THREAD_STEPS, [thread_id])
         
         steps = []
         for row in steps_rows:
@@ -131,98 +299,74 @@ class DuckDBDataLayer(cl_data.BaseDataLayer):
         }
 
     async def create_thread(self, thread_dict: ThreadDict):
-        with duckdb.connect(self.db_path) as con:
-            con.execute("INSERT INTO cl_threads VALUES (?, ?, ?, ?, ?, ?, ?)", (
-                thread_dict.get("id"), thread_dict.get("createdAt"), thread_dict.get("name"),
-                thread_dict.get("userId"), thread_dict.get("userIdentifier"), thread_dict.get("tags"),
-                json.dumps(thread_dict.get("metadata"))
-            ))
+        await self._execute((INSERT_THREAD, (
+            thread_dict.get("id"), thread_dict.get("createdAt"), thread_dict.get("name"),
+            thread_dict.get("userId"), thread_dict.get("userIdentifier"), thread_dict.get("tags"),
+            json.dumps(thread_dict.get("metadata"))
+        )))
 
     async def update_thread(self, thread_id: str, name: Optional[str] = None, user_id: Optional[str] = None, metadata: Optional[Dict] = None, tags: Optional[List[str]] = None):
         if name:
-            with duckdb.connect(self.db_path) as con:
-                con.execute("UPDATE cl_threads SET name = ? WHERE id = ?", (name, thread_id))
+            await self._execute((UPDATE_THREAD_NAME, (name, thread_id)))
 
     async def delete_thread(self, thread_id: str):
-        with duckdb.connect(self.db_path) as con:
-            con.execute("DELETE FROM cl_threads WHERE id = ?", [thread_id])
-            con.execute("DELETE FROM cl_steps WHERE threadId = ?", [thread_id])
+        for step_id, (step, _) in list(self._pending_steps.items()):
+            if step.get("threadId") == thread_id:
+                del self._pending_steps[step_id]
+        await self._execute((DELETE_THREAD, [thread_id]), (DELETE_THREAD_STEPS, [thread_id]))
 
     async def create_step(self, step_dict: Dict[str, Any]):
-        with duckdb.connect(self.db_path) as con:
-            con.execute("INSERT INTO cl_steps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (
-                step_dict.get("id"), step_dict.get("threadId"), step_dict.get("parentId"), step_dict.get("type"),
-                step_dict.get("name"), step_dict.get("createdAt"), step_dict.get("start"), step_dict.get("end"),
-                step_dict.get("input"), step_dict.get("output"), json.dumps(step_dict.get("metadata")),
-                step_dict.get("isError"), str(step_dict.get("showInput")), step_dict.get("language"), step_dict.get("indent")
-            ))
+        self._buffer_step(step_dict, created=True)
+        await self._schedule_flush(step_dict)
 
     async def update_step(self, step_dict: Dict[str, Any]):
-        with duckdb.connect(self.db_path) as con:
-            con.execute("""
-                UPDATE cl_steps SET output = ?, end_time = ?, metadata = ?, isError = ?, input = ? WHERE id = ?
-            """, (
-                step_dict.get("output"), step_dict.get("end"), json.dumps(step_dict.get("metadata")),
-                step_dict.get("isError"), step_dict.get("input"), step_dict.get("id")
-            ))
+        self._buffer_step(step_dict, created=False)
+        await self._schedule_flush(step_dict)
 
     async def delete_step(self, step_id: str):
-        with duckdb.connect(self.db_path) as con:
-            con.execute("DELETE FROM cl_steps WHERE id = ?", [step_id])
+        self._pending_steps.pop(step_id, None)
+        await self._execute((DELETE_STEP, [step_id]))
 
     async def get_user(self, identifier: str) -> Optional[Dict[str, Any]]:
-        with duckdb.connect(self.db_path) as con:
-            row = con.execute("SELECT * FROM cl_users WHERE identifier = ?", [identifier]).fetchone()
-            if row:
-                return {"id": row[0], "identifier": row[1], "metadata": json.loads(row[2]) if row[2] else {}, "createdAt": row[3]}
+        row = await self._fetchone(SELECT_USER, [identifier])
+        if row:
+            return {"id": row[0], "identifier": row[1], "metadata": json.loads(row[2]) if row[2] else {}, "createdAt": row[3]}
         return None
 
     async def create_user(self, user: Dict[str, Any]) -> Optional[Dict[str, Any]]:
-        with duckdb.connect(self.db_path) as con:
-            con.execute("INSERT INTO cl_users VALUES (?, ?, ?, ?)", 
-                        (user.get("id"), user.get("identifier"), json.dumps(user.get("metadata")), user.get("createdAt")))
+        await self._execute((INSERT_USER,
+                             (user.get("id"), user.get("identifier"), json.dumps(user.get("metadata")), user.get("createdAt"))))
         return user
 
     async def create_element(self, element: Dict[str, Any]):
-        with duckdb.connect(self.db_path) as con:
-            con.execute("INSERT INTO cl_elements VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                        (element.get("id"), element.get("threadId"), element.get("type"), element.get("url"),
-                         element.get("chainlitKey"), element.get("name"), element.get("display"), element.get("size"),
-                         element.get("language"), element.get("forId"), element.get("mime")))
+        await self._execute((INSERT_ELEMENT,
+                             (element.get("id"), element.get("threadId"), element.get("type"), element.get("url"),
+                              element.get("chainlitKey"), element.get("name"), element.get("display"), element.get("size"),
+                              element.get("language"), element.get("forId"), element.get("mime"))))
 
     async def get_element(self, thread_id: str, element_id: str) -> Optional[Dict[str, Any]]:
-        with duckdb.connect(self.db_path) as con:
-            row = con.execute("SELECT * FROM cl_elements WHERE id = ?", [element_id]).fetchone()
-            if row:
-                return {
-                    "id": row[0], "threadId": row[1], "type": row[2], "url": row[3], "chainlitKey": row[4],
-                    "name": row[5], "display": row[6], "size": row[7], "language": row[8], "forId": row[9], "mime": row[10]
-                }
+        row = await self._fetchone(SELECT_ELEMENT, [element_id])
+        if row:
+            return {
+                "id": row[0], "threadId": row[1], "type": row[2], "url": row[3], "chainlitKey": row[4],
+                "name": row[5], "display": row[6], "size": row[7], "language": row[8], "forId": row[9], "mime": row[10]
+            }
         return None
 
     async def delete_element(self, element_id: str):
-        with duckdb.connect(self.db_path) as con:
-            con.execute("DELETE FROM cl_elements WHERE id = ?", [element_id])
+        await self._execute((DELETE_ELEMENT, [element_id]))
 
     async def upsert_feedback(self, feedback: Dict[str, Any]) -> str:
-        with duckdb.connect(self.db_path) as con:
-            exists = con.execute("SELECT 1 FROM cl_feedback WHERE id = ?", [feedback.get("id")]).fetchone()
-            if exists:
-                con.execute("UPDATE cl_feedback SET value = ?, comment = ? WHERE id = ?",
-                            (feedback.get("value"), feedback.get("comment"), feedback.get("id")))
-            else:
-                con.execute("INSERT INTO cl_feedback VALUES (?, ?, ?, ?)",
-                            (feedback.get("id"), feedback.get("forId"), feedback.get("value"), feedback.get("comment")))
+        await self._execute((UPSERT_FEEDBACK,
+                             (feedback.get("id"), feedback.get("forId"), feedback.get("value"), feedback.get("comment"))))
         return feedback.get("id")
 
     async def delete_feedback(self, feedback_id: str):
-         with duckdb.connect(self.db_path) as con:
-            con.execute("DELETE FROM cl_feedback WHERE id = ?", [feedback_id])
+        await self._execute((DELETE_FEEDBACK, [feedback_id]))
             
     async def get_thread_author(self, thread_id: str) -> str:
-        with duckdb.connect(self.db_path) as con:
-            res = con.execute("SELECT userIdentifier FROM cl_threads WHERE id = ?", [thread_id]).fetchone()
-            return res[0] if res else ""
+        res = await self._fetchone(SELECT_THREAD_AUTHOR, [thread_id])
+        return res[0] if res else ""
     
     async def get_favorite_steps(self, user_identifier: str) -> List[Dict[str, Any]]:
         # Return empty list for now as we haven't implemented favorites logic
@@ -231,5 +375,10 @@ class DuckDBDataLayer(cl_data.BaseDataLayer):
     async def build_debug_url(self) -> str:
         return ""
 
+    async def flush(self):
+        """Write every buffered step now, e.g. when a chat ends."""
+        await self._flush_steps()
+
     async def close(self):
-        pass
\ No newline at end of file
+        await self._flush_steps()
+        self._con.close()
\ No newline at end of file
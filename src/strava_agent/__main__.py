@@ -3,7 +3,7 @@ import os
 import time
 import uuid
 from dotenv import load_dotenv
-from langchain_core.messages import HumanMessage, SystemMessage
+from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, ToolMessage, RemoveMessage
 from langchain_core.globals import set_debug
 
 def main():
@@ -23,9 +23,13 @@ def main():
     # Import graph after ensuring env vars are set
     from strava_agent.graph import build_graph
     from strava_agent.llm import get_llm
-    from strava_agent.tools import get_athlete_stats, get_activities_in_range, get_activity_information
+    from strava_agent.tools import get_athlete_stats, get_activities_in_range, get_activity_information, get_activities_details, aggregate_activities, get_top_activities, analyze_streams, get_personal_records, get_training_trends
     from strava_agent.prompts import get_system_prompt
     from strava_agent.logger import InteractionLogger
+    from strava_agent.checkpoint import get_checkpointer
+    from strava_agent.cache import get_answer_cache
+    from strava_agent.store import get_store
+    from strava_agent.telemetry import serve_metrics
 
     set_debug(False)
     
@@ -35,12 +39,32 @@ def main():
     llm = get_llm(model=model, temperature=temperature)
     
     # Define tools to use
-    tools = [get_athlete_stats, get_activities_in_range, get_activity_information]
+    tools = [get_athlete_stats, get_activities_in_range, get_activity_information, get_activities_details, aggregate_activities, get_top_activities, analyze_streams, get_personal_records, get_training_trends]
     
-    app = build_graph(llm, tools=tools)
+    app = build_graph(llm, tools=tools, checkpointer=get_checkpointer())
     logger = InteractionLogger()
+    serve_metrics()
     
     system_message = SystemMessage(content=get_system_prompt())
+    store = get_store()
+    answer_cache = get_answer_cache()
+
+    def run_turn(messages, config, first_turn):
+        # Standalone questions can be answered from the cache; follow-ups depend on the conversation
+        question = messages[-1].content
+        if first_turn:
+            cached = answer_cache.get(question, store.data_version())
+            if cached:
+                # Record the turn so follow-up questions still have it as context
+                app.update_state(config, {"messages": messages + [AIMessage(content=cached)]}, as_node="agent")
+                return cached
+
+        final_state = app.invoke({"messages": messages}, config)
+        response = final_state["messages"][-1].content
+        failed = any(isinstance(m, ToolMessage) and m.content.startswith("Error:") for m in final_state["messages"])
+        if first_turn and response and not failed:
+            answer_cache.put(question, store.data_version(), response)
+        return response
 
     # Handle command line arguments for single-question mode
     if len(sys.argv) > 1:
@@ -52,10 +76,11 @@ def main():
         print(f"User: {question}")
         
         messages = [system_message, HumanMessage(content=question)]
+        config = {"configurable": {"thread_id": str(uuid.uuid4())}}
         try:
-            final_state = app.invoke({"messages": messages})
+            response = run_turn(messages, config, first_turn=True)
             print("-" * 30)
-            print(f"Agent: {final_state['messages'][-1].content}")
+            print(f"Agent: {response}")
         except Exception as e:
             print(f"Error: {e}")
         return
@@ -64,27 +89,27 @@ def main():
     print("Strava Agent CLI (Type 'quit' to exit)")
     print("-" * 30)
     
-    session_id = str(uuid.uuid4())
-    # Initialize history with system message
-    messages = [system_message]
+    # The conversation state lives in the checkpointer, keyed by the session id
+    session_id = os.getenv("STRAVA_THREAD_ID") or str(uuid.uuid4())
+    config = {"configurable": {"thread_id": session_id}}
     
     while True:
         try:
+            known_ids = {m.id for m in app.get_state(config).values.get("messages", [])}
             user_input = input("User: ")
             if user_input.lower() in ["quit", "exit"]:
                 break
                 
             logger.log(session_id, "user", user_input)
-            messages.append(HumanMessage(content=user_input))
+            # Only the new message is sent; the system prompt starts a new thread
+            messages = [HumanMessage(content=user_input)]
+            if not known_ids:
+                messages.insert(0, system_message)
             
             # Invoke the graph
-            final_state = app.invoke({"messages": messages})
-            
-            # Update history
-            messages = final_state["messages"]
+            response = run_turn(messages, config, first_turn=not known_ids)
             
             # Print the last message content (Agent response)
-            response = messages[-1].content
             print(f"Agent: {response}")
             logger.log(session_id, "assistant", response)
             print("-" * 30)
@@ -93,9 +118,14 @@ def main():
             break
         except Exception as e:
             print(f"Error: {e}")
-            # If the graph failed, remove the last user message so we don't have a dangling question
-            if messages and isinstance(messages[-1], HumanMessage):
-                messages.pop()
+            # If the graph failed, drop this turn's messages from the checkpoint so we don't have a dangling question
+            stale = [RemoveMessage(id=m.id) for m in app.get_state(config).values.get("messages", [])
+                     if m.id not in known_ids]
+            if stale:
+                app.update_state(config, {"messages": stale}, as_node="agent")
+
+    # Write any interactions still buffered by the logger
+    logger.close()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,254 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import threading
+import duckdb
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from .periods import resolve_period
+
+_CACHES = {}
+_ANSWER_CACHES = {}
+
+# Words that change the phrasing of a question but not its answer
+_FILLER = re.compile(r"\b(please|hey|hi|hello|thanks|thank you|can you|could you|would you|tell me|show me)\b")
+
+
+class ActivityCache:
+    """
+    Two-tier cache of detailed activity payloads keyed by activity id.
+
+    The first tier is an in-process LRU; the second is a DuckDB table that
+    survives restarts and is shared across conversations. Entries older than
+    `ttl` seconds are treated as misses in both tiers.
+    """
+
+    def __init__(self, db_path=None, ttl=None, max_entries=None, max_disk_entries=None):
+        if db_path:
+            self.db_path = db_path
+        else:
+            self.db_path = os.getenv("DUCKDB_PATH", "interactions.duckdb")
+        self.ttl = ttl if ttl is not None else float(os.getenv("ACTIVITY_CACHE_TTL", "86400"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("ACTIVITY_CACHE_SIZE", "256"))
+        self.max_disk_entries = (
+            max_disk_entries if max_disk_entries is not None else int(os.getenv("ACTIVITY_CACHE_DISK_SIZE", "10000"))
+        )
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._init_db()
+
+    def _init_db(self):
+        """Initialize the cache table if it doesn't exist."""
+        with duckdb.connect(self.db_path) as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS activity_details (
+                    id BIGINT PRIMARY KEY,
+                    payload VARCHAR,
+                    fetched_at TIMESTAMP
+                )
+            """)
+
+    def get(self, activity_id: int):
+        """Return the cached payload for an activity, or None on a miss or expired entry."""
+        data = self._get_memory(activity_id)
+        if data is not None:
+            return data
+        return self._get_disk(activity_id)
+
+    async def aget(self, activity_id: int):
+        """Non-blocking get(): only the DuckDB tier runs in a worker thread."""
+        data = self._get_memory(activity_id)
+        if data is not None:
+            return data
+        return await asyncio.to_thread(self._get_disk, activity_id)
+
+    def _get_memory(self, activity_id: int):
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(activity_id)
+            if entry is not None:
+                data, fetched_at = entry
+                if now - fetched_at < self.ttl:
+                    self._memory.move_to_end(activity_id)
+                    self.hits += 1
+                    return data
+                del self._memory[activity_id]
+        return None
+
+    def _get_disk(self, activity_id: int):
+        cutoff = datetime.now() - timedelta(seconds=self.ttl)
+        with duckdb.connect(self.db_path) as con:
+            row = con.execute(
+                "SELECT payload, fetched_at FROM activity_details WHERE id = ? AND fetched_at > ?",
+                (activity_id, cutoff),
+            ).fetchone()
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.disk_hits += 1
+            data = json.loads(row[0])
+            self._remember(activity_id, data, row[1].timestamp())
+            return data
+
+    def put(self, activity_id: int, data: dict):
+        """Store a payload in both tiers, evicting the oldest entries past the size limits."""
+        fetched_at = datetime.now()
+        with self._lock:
+            self._remember(activity_id, data, fetched_at.timestamp())
+        self._put_disk(activity_id, data, fetched_at)
+
+    async def aput(self, activity_id: int, data: dict):
+        """Non-blocking put(): only the DuckDB tier runs in a worker thread."""
+        fetched_at = datetime.now()
+        with self._lock:
+            self._remember(activity_id, data, fetched_at.timestamp())
+        await asyncio.to_thread(self._put_disk, activity_id, data, fetched_at)
+
+    def _put_disk(self, activity_id: int, data: dict, fetched_at: datetime):
+        with duckdb.connect(self.db_path) as con:
+            con.execute(
+                "INSERT OR REPLACE INTO activity_details VALUES (?, ?, ?)",
+                (activity_id, json.dumps(data), fetched_at),
+            )
+            con.execute("""
+                DELETE FROM activity_details WHERE id IN (
+                    SELECT id FROM activity_details ORDER BY fetched_at DESC OFFSET ?
+                )
+            """, (self.max_disk_entries,))
+
+    def invalidate(self, activity_id: int):
+        """Drop an activity from both tiers."""
+        with self._lock:
+            self._memory.pop(activity_id, None)
+        with duckdb.connect(self.db_path) as con:
+            con.execute("DELETE FROM activity_details WHERE id = ?", (activity_id,))
+
+    def stats(self) -> dict:
+        """Return hit/miss counters and the in-memory size."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "memory_entries": len(self._memory),
+            }
+
+    def _remember(self, activity_id, data, fetched_at):
+        # Caller holds self._lock
+        self._memory[activity_id] = (data, fetched_at)
+        self._memory.move_to_end(activity_id)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+
+def normalize_question(question: str) -> str:
+    """
+    Reduce a question to a canonical form for answer caching.
+
+    Case, punctuation and polite filler are dropped, and the named period is
+    replaced by a placeholder, since the resolved dates are keyed separately.
+    """
+    text = question.lower()
+    period = resolve_period(text)
+    if period:
+        text = text.replace(period[2], " <period> ", 1)
+    text = _FILLER.sub(" ", text)
+    text = re.sub(r"[^\w<>\s]", " ", text)
+    return " ".join(text.split())
+
+
+class AnswerCache:
+    """
+    DuckDB cache of final agent answers for standalone questions.
+
+    Entries are keyed on the normalized question, the date range it resolves
+    to and the activity store's data version, so a question about "this week"
+    asked next week, or after a new activity is synced, is a miss. Entries
+    older than `ttl` seconds are misses too, which bounds staleness when the
+    store has not synced recently.
+    """
+
+    def __init__(self, db_path=None, ttl=None, max_entries=None):
+        if db_path:
+            self.db_path = db_path
+        else:
+            self.db_path = os.getenv("DUCKDB_PATH", "interactions.duckdb")
+        self.ttl = ttl if ttl is not None else float(os.getenv("ANSWER_CACHE_TTL", "900"))
+        self.max_entries = max_entries if max_entries is not None else int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+        self._init_db()
+
+    def _init_db(self):
+        """Initialize the answer cache table if it doesn't exist."""
+        with duckdb.connect(self.db_path) as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS answer_cache (
+                    key VARCHAR PRIMARY KEY,
+                    question VARCHAR,
+                    answer VARCHAR,
+                    data_version BIGINT,
+                    created_at TIMESTAMP
+                )
+            """)
+
+    def key(self, question: str, data_version: int) -> str:
+        """Build the cache key for a question at a given data version."""
+        period = resolve_period(question)
+        start, end = (period[0].isoformat(), period[1].isoformat()) if period else ("", "")
+        raw = "|".join([normalize_question(question), start, end, str(data_version)])
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, question: str, data_version: int):
+        """Return the cached answer, or None on a miss or expired entry."""
+        cutoff = datetime.now() - timedelta(seconds=self.ttl)
+        with duckdb.connect(self.db_path) as con:
+            row = con.execute(
+                "SELECT answer FROM answer_cache WHERE key = ? AND created_at > ?",
+                (self.key(question, data_version), cutoff),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, question: str, data_version: int, answer: str):
+        """Store an answer, dropping entries from older data versions and past the size limit."""
+        with duckdb.connect(self.db_path) as con:
+            con.execute(
+                "INSERT OR REPLACE INTO answer_cache VALUES (?, ?, ?, ?, ?)",
+                (self.key(question, data_version), question, answer, data_version, datetime.now()),
+            )
+            con.execute("DELETE FROM answer_cache WHERE data_version <> ?", (data_version,))
+            con.execute("""
+                DELETE FROM answer_cache WHERE key IN (
+                    SELECT key FROM answer_cache ORDER BY created_at DESC OFFSET ?
+                )
+            """, (self.max_entries,))
+
+    def clear(self):
+        """Drop every cached answer."""
+        with duckdb.connect(self.db_path) as con:
+            con.execute("DELETE FROM answer_cache")
+
+
+def get_activity_cache(db_path=None) -> ActivityCache:
+    """Return the process-wide ActivityCache for the given (or configured) database path."""
+    db_path = db_path or os.getenv("DUCKDB_PATH", "interactions.duckdb")
+    if db_path not in _CACHES:
+        _CACHES[db_path] = ActivityCache(db_path)
+    return _CACHES[db_path]
+
+
+def get_answer_cache(db_path=None) -> AnswerCache:
+    """Return the process-wide AnswerCache for the given (or configured) database path."""
+    db_path = db_path or os.getenv("DUCKDB_PATH", "interactions.duckdb")
+    if db_path not in _ANSWER_CACHES:
+        _ANSWER_CACHES[db_path] = AnswerCache(db_path)
+    return _ANSWER_CACHES[db_path]
@@ -0,0 +1,293 @@
+import os
+import random
+import asyncio
+import threading
+import duckdb
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+_SAVERS = {}
+
+
+class DuckDBSaver(BaseCheckpointSaver):
+    """
+    LangGraph checkpoint saver that persists graph state in DuckDB.
+
+    Checkpoints are keyed by the `thread_id` in the run config, so a
+    conversation resumes from its latest checkpoint after a reconnect or a
+    restart; callers only send the new message. Channel values are stored per
+    (channel, version) like LangGraph's in-memory saver, so channels that did
+    not change in a step are not written again.
+
+    A DuckDB file can only be opened read-write by one process, and the app
+    keeps it open, so the saver is scoped to a single process: replicas
+    cannot share it. A multi-replica deployment needs a server-backed
+    LangGraph saver (e.g. Postgres) passed to build_graph(checkpointer=...).
+    """
+
+    def __init__(self, db_path=None, *, serde=None):
+        super().__init__(serde=serde)
+        if db_path:
+            self.db_path = db_path
+        else:
+            self.db_path = os.getenv("DUCKDB_PATH", "interactions.duckdb")
+        self._con = duckdb.connect(self.db_path)
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _init_db(self):
+        """Initialize the checkpoint tables if they don't exist."""
+        with self._lock:
+            self._con.execute("""
+                CREATE TABLE IF NOT EXISTS checkpoints (
+                    thread_id VARCHAR,
+                    checkpoint_ns VARCHAR,
+                    checkpoint_id VARCHAR,
+                    parent_checkpoint_id VARCHAR,
+                    checkpoint_type VARCHAR,
+                    checkpoint BLOB,
+                    metadata_type VARCHAR,
+                    metadata BLOB,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+                );
+                CREATE TABLE IF NOT EXISTS checkpoint_blobs (
+                    thread_id VARCHAR,
+                    checkpoint_ns VARCHAR,
+                    channel VARCHAR,
+                    version VARCHAR,
+                    value_type VARCHAR,
+                    value BLOB,
+                    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+                );
+                CREATE TABLE IF NOT EXISTS checkpoint_writes (
+                    thread_id VARCHAR,
+                    checkpoint_ns VARCHAR,
+                    checkpoint_id VARCHAR,
+                    task_id VARCHAR,
+                    idx INTEGER,
+                    channel VARCHAR,
+                    value_type VARCHAR,
+                    value BLOB,
+                    task_path VARCHAR,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+                );
+            """)
+
+    def _query(self, sql: str, params=()):
+        with self._lock:
+            return self._con.execute(sql, params).fetchall()
+
+    def _load_blobs(self, thread_id: str, checkpoint_ns: str, versions: dict) -> dict:
+        if not versions:
+            return {}
+        rows = self._query(
+            f"""
+                SELECT channel, value_type, value FROM checkpoint_blobs
+                WHERE thread_id = ? AND checkpoint_ns = ?
+                AND (channel, version) IN ({", ".join(["(?, ?)"] * len(versions))})
+            """,
+            [thread_id, checkpoint_ns, *(v for k, ver in versions.items() for v in (k, str(ver)))],
+        )
+        return {
+            channel: self.serde.loads_typed((value_type, value))
+            for channel, value_type, value in rows
+            if value_type != "empty"
+        }
+
+    def _load_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> list:
+        rows = self._query("""
+            SELECT task_id, idx, channel, value_type, value, task_path FROM checkpoint_writes
+            WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?
+        """, (thread_id, checkpoint_ns, checkpoint_id))
+        # Same order as LangGraph's savers: by task, then write index (idx already maps special channels)
+        rows.sort(key=lambda r: (r[5], r[0], r[1]))
+        return [(task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, _, channel, value_type, value, _ in rows]
+
+    def _to_tuple(self, thread_id: str, row) -> CheckpointTuple:
+        checkpoint_ns, checkpoint_id, parent_checkpoint_id, checkpoint_type, checkpoint, metadata_type, metadata = row
+        checkpoint = self.serde.loads_typed((checkpoint_type, checkpoint))
+
+        def _config(cid):
+            return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": cid}}
+
+        return CheckpointTuple(
+            config=_config(checkpoint_id),
+            checkpoint={
+                **checkpoint,
+                "channel_values": self._load_blobs(thread_id, checkpoint_ns, checkpoint["channel_versions"]),
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=_config(parent_checkpoint_id) if parent_checkpoint_id else None,
+            pending_writes=self._load_writes(thread_id, checkpoint_ns, checkpoint_id),
+        )
+
+    def get_tuple(self, config):
+        """Return the checkpoint named by the config, or the thread's latest one."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        sql = """
+            SELECT checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+                   checkpoint_type, checkpoint, metadata_type, metadata
+            FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ?
+        """
+        params = [thread_id, checkpoint_ns]
+        if checkpoint_id := get_checkpoint_id(config):
+            sql += " AND checkpoint_id = ?"
+            params.append(checkpoint_id)
+        # Checkpoint ids are time-ordered, so the greatest one is the latest
+        rows = self._query(sql + " ORDER BY checkpoint_id DESC LIMIT 1", params)
+        if not rows:
+            return None
+        return self._to_tuple(thread_id, rows[0])
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        """Yield checkpoints newest first, optionally filtered by thread, metadata and `before`."""
+        sql = """
+            SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id,
+                   checkpoint_type, checkpoint, metadata_type, metadata
+            FROM checkpoints WHERE 1 = 1
+        """
+        params = []
+        if config:
+            sql += " AND thread_id = ?"
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                sql += " AND checkpoint_ns = ?"
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                sql += " AND checkpoint_id = ?"
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            sql += " AND checkpoint_id < ?"
+            params.append(before_id)
+        sql += " ORDER BY thread_id, checkpoint_ns, checkpoint_id DESC"
+
+        for row in self._query(sql, params):
+            if limit is not None and limit <= 0:
+                break
+            item = self._to_tuple(row[0], row[1:])
+            # Metadata is serialized, so filters are applied after loading
+            if filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield item
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        """Save a checkpoint and the channel values that changed in this step."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        c = checkpoint.copy()
+        values = c.pop("channel_values")
+        blobs = [
+            (thread_id, checkpoint_ns, k, str(v),
+             *(self.serde.dumps_typed(values[k]) if k in values else ("empty", b"")))
+            for k, v in new_versions.items()
+        ]
+        checkpoint_type, checkpoint_bytes = self.serde.dumps_typed(c)
+        metadata_type, metadata_bytes = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        with self._lock:
+            self._con.begin()
+            try:
+                if blobs:
+                    self._con.executemany(
+                        "INSERT OR REPLACE INTO checkpoint_blobs VALUES (?, ?, ?, ?, ?, ?)", blobs
+                    )
+                self._con.execute(
+                    "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                     checkpoint_type, checkpoint_bytes, metadata_type, metadata_bytes),
+                )
+                self._con.commit()
+            except Exception:
+                self._con.rollback()
+                raise
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        """Save the intermediate writes of a task for the given checkpoint."""
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        # Regular writes keep their first value; special writes (errors, interrupts) are replaced
+        regular, special = [], []
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            row = (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel,
+                   *self.serde.dumps_typed(value), task_path)
+            (special if idx < 0 else regular).append(row)
+
+        with self._lock:
+            self._con.begin()
+            try:
+                if regular:
+                    self._con.executemany(
+                        "INSERT OR IGNORE INTO checkpoint_writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", regular
+                    )
+                if special:
+                    self._con.executemany(
+                        "INSERT OR REPLACE INTO checkpoint_writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", special
+                    )
+                self._con.commit()
+            except Exception:
+                self._con.rollback()
+                raise
+
+    def delete_thread(self, thread_id: str):
+        """Delete every checkpoint, channel value and write of a thread."""
+        with self._lock:
+            self._con.begin()
+            try:
+                for table in ("checkpoints", "checkpoint_blobs", "checkpoint_writes"):
+                    self._con.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+                self._con.commit()
+            except Exception:
+                self._con.rollback()
+                raise
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def get_next_version(self, current, channel=None) -> str:
+        # Zero-padded so versions sort as strings; the random suffix keeps concurrent forks distinct
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    def close(self):
+        """Release the database connection."""
+        with self._lock:
+            self._con.close()
+
+
+def get_checkpointer(db_path=None) -> DuckDBSaver:
+    """Return the process-wide DuckDBSaver for the given (or configured) database path."""
+    db_path = db_path or os.getenv("DUCKDB_PATH", "interactions.duckdb")
+    if db_path not in _SAVERS:
+        _SAVERS[db_path] = DuckDBSaver(db_path)
+    return _SAVERS[db_path]
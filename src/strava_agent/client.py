@@ -0,0 +1,238 @@
+import os
+import asyncio
+import calendar
+import threading
+import time
+from datetime import datetime, timezone
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+from stravalib.client import Client
+from stravalib.model import SummaryActivity
+
+from .ratelimit import get_scheduler
+from .telemetry import record_http
+
+# Only API calls count against the quota; OAuth token exchanges are not scheduled
+_API_PREFIX = "https://www.strava.com/api/"
+_API_URL = "https://www.strava.com/api/v3"
+
+
+class _ClientState:
+    """The shared client and the values cached for the lifetime of its token."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.token = None
+        self.client = None
+        self.session = None
+        self.athlete_id = None
+        # event loop -> (token, httpx.AsyncClient)
+        self.async_clients = {}
+
+
+_STATE = _ClientState()
+
+
+class _ScheduledAdapter(HTTPAdapter):
+    """HTTPAdapter that sends every Strava API request through the rate-limit scheduler."""
+
+    def __init__(self, scheduler, **kwargs):
+        self.scheduler = scheduler
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        with self.scheduler.slot():
+            started = time.perf_counter()
+            response = super().send(request, **kwargs)
+            record_http(time.perf_counter() - started)
+        self.scheduler.update(response.headers, request.method, response.status_code)
+        return response
+
+
+def _build_session() -> requests.Session:
+    """Create a requests session that keeps a pool of connections to Strava alive."""
+    pool_size = int(os.getenv("STRAVA_POOL_SIZE", "10"))
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=pool_size))
+    session.mount(_API_PREFIX, _ScheduledAdapter(get_scheduler(), pool_connections=1, pool_maxsize=pool_size))
+    return session
+
+
+def get_client() -> Client:
+    """
+    Return the process-wide Strava client.
+
+    The client is built once per access token and reuses a pooled keep-alive
+    session, so tool calls skip the TLS handshake. It is rebuilt automatically
+    when STRAVA_ACCESS_TOKEN changes (e.g. after re-authentication).
+    """
+    token = os.getenv("STRAVA_ACCESS_TOKEN")
+    with _STATE.lock:
+        if _STATE.client is None or _STATE.token != token:
+            if _STATE.session is not None:
+                _STATE.session.close()
+            _STATE.session = _build_session()
+            # Throttling is done by the scheduler in the session, not by stravalib's own limiter
+            _STATE.client = Client(access_token=token, requests_session=_STATE.session, rate_limit_requests=False)
+            _STATE.token = token
+            _STATE.athlete_id = None
+        return _STATE.client
+
+
+def get_athlete_id() -> int:
+    """Return the authenticated athlete's id, fetched once per access token."""
+    client = get_client()
+    with _STATE.lock:
+        if _STATE.athlete_id is not None and _STATE.client is client:
+            return _STATE.athlete_id
+
+    athlete_id = client.get_athlete().id
+    with _STATE.lock:
+        if _STATE.client is client:
+            _STATE.athlete_id = athlete_id
+    return athlete_id
+
+
+def _build_async_client(token: str) -> httpx.AsyncClient:
+    """Create a pooled async HTTP client for the Strava API."""
+    pool_size = int(os.getenv("STRAVA_POOL_SIZE", "10"))
+    return httpx.AsyncClient(
+        base_url=os.getenv("STRAVA_API_URL", _API_URL),
+        headers={"Authorization": f"Bearer {token}"},
+        limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+        timeout=httpx.Timeout(30.0),
+    )
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """
+    Return the shared non-blocking HTTP client for the running event loop.
+
+    Like get_client(), it is rebuilt when STRAVA_ACCESS_TOKEN changes. httpx
+    connection pools are bound to an event loop, so each loop gets its own
+    client; short-lived loops should be run with run_async(), which closes it.
+    """
+    token = os.getenv("STRAVA_ACCESS_TOKEN")
+    loop = asyncio.get_running_loop()
+    with _STATE.lock:
+        # A closed loop can no longer run aclose(); just forget its client
+        for stale in [other for other in _STATE.async_clients if other.is_closed()]:
+            del _STATE.async_clients[stale]
+        entry = _STATE.async_clients.get(loop)
+        if entry is None or entry[0] != token:
+            if entry is not None:
+                loop.create_task(entry[1].aclose())
+            entry = (token, _build_async_client(token))
+            _STATE.async_clients[loop] = entry
+        return entry[1]
+
+
+async def close_async_client():
+    """Close the running loop's client and its connection pool."""
+    with _STATE.lock:
+        entry = _STATE.async_clients.pop(asyncio.get_running_loop(), None)
+    if entry is not None:
+        await entry[1].aclose()
+
+
+def run_async(coro):
+    """asyncio.run() for a private loop, closing the loop's Strava client before the loop goes away."""
+    async def _main():
+        try:
+            return await coro
+        finally:
+            await close_async_client()
+
+    return asyncio.run(_main())
+
+
+async def api_get(path: str, params: dict = None):
+    """
+    GET a Strava API resource without blocking the event loop.
+
+    The request waits for a rate-limit scheduler slot first and feeds the
+    response headers back to the scheduler.
+
+    Returns:
+        The parsed JSON response.
+    """
+    scheduler = get_scheduler()
+    client = get_async_client()
+    async with scheduler.aslot():
+        started = time.perf_counter()
+        response = await client.get(path, params=params)
+        record_http(time.perf_counter() - started)
+    scheduler.update(response.headers, "GET", response.status_code)
+    response.raise_for_status()
+    return response.json()
+
+
+async def aget_athlete_id() -> int:
+    """Async counterpart of get_athlete_id(), sharing the same per-token cache."""
+    token = os.getenv("STRAVA_ACCESS_TOKEN")
+    with _STATE.lock:
+        if _STATE.athlete_id is not None and _STATE.token == token:
+            return _STATE.athlete_id
+
+    athlete_id = (await api_get("/athlete"))["id"]
+    # Make sure the sync client is keyed on the same token before caching
+    get_client()
+    with _STATE.lock:
+        if _STATE.token == token:
+            _STATE.athlete_id = athlete_id
+    return athlete_id
+
+
+def _epoch(value: datetime) -> int:
+    """Convert a datetime to a Unix epoch; naive values are treated as UTC, as stravalib does."""
+    if value.tzinfo:
+        value = value.astimezone(timezone.utc)
+    return calendar.timegm(value.timetuple())
+
+
+async def fetch_activities(after: datetime, before: datetime = None, per_page: int = 200, prefetch: int = None):
+    """
+    Fetch the athlete's activity summaries between `after` and `before` without blocking.
+
+    The first page is fetched on its own, so short ranges cost one request. If it
+    is full, the following pages are prefetched `prefetch` at a time concurrently
+    until a short page marks the end of the range.
+
+    Returns:
+        A list of stravalib SummaryActivity models.
+    """
+    prefetch = prefetch or int(os.getenv("STRAVA_PAGE_PREFETCH", "4"))
+    params = {"after": _epoch(after), "per_page": per_page}
+    if before is not None:
+        params["before"] = _epoch(before)
+
+    async def _page(number):
+        return await api_get("/athlete/activities", {**params, "page": number})
+
+    items = await _page(1)
+    results = list(items)
+    more = len(items) == per_page
+    next_page = 2
+    while more:
+        pages = await asyncio.gather(*(_page(n) for n in range(next_page, next_page + prefetch)))
+        for page in pages:
+            results.extend(page)
+            if len(page) < per_page:
+                more = False
+                break
+        next_page += prefetch
+
+    return [SummaryActivity.model_validate(item) for item in results]
+
+
+def reset_client():
+    """Drop the shared clients so the next call rebuilds them."""
+    with _STATE.lock:
+        if _STATE.session is not None:
+            _STATE.session.close()
+        _STATE.token = None
+        _STATE.client = None
+        _STATE.session = None
+        _STATE.athlete_id = None
+        _STATE.async_clients = {}
@@ -0,0 +1,122 @@
+import os
+import time
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from langchain_core.messages import AIMessage, ToolMessage
+
+from .client import run_async
+from .telemetry import span
+
+
+def _timeout_message(call, timeout: float) -> ToolMessage:
+    return ToolMessage(
+        content=f"Error: {call['name']} timed out after {timeout:g}s and was cancelled; no result. "
+                "Answer from the other tool results, or retry with a narrower request.",
+        tool_call_id=call["id"],
+        name=call["name"],
+        status="error",
+    )
+
+
+def _error_message(call, error) -> ToolMessage:
+    return ToolMessage(content=f"Error: {error}", tool_call_id=call["id"], name=call["name"], status="error")
+
+
+class ToolExecutor:
+    """
+    Graph node that runs the tool calls of the last AI message concurrently.
+
+    Each call gets its own deadline (`timeouts[name]`, else `default_timeout`
+    seconds). A call that misses it is cancelled and answered with an
+    "Error: ... timed out" ToolMessage, so the turn continues with partial
+    results instead of waiting on the slowest Strava request. In the async
+    path, cancelling the graph run (e.g. when the Chainlit user disconnects)
+    cancels every call still in flight.
+    """
+
+    def __init__(self, tools: list, default_timeout: float = None, timeouts: dict = None):
+        self.tools_by_name = {t.name: t for t in tools}
+        if default_timeout is None:
+            default_timeout = float(os.getenv("TOOL_TIMEOUT", "30"))
+        self.default_timeout = default_timeout
+        self.timeouts = dict(timeouts or {})
+
+    def timeout_for(self, name: str) -> float:
+        return self.timeouts.get(name, self.default_timeout)
+
+    def _tool_calls(self, state):
+        last = state["messages"][-1]
+        return last.tool_calls if isinstance(last, AIMessage) else []
+
+    def _run_one(self, call, config):
+        tool = self.tools_by_name[call["name"]]
+        with span("tool", call["name"]) as current:
+            if getattr(tool, "func", None) is None and getattr(tool, "coroutine", None) is not None:
+                # Async-only tools run on a private loop in the worker thread
+                message = run_async(tool.ainvoke(call, config))
+            else:
+                message = tool.invoke(call, config)
+            current.observe(message)
+        return message
+
+    def invoke(self, state, config=None):
+        """Blocking path (app.invoke): calls run on worker threads and are abandoned past their deadline."""
+        calls = self._tool_calls(state)
+        if not calls:
+            return {}
+
+        pool = ThreadPoolExecutor(max_workers=len(calls), thread_name_prefix="tool")
+        try:
+            futures = {}
+            for call in calls:
+                if call["name"] in self.tools_by_name:
+                    # Each worker gets a copy of the context so its span nests under the tools node
+                    futures[call["id"]] = pool.submit(contextvars.copy_context().run, self._run_one, call, config)
+            started = time.monotonic()
+
+            messages = []
+            for call in calls:
+                future = futures.get(call["id"])
+                if future is None:
+                    messages.append(_error_message(call, f"unknown tool {call['name']}"))
+                    continue
+                timeout = self.timeout_for(call["name"])
+                try:
+                    messages.append(future.result(timeout=max(0.0, started + timeout - time.monotonic())))
+                except FutureTimeoutError:
+                    future.cancel()
+                    messages.append(_timeout_message(call, timeout))
+                except Exception as e:
+                    messages.append(_error_message(call, e))
+        finally:
+            # Threads can't be interrupted; stragglers finish in the background and are discarded
+            pool.shutdown(wait=False, cancel_futures=True)
+        return {"messages": messages}
+
+    async def ainvoke(self, state, config=None):
+        """Non-blocking path (app.ainvoke/astream): calls are tasks cancelled at their deadline."""
+        calls = self._tool_calls(state)
+        if not calls:
+            return {}
+
+        async def _run(call):
+            tool = self.tools_by_name.get(call["name"])
+            if tool is None:
+                return _error_message(call, f"unknown tool {call['name']}")
+            timeout = self.timeout_for(call["name"])
+            with span("tool", call["name"]) as current:
+                try:
+                    message = await asyncio.wait_for(tool.ainvoke(call, config), timeout)
+                except asyncio.TimeoutError:
+                    current.error = "timeout"
+                    message = _timeout_message(call, timeout)
+                except Exception as e:
+                    current.error = type(e).__name__
+                    message = _error_message(call, e)
+                current.observe(message)
+                return message
+
+        # gather cancels every child task if the run itself is cancelled
+        return {"messages": list(await asyncio.gather(*(_run(call) for call in calls)))}
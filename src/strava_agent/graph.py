@@ -1,12 +1,17 @@
+import os
 import json
+from functools import partial
 from typing import TypedDict, Annotated
-from langchain_core.messages import ToolMessage, SystemMessage
+from langchain_core.messages import ToolMessage, SystemMessage, HumanMessage, AIMessage, RemoveMessage
 from langgraph.graph import StateGraph, START
 from langgraph.graph.message import add_messages
-from langgraph.prebuilt import ToolNode, tools_condition
+from langgraph.prebuilt import tools_condition
 from langchain_core.language_models import BaseChatModel
 
-from .tools import get_athlete_stats, get_activities_in_range, get_activity_information
+from .tools import get_athlete_stats, get_activities_in_range, get_activity_information, get_activities_details, aggregate_activities, get_top_activities, analyze_streams, get_personal_records, get_training_trends
+from .router import parse_intent, plan_tool_calls
+from .executor import ToolExecutor
+from .telemetry import traced_node
 
 class AgentState(TypedDict):
     messages: Annotated[list, add_messages]
@@ -14,69 +19,264 @@ class AgentState(TypedDict):
 def reasoner_node(state: AgentState, llm_with_tools):
     return {"messages": [llm_with_tools.invoke(state["messages"])]}
 
+# Number of longest activities listed in the analysis so the LLM doesn't need follow-up lookups
+_TOP_N = 3
+
+def _trailing_tool_messages(messages):
+    """Return the ToolMessages produced by the most recent tools step."""
+    batch = []
+    for message in reversed(messages):
+        if not isinstance(message, ToolMessage):
+            break
+        batch.append(message)
+    return list(reversed(batch))
+
+def _is_activity_list(message):
+    return (
+        isinstance(message, ToolMessage)
+        and message.name == "get_activities_in_range"
+        and "No activities" not in message.content
+        and "Error" not in message.content
+    )
+
+def parse_activity_columns(payloads):
+    """
+    Parse JSONL tool payloads in a single pass into columnar lists
+    (id, name, type, distance_km, start_date), de-duplicated by id.
+    """
+    lines = [line for payload in payloads for line in payload.strip().split("\n") if line.strip()]
+    try:
+        records = json.loads("[" + ",".join(lines) + "]")
+    except json.JSONDecodeError:
+        # Fall back to line-by-line parsing, skipping malformed lines
+        records = []
+        for line in lines:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+
+    seen = set()
+    unique = []
+    for record in records:
+        activity_id = record.get("id")
+        if activity_id is not None:
+            if activity_id in seen:
+                continue
+            seen.add(activity_id)
+        unique.append(record)
+
+    return {
+        "id": [r.get("id") for r in unique],
+        "name": [r.get("name") for r in unique],
+        "type": [r.get("type", "Unknown") for r in unique],
+        "distance_km": [float(r.get("distance_km") or 0.0) for r in unique],
+        "start_date": [r.get("start_date") for r in unique],
+    }
+
+def summarize_activity_columns(columns, top_n: int = _TOP_N) -> str:
+    """Compute per-type counts and distance statistics, the date span and the top-N longest activities."""
+    types = columns["type"]
+    distances = columns["distance_km"]
+    total_count = len(types)
+
+    # Count by type, with distance totals and maxima
+    stats = {}
+    for a_type, distance in zip(types, distances):
+        entry = stats.setdefault(a_type, [0, 0.0, 0.0])
+        entry[0] += 1
+        entry[1] += distance
+        entry[2] = max(entry[2], distance)
+
+    breakdown = ", ".join([f"{k}: {v[0]}" for k, v in stats.items()])
+    per_type = "; ".join(
+        f"{k}: total {v[1]:.2f} km, mean {v[1] / v[0]:.2f} km, max {v[2]:.2f} km" for k, v in stats.items()
+    )
+    parts = [f"The tool returned {total_count} activities."]
+
+    dates = [d for d in columns["start_date"] if d]
+    if dates:
+        parts.append(f"Date span: {min(dates)[:10]} to {max(dates)[:10]}.")
+    parts.append(f"Breakdown: {breakdown}.")
+    if any(distances):
+        parts.append(f"Distance by type: {per_type}.")
+
+        order = sorted(range(total_count), key=lambda i: distances[i], reverse=True)[:top_n]
+        longest = "; ".join(
+            f"id {columns['id'][i]} \"{columns['name'][i]}\" ({types[i]}, {distances[i]:.2f} km, {(columns['start_date'][i] or '')[:10]})"
+            for i in order
+        )
+        parts.append(f"Longest activities: {longest}.")
+
+    return " ".join(parts)
+
 def post_process_node(state: AgentState):
     """
-    A deterministic node that runs after tools to calculate summaries (like counts)
-    so the LLM doesn't have to count raw JSON lines.
+    A deterministic node that runs after tools to calculate summaries (counts,
+    distance statistics, longest candidates) so the LLM doesn't have to read
+    raw JSON lines or fetch details just to find the longest activity.
     """
-    messages = state["messages"]
-    last_message = messages[-1]
-    
-    # Check if the last message is from our specific tool
-    if isinstance(last_message, ToolMessage) and last_message.name == "get_activities_in_range":
-        content = last_message.content
-        if "No activities" not in content and "Error" not in content:
-            # Parse JSONL to get stats
-            lines = content.strip().split('\n')
-            total_count = len(lines)
-            
-            # Count by type
-            type_counts = {}
-            for line in lines:
-                try:
-                    activity = json.loads(line)
-                    a_type = activity.get("type", "Unknown")
-                    type_counts[a_type] = type_counts.get(a_type, 0) + 1
-                except json.JSONDecodeError:
-                    continue
-
-            # Format breakdown
-            breakdown = ", ".join([f"{k}: {v}" for k, v in type_counts.items()])
-            
-            # Inject a system message with the hard fact to guide the LLM
-            return {"messages": [SystemMessage(content=f"SYSTEM ANALYSIS: The tool returned {total_count} activities. Breakdown: {breakdown}. The full list with IDs is available in the context above for specific inquiries.")]}
-    return {}
+    # All activity lists from the last tools step are analyzed together
+    payloads = [m.content for m in _trailing_tool_messages(state["messages"]) if _is_activity_list(m)]
+    if not payloads:
+        return {}
+
+    columns = parse_activity_columns(payloads)
+    if not columns["type"]:
+        return {}
+
+    summary = summarize_activity_columns(columns)
+    # Inject a system message with the hard facts to guide the LLM
+    return {"messages": [SystemMessage(content=f"SYSTEM ANALYSIS: {summary} Use these figures directly; the full list with IDs is available in the context above for other inquiries.")]}
 
 def route_tools(state: AgentState):
-    """Determine if we need post-processing based on the last tool called."""
+    """Determine if we need post-processing based on the tools called in the last step."""
     messages = state["messages"]
-    last_message = messages[-1]
     
-    if isinstance(last_message, ToolMessage) and last_message.name == "get_activities_in_range":
+    if any(m.name == "get_activities_in_range" for m in _trailing_tool_messages(messages)):
         return "post_process"
     return "agent"
 
-def build_graph(llm: BaseChatModel, tools: list = None):
-    """Build the agent graph with the given LLM and tools."""
+# Rough token estimate used for budgeting the prompt; exact counts depend on the model's tokenizer
+_CHARS_PER_TOKEN = 4
+_COMPACTED = "[compacted]"
+
+def _estimate_tokens(message) -> int:
+    size = len(str(message.content))
+    if isinstance(message, AIMessage) and message.tool_calls:
+        size += len(json.dumps([call["args"] for call in message.tool_calls]))
+    return size // _CHARS_PER_TOKEN + 1
+
+def _summarize_tool_message(message) -> str:
+    """Replace a raw tool payload with a short summary of what it contained."""
+    if _is_activity_list(message):
+        columns = parse_activity_columns([message.content])
+        if columns["type"]:
+            return f"{_COMPACTED} {summarize_activity_columns(columns)}"
+    content = str(message.content)
+    if len(content) <= 200:
+        return content
+    return f"{_COMPACTED} {content[:200]}... ({len(content) - 200} more characters omitted)"
+
+def compact_node(state: AgentState, token_budget: int, keep_turns: int):
+    """
+    Keep the prompt within a token budget before the agent runs.
+
+    The leading system prompt and the last `keep_turns` user turns stay verbatim.
+    In older turns, raw tool payloads are replaced (by message id) with compact
+    summaries; if the history is still over budget, the oldest turns are removed.
+    """
+    messages = state["messages"]
+    head = 0
+    while head < len(messages) and isinstance(messages[head], SystemMessage):
+        head += 1
+
+    # Split the conversation into turns, each starting at a user message
+    turns = []
+    for message in messages[head:]:
+        if isinstance(message, HumanMessage) or not turns:
+            turns.append([])
+        turns[-1].append(message)
+
+    old_turns = turns[:-keep_turns] if keep_turns else turns
+    updates = []
+    sizes = {id(m): _estimate_tokens(m) for m in messages}
+
+    for turn in old_turns:
+        for message in turn:
+            if isinstance(message, ToolMessage) and not str(message.content).startswith(_COMPACTED):
+                summary = _summarize_tool_message(message)
+                if summary != message.content:
+                    compacted = message.model_copy(update={"content": summary})
+                    updates.append(compacted)
+                    sizes[id(message)] = _estimate_tokens(compacted)
+
+    total = sum(sizes.values())
+    for turn in old_turns:
+        if total <= token_budget:
+            break
+        for message in turn:
+            updates = [u for u in updates if u.id != message.id]
+            updates.append(RemoveMessage(id=message.id))
+            total -= sizes[id(message)]
+
+    return {"messages": updates} if updates else {}
+
+def router_node(state: AgentState, tool_names):
+    """
+    A deterministic node ahead of the agent that answers the planning step for
+    templated questions (counts, totals, the longest activity over a named period, all-time records)
+    by emitting the tool calls itself, so the LLM is only used for the final wording.
+    """
+    last = state["messages"][-1]
+    if not isinstance(last, HumanMessage):
+        return {}
+    intent = parse_intent(str(last.content))
+    if intent is None:
+        return {}
+    tool_calls = plan_tool_calls(intent, tool_names)
+    if not tool_calls:
+        return {}
+    return {"messages": [AIMessage(content="", tool_calls=tool_calls)]}
+
+def route_fast_path(state: AgentState):
+    """Run the router's tool calls directly, or hand the question to the agent."""
+    last = state["messages"][-1]
+    if isinstance(last, AIMessage) and last.tool_calls:
+        return "tools"
+    return "agent"
+
+def build_graph(llm: BaseChatModel, tools: list = None, token_budget: int = None, keep_turns: int = None,
+                checkpointer=None, fast_path: bool = None, tool_timeout: float = None, tool_timeouts: dict = None):
+    """
+    Build the agent graph with the given LLM and tools.
+
+    Args:
+        llm: The chat model.
+        tools: Tools to bind (defaults to all Strava tools).
+        token_budget: Approximate prompt budget for history compaction (HISTORY_TOKEN_BUDGET).
+        keep_turns: Number of recent user turns kept verbatim (HISTORY_KEEP_TURNS).
+        checkpointer: Optional LangGraph checkpoint saver (e.g. DuckDBSaver). When set, state is
+            persisted per `thread_id` and callers only send the new message each turn.
+        fast_path: Route templated questions to their tools without an LLM planning step (FAST_PATH_ROUTER).
+        tool_timeout: Seconds each tool call may run before it is cancelled (TOOL_TIMEOUT).
+        tool_timeouts: Optional per-tool overrides of `tool_timeout`, keyed by tool name.
+    """
     if tools is None:
-        tools = [get_athlete_stats, get_activities_in_range, get_activity_information]
+        tools = [get_athlete_stats, get_activities_in_range, get_activity_information, get_activities_details, aggregate_activities, get_top_activities, analyze_streams, get_personal_records, get_training_trends]
+    if token_budget is None:
+        token_budget = int(os.getenv("HISTORY_TOKEN_BUDGET", "6000"))
+    if keep_turns is None:
+        keep_turns = int(os.getenv("HISTORY_KEEP_TURNS", "2"))
+    if fast_path is None:
+        fast_path = os.getenv("FAST_PATH_ROUTER", "1") == "1"
 
     llm_with_tools = llm.bind_tools(tools)
 
     # Build Graph
     builder = StateGraph(AgentState)
     
-    # Use a lambda or partial to pass the bound LLM to the node
-    builder.add_node("agent", lambda state: reasoner_node(state, llm_with_tools))
-    builder.add_node("tools", ToolNode(tools))
-    builder.add_node("post_process", post_process_node)
+    # Use a lambda or partial to pass the bound LLM to the node.
+    # Every node is wrapped in a span that records its wall time, tokens and payload size.
+    builder.add_node("compact", traced_node("compact", partial(compact_node, token_budget=token_budget, keep_turns=keep_turns)))
+    builder.add_node("agent", traced_node("agent", lambda state: reasoner_node(state, llm_with_tools)))
+    # Tool calls run concurrently, each under its own deadline
+    executor = ToolExecutor(tools, default_timeout=tool_timeout, timeouts=tool_timeouts)
+    builder.add_node("tools", traced_node("tools", executor.invoke, afunc=executor.ainvoke))
+    builder.add_node("post_process", traced_node("post_process", post_process_node))
 
-    builder.add_edge(START, "agent")
+    builder.add_edge(START, "compact")
+    if fast_path:
+        builder.add_node("router", traced_node("router", partial(router_node, tool_names={t.name for t in tools})))
+        builder.add_edge("compact", "router")
+        builder.add_conditional_edges("router", route_fast_path, ["tools", "agent"])
+    else:
+        builder.add_edge("compact", "agent")
     builder.add_conditional_edges("agent", tools_condition)
     builder.add_conditional_edges("tools", route_tools, ["post_process", "agent"])
     builder.add_edge("post_process", "agent")
 
-    return builder.compile()
+    return builder.compile(checkpointer=checkpointer)
 
 if __name__ == "__main__":
     # Allow running this file directly to visualize the graph
@@ -1,15 +1,114 @@
 import os
+import time
+import queue
+import atexit
+import logging
+import threading
 import duckdb
 import uuid
 from datetime import datetime
 
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+_FLUSH = object()
+
+
+class BufferedWriter:
+    """
+    Background writer that batches rows into a DuckDB table over one long-lived connection.
+
+    Rows are collected in a bounded queue (callers block when it is full) and
+    written with a single executemany per batch, once `batch_size` rows are
+    pending or `flush_interval` seconds have passed. Pending rows are written
+    on close(), which is also registered to run at interpreter exit.
+    """
+
+    def __init__(self, db_path: str, insert_sql: str, batch_size: int = 100,
+                 flush_interval: float = 1.0, max_queue: int = 10000):
+        self.insert_sql = insert_sql
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._con = duckdb.connect(db_path)
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name="duckdb-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, row: tuple):
+        """Queue a row for the next batch."""
+        if self._closed:
+            raise RuntimeError("BufferedWriter is closed")
+        self._queue.put(row)
+
+    def flush(self):
+        """Block until every queued row has been written."""
+        if self._closed:
+            return
+        # The marker ends the current batch early instead of waiting for the interval
+        self._queue.put(_FLUSH)
+        self._queue.join()
+
+    def close(self):
+        """Write pending rows, stop the writer thread and close the connection."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._con.close()
+        atexit.unregister(self.close)
+
+    def _run(self):
+        while True:
+            batch = []
+            deadline = time.monotonic() + self.flush_interval
+            stop = False
+            while len(batch) < self.batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is _STOP or item is _FLUSH:
+                    self._queue.task_done()
+                    stop = item is _STOP
+                    break
+                batch.append(item)
+
+            if batch:
+                self._write(batch)
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+
+    def _write(self, batch):
+        try:
+            self._con.begin()
+            self._con.executemany(self.insert_sql, batch)
+            self._con.commit()
+        except Exception:
+            self._con.rollback()
+            logger.exception("Error writing %d rows to DuckDB", len(batch))
+
+
 class InteractionLogger:
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, batch_size=None, flush_interval=None):
         if db_path:
             self.db_path = db_path
         else:
             self.db_path = os.getenv("DUCKDB_PATH", "interactions.duckdb")
         self._init_db()
+        self._writer = BufferedWriter(
+            self.db_path,
+            """
+                INSERT INTO interactions (id, session_id, role, content, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            """,
+            batch_size=batch_size or int(os.getenv("LOG_BATCH_SIZE", "100")),
+            flush_interval=flush_interval or float(os.getenv("LOG_FLUSH_INTERVAL", "1.0")),
+        )
 
     def _init_db(self):
         """Initialize the database table if it doesn't exist."""
@@ -26,8 +125,8 @@ class InteractionLogger:
 
     def log(self, session_id: str, role: str, content: str):
         """
-        Log an interaction to the database.
-        
+        Queue an interaction to be written to the database by the background writer.
+
         Args:
             session_id: Unique identifier for the chat session.
             role: The role of the speaker ('user' or 'assistant').
@@ -35,9 +134,13 @@ class InteractionLogger:
         """
         if not content:
             return
-            
-        with duckdb.connect(self.db_path) as con:
-            con.execute("""
-                INSERT INTO interactions (id, session_id, role, content, timestamp)
-                VALUES (?, ?, ?, ?, ?)
-            """, (str(uuid.uuid4()), session_id, role, content, datetime.now()))
+
+        self._writer.write((str(uuid.uuid4()), session_id, role, content, datetime.now()))
+
+    def flush(self):
+        """Block until all queued interactions are written."""
+        self._writer.flush()
+
+    def close(self):
+        """Flush pending interactions and release the database connection."""
+        self._writer.close()
@@ -0,0 +1,94 @@
+import re
+import calendar
+from datetime import date, datetime, timedelta
+
+_MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+_MONTHS.update({name.lower(): number for number, name in enumerate(calendar.month_abbr) if name})
+_MONTH_NAMES = "|".join(sorted(_MONTHS, key=len, reverse=True))
+
+_UNITS = {"day": 1, "days": 1, "week": 7, "weeks": 7}
+
+# Ordered so longer phrases win over their prefixes ("last 3 weeks" before "last week")
+_PATTERNS = [
+    ("rolling", re.compile(r"\b(?:last|past|previous)\s+(\d+)\s+(days?|weeks?|months?)\b")),
+    ("relative", re.compile(r"\b(this|current|last|previous|past)\s+(week|month|year)\b")),
+    ("day", re.compile(r"\b(today|yesterday)\b")),
+    ("month", re.compile(rf"\b(?:in|during|for)\s+({_MONTH_NAMES})\b(?:\s+(\d{{4}}))?")),
+    ("year", re.compile(r"\b(?:in|during|for|of)\s+((?:19|20)\d{2})\b")),
+]
+
+
+def _add_months(value: date, months: int) -> date:
+    index = value.year * 12 + value.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _resolve(kind: str, match: re.Match, today: date):
+    """Return the [start, end) dates for one matched phrase."""
+    if kind == "rolling":
+        count, unit = int(match.group(1)), match.group(2)
+        end = today + timedelta(days=1)
+        if unit.startswith("month"):
+            return _add_months(end, -count).replace(day=min(end.day, 28)), end
+        return end - timedelta(days=count * _UNITS[unit]), end
+
+    if kind == "relative":
+        which, unit = match.groups()
+        if which == "past":
+            # "past week" is the trailing seven days rather than the previous calendar week
+            end = today + timedelta(days=1)
+            if unit == "week":
+                return end - timedelta(weeks=1), end
+            months = 1 if unit == "month" else 12
+            return _add_months(end, -months).replace(day=min(end.day, 28)), end
+        offset = -1 if which in ("last", "previous") else 0
+        if unit == "week":
+            start = today - timedelta(days=today.weekday()) + timedelta(weeks=offset)
+            return start, start + timedelta(weeks=1)
+        if unit == "month":
+            start = _add_months(date(today.year, today.month, 1), offset)
+            return start, _add_months(start, 1)
+        start = date(today.year + offset, 1, 1)
+        return start, date(start.year + 1, 1, 1)
+
+    if kind == "day":
+        start = today if match.group(1) == "today" else today - timedelta(days=1)
+        return start, start + timedelta(days=1)
+
+    if kind == "month":
+        month = _MONTHS[match.group(1)]
+        if match.group(2):
+            year = int(match.group(2))
+        else:
+            # A bare month name means its most recent occurrence
+            year = today.year if month <= today.month else today.year - 1
+        start = date(year, month, 1)
+        return start, _add_months(start, 1)
+
+    year = int(match.group(1))
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def resolve_period(text: str, today: date = None):
+    """
+    Find the first time period named in a question and resolve it to dates.
+
+    Understands "today"/"yesterday", "this/last week|month|year",
+    "last N days|weeks|months", "in <month> [year]" and "in <year>".
+    Weeks start on Monday, like DuckDB's date_trunc('week').
+
+    Args:
+        text: The user's question.
+        today: Reference date (defaults to the current local date).
+
+    Returns:
+        (start, end, phrase) with `end` exclusive, or None if no period was found.
+    """
+    today = today or datetime.now().date()
+    lowered = text.lower()
+    for kind, pattern in _PATTERNS:
+        match = pattern.search(lowered)
+        if match:
+            start, end = _resolve(kind, match, today)
+            return start, end, match.group(0)
+    return None
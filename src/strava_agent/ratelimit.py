@@ -0,0 +1,251 @@
+import os
+import math
+import time
+import asyncio
+import threading
+import contextvars
+from contextlib import contextmanager, asynccontextmanager
+from stravalib.util.limiter import get_rates_from_response_headers
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+
+# Strava resets the short quota every quarter hour and the long quota at UTC midnight
+_SHORT_WINDOW = 15 * 60
+_LONG_WINDOW = 24 * 60 * 60
+
+# Upper bound on a single blocking wait, so threads re-check even without a notification
+_MAX_WAIT = 1.0
+
+_PRIORITY = contextvars.ContextVar("strava_request_priority", default=INTERACTIVE)
+
+_SCHEDULER = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+class _Bucket:
+    """Tokens left in one of Strava's fixed rate-limit windows."""
+
+    def __init__(self, limit: int, window: int):
+        self.limit = limit
+        self.window = window
+        self.used = 0
+        self.period = None
+
+    def refill(self, now: float):
+        period = int(now // self.window)
+        if period != self.period:
+            self.period = period
+            self.used = 0
+
+    def available(self, share: float, margin: int) -> int:
+        return int(self.limit * share) - margin - self.used
+
+    def seconds_until_refill(self, now: float) -> float:
+        return (self.period + 1) * self.window - now
+
+
+class RateLimitScheduler:
+    """
+    Token-bucket scheduler for Strava API calls.
+
+    Each of Strava's quotas (15-minute and daily) is a bucket that refills at
+    the window boundary and is resynced from the X-RateLimit-Usage and
+    X-RateLimit-Limit response headers. Requests wait *before* they are sent
+    once a bucket runs low, instead of after a 429:
+
+    - interactive requests may use the full quota minus `safety_margin`;
+    - background requests (sync, backfill) may only use `background_share` of
+      it, and always yield to waiting interactive requests.
+
+    At most `max_concurrency` requests are in flight at once.
+    """
+
+    def __init__(self, short_limit=None, long_limit=None, max_concurrency=None,
+                 background_share=None, safety_margin=None, clock=time.time):
+        short_limit = short_limit if short_limit is not None else int(os.getenv("STRAVA_RATE_LIMIT_15MIN", "100"))
+        long_limit = long_limit if long_limit is not None else int(os.getenv("STRAVA_RATE_LIMIT_DAILY", "1000"))
+        self.max_concurrency = (
+            max_concurrency if max_concurrency is not None else int(os.getenv("STRAVA_MAX_CONCURRENCY", "5"))
+        )
+        self.background_share = (
+            background_share if background_share is not None else float(os.getenv("STRAVA_BACKGROUND_SHARE", "0.8"))
+        )
+        self.safety_margin = safety_margin if safety_margin is not None else 2
+        self._clock = clock
+
+        self._short = _Bucket(short_limit, _SHORT_WINDOW)
+        self._long = _Bucket(long_limit, _LONG_WINDOW)
+        self._in_flight = 0
+        self._waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        self._cond = threading.Condition()
+        # (event loop, asyncio.Event) of async waiters, set whenever a slot may have freed up
+        self._async_waiters = []
+
+    def _wait_time(self, priority: str) -> float:
+        """
+        Seconds until `priority` may send a request; 0 means now. Caller holds the lock.
+
+        math.inf means the request waits on another one (a free concurrency
+        slot or a waiting interactive request) rather than on a quota refill.
+        """
+        now = self._clock()
+        self._short.refill(now)
+        self._long.refill(now)
+
+        if priority == BACKGROUND and self._waiting[INTERACTIVE]:
+            return math.inf
+        if self._in_flight >= self.max_concurrency:
+            return math.inf
+
+        share = 1.0 if priority == INTERACTIVE else self.background_share
+        wait = 0.0
+        for bucket in (self._short, self._long):
+            if bucket.available(share, self.safety_margin) <= 0:
+                wait = max(wait, bucket.seconds_until_refill(now))
+        return wait
+
+    def _notify(self):
+        # Caller holds the lock; waiters are woken from whichever thread frees a slot
+        self._cond.notify_all()
+        for loop, event in self._async_waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                pass  # The waiter's loop is closed
+        self._async_waiters.clear()
+
+    def _take(self):
+        # Caller holds the lock
+        self._in_flight += 1
+        self._short.used += 1
+        self._long.used += 1
+
+    def try_acquire(self, priority: str = None) -> float:
+        """
+        Take a slot without blocking.
+
+        Returns:
+            0 if the slot was taken, otherwise the number of seconds to wait before
+            retrying (math.inf while waiting for another request to finish).
+        """
+        priority = priority or _PRIORITY.get()
+        with self._cond:
+            wait = self._wait_time(priority)
+            if wait <= 0:
+                self._take()
+            return wait
+
+    def acquire(self, priority: str = None):
+        """Block until a request slot is available for `priority`."""
+        priority = priority or _PRIORITY.get()
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while (wait := self._wait_time(priority)) > 0:
+                    self._cond.wait(timeout=min(wait, _MAX_WAIT))
+            finally:
+                self._waiting[priority] -= 1
+                self._notify()
+            self._take()
+
+    async def aacquire(self, priority: str = None):
+        """
+        Wait without blocking the event loop until a request slot is available.
+
+        A waiter blocked by other requests is woken when a slot is released
+        (or the limits change); only a quota refill is waited for with a timer.
+        """
+        priority = priority or _PRIORITY.get()
+        loop = asyncio.get_running_loop()
+        with self._cond:
+            self._waiting[priority] += 1
+        try:
+            while True:
+                event = asyncio.Event()
+                with self._cond:
+                    wait = self._wait_time(priority)
+                    if wait <= 0:
+                        self._take()
+                        return
+                    self._async_waiters.append((loop, event))
+                try:
+                    await asyncio.wait_for(event.wait(), None if wait == math.inf else wait)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            with self._cond:
+                self._waiting[priority] -= 1
+                self._notify()
+
+    def release(self):
+        """Return a request slot."""
+        with self._cond:
+            self._in_flight -= 1
+            self._notify()
+
+    @contextmanager
+    def slot(self, priority: str = None):
+        self.acquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    @asynccontextmanager
+    async def aslot(self, priority: str = None):
+        await self.aacquire(priority)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def update(self, headers, method: str = "GET", status_code: int = None):
+        """Resync the buckets from Strava's rate-limit response headers."""
+        rates = get_rates_from_response_headers(dict(headers), method)
+        with self._cond:
+            now = self._clock()
+            self._short.refill(now)
+            self._long.refill(now)
+            if rates is not None:
+                self._short.limit = rates.short_limit
+                self._long.limit = rates.long_limit
+                # Other processes share the quota, so the header can be ahead of our own count
+                self._short.used = max(self._short.used, rates.short_usage)
+                self._long.used = max(self._long.used, rates.long_usage)
+            if status_code == 429:
+                # Strava refused anyway: hold everything until the short window refills
+                self._short.used = max(self._short.used, self._short.limit)
+            self._notify()
+
+    def stats(self) -> dict:
+        """Return the current usage, limits and queue sizes."""
+        with self._cond:
+            return {
+                "short_usage": self._short.used,
+                "short_limit": self._short.limit,
+                "long_usage": self._long.used,
+                "long_limit": self._long.limit,
+                "in_flight": self._in_flight,
+                "waiting_interactive": self._waiting[INTERACTIVE],
+                "waiting_background": self._waiting[BACKGROUND],
+            }
+
+
+@contextmanager
+def request_priority(priority: str):
+    """Run Strava calls made inside this block (including in to_thread workers) at `priority`."""
+    token = _PRIORITY.set(priority)
+    try:
+        yield
+    finally:
+        _PRIORITY.reset(token)
+
+
+def get_scheduler() -> RateLimitScheduler:
+    """Return the process-wide scheduler shared by every Strava call."""
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = RateLimitScheduler()
+        return _SCHEDULER
@@ -0,0 +1,119 @@
+# Standard race distances (m) ranked by the fastest average pace over an activity at least that long
+_DISTANCES = {
+    "Run": [("1k", 1000), ("5k", 5000), ("10k", 10000), ("half_marathon", 21097.5), ("marathon", 42195)],
+    "Walk": [("5k", 5000), ("10k", 10000)],
+    "Hike": [("10k", 10000)],
+    "Ride": [("20k", 20000), ("40k", 40000), ("100k", 100000), ("160k", 160000)],
+    "Swim": [("400m", 400), ("1k", 1000), ("1500m", 1500)],
+}
+
+
+def _definitions():
+    """Return (record, type filter, value expression, 'max'|'min', row filter) for every record."""
+    definitions = [
+        ("longest_distance", None, "distance_m", "max", "distance_m > 0"),
+        ("longest_moving_time", None, "moving_time_sec", "max", "moving_time_sec > 0"),
+        ("most_elevation", None, "total_elevation_gain_m", "max", "total_elevation_gain_m > 0"),
+    ]
+    for activity_type, distances in _DISTANCES.items():
+        for label, meters in distances:
+            definitions.append((
+                f"fastest_{label}", activity_type, f"{meters} / average_speed_ms", "min",
+                f"distance_m >= {meters} AND average_speed_ms > 0",
+            ))
+    return definitions
+
+
+RECORDS = [d[0] for d in _definitions()]
+_BETTER = {d[0]: d[3] for d in _definitions()}
+
+
+def init_records(con):
+    """
+    Create the personal records table, building it from existing activities the first time.
+
+    Records are kept per activity type and refreshed in the transaction that
+    writes activities (see refresh_records), so a lookup never scans the history.
+    """
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS personal_records (
+            type VARCHAR,
+            record VARCHAR,
+            activity_id BIGINT,
+            value DOUBLE,
+            start_date_local TIMESTAMP,
+            name VARCHAR,
+            PRIMARY KEY (type, record)
+        )
+    """)
+    empty = con.execute("SELECT count(*) FROM personal_records").fetchone()[0] == 0
+    if empty and con.execute("SELECT count(*) FROM activities").fetchone()[0]:
+        _merge(con, _candidates(con, "TRUE", []))
+
+
+def _candidates(con, where: str, params: list):
+    """Best activity per (type, record) among the activities matching `where`."""
+    queries = []
+    for record, activity_type, expr, better, row_filter in _definitions():
+        type_filter = f" AND type = '{activity_type}'" if activity_type else ""
+        order = "DESC" if better == "max" else "ASC"
+        queries.append(f"""
+            SELECT * FROM (
+                SELECT type, '{record}' AS record, id, {expr} AS value, start_date_local, name
+                FROM candidates WHERE {row_filter}{type_filter}
+                QUALIFY row_number() OVER (PARTITION BY type ORDER BY {expr} {order}, id) = 1
+            )
+        """)
+    sql = f"WITH candidates AS (SELECT * FROM activities WHERE {where}) " + " UNION ALL ".join(queries)
+    return con.execute(sql, params).fetchall()
+
+
+def _merge(con, rows):
+    """Write candidate rows that beat (or replace a missing) current record."""
+    current = {(r[0], r[1]): r[3] for r in con.execute("SELECT * FROM personal_records").fetchall()}
+    winners = []
+    for row in rows:
+        existing = current.get((row[0], row[1]))
+        better = _BETTER[row[1]]
+        if existing is None or (row[3] > existing if better == "max" else row[3] < existing):
+            winners.append(row)
+    if winners:
+        con.executemany("INSERT OR REPLACE INTO personal_records VALUES (?, ?, ?, ?, ?, ?)", winners)
+
+
+def refresh_records(con, activity_ids):
+    """
+    Update the records after the given activities were inserted, edited or deleted.
+
+    Must run on the connection (and transaction) that changed the activities.
+    """
+    if not activity_ids:
+        return
+    ids = list(activity_ids)
+    # A changed or deleted holder may no longer hold its record: rebuild those types from scratch
+    stale_types = [row[0] for row in con.execute(
+        "SELECT DISTINCT type FROM personal_records WHERE activity_id IN (SELECT unnest(?::BIGINT[]))", (ids,)
+    ).fetchall()]
+    if stale_types:
+        con.execute("DELETE FROM personal_records WHERE type IN (SELECT unnest(?::VARCHAR[]))", (stale_types,))
+    _merge(con, _candidates(
+        con,
+        "id IN (SELECT unnest(?::BIGINT[])) OR type IN (SELECT unnest(?::VARCHAR[]))",
+        [ids, stale_types],
+    ))
+
+
+def query_records(con, activity_type: str = None, record: str = None):
+    """Return (columns, rows) of the stored records, optionally filtered by type and record name."""
+    where, params = [], []
+    if activity_type:
+        where.append("lower(type) = lower(?)")
+        params.append(activity_type)
+    if record:
+        where.append("record = ?")
+        params.append(record)
+    sql = "SELECT type, record, value, activity_id, name, start_date_local FROM personal_records"
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    cursor = con.execute(sql + " ORDER BY type, record", params)
+    return [d[0] for d in cursor.description], cursor.fetchall()
@@ -0,0 +1,117 @@
+# Rollup periods and the expression giving each activity's period start (ISO weeks start on Monday)
+PERIODS = {
+    "week": "CAST(date_trunc('week', start_date_local) AS DATE)",
+    "month": "CAST(date_trunc('month', start_date_local) AS DATE)",
+}
+
+
+def init_rollups(con):
+    """
+    Create the weekly/monthly rollup table, building it from existing activities the first time.
+
+    One row per (period, athlete, type, period start). Rows are refreshed in
+    the transaction that writes activities (see refresh_rollups), so trend
+    queries read a few rows per period however long the history is.
+    """
+    con.execute("""
+        CREATE TABLE IF NOT EXISTS activity_rollups (
+            period VARCHAR,
+            athlete_id BIGINT,
+            type VARCHAR,
+            period_start DATE,
+            activities INTEGER,
+            distance_m DOUBLE,
+            moving_time_sec BIGINT,
+            elevation_gain_m DOUBLE,
+            max_distance_m DOUBLE
+        )
+    """)
+    empty = con.execute("SELECT count(*) FROM activity_rollups").fetchone()[0] == 0
+    if empty and con.execute("SELECT count(*) FROM activities").fetchone()[0]:
+        for period in PERIODS:
+            _rebuild(con, period, None)
+
+
+def affected_periods(con, activity_ids) -> dict:
+    """
+    Return the week and month starts holding the given activities, as {period: set of dates}.
+
+    Call it before and after changing the activities: an edited start date or
+    a deleted activity also changes the period it used to belong to.
+    """
+    if not activity_ids:
+        return {period: set() for period in PERIODS}
+    rows = con.execute(f"""
+        SELECT {PERIODS['week']}, {PERIODS['month']} FROM activities
+        WHERE id IN (SELECT unnest(?::BIGINT[]))
+    """, (list(activity_ids),)).fetchall()
+    return {"week": {r[0] for r in rows}, "month": {r[1] for r in rows}}
+
+
+def _rebuild(con, period: str, starts):
+    """Recompute the rollup rows of `period` for the given period starts (None rebuilds all)."""
+    expr = PERIODS[period]
+    where, params = "", []
+    if starts is not None:
+        where = f"WHERE {expr} IN (SELECT unnest(?::DATE[]))"
+        params = [sorted(starts)]
+        con.execute(
+            "DELETE FROM activity_rollups WHERE period = ? AND period_start IN (SELECT unnest(?::DATE[]))",
+            [period, *params],
+        )
+    else:
+        con.execute("DELETE FROM activity_rollups WHERE period = ?", (period,))
+    con.execute(f"""
+        INSERT INTO activity_rollups
+        SELECT '{period}', athlete_id, type, {expr} AS period_start, count(*), sum(distance_m),
+               sum(moving_time_sec), sum(total_elevation_gain_m), max(distance_m)
+        FROM activities {where}
+        GROUP BY athlete_id, type, period_start
+    """, params)
+
+
+def refresh_rollups(con, periods: dict):
+    """
+    Recompute the rollups of the given periods, e.g. from affected_periods().
+
+    Must run on the connection (and transaction) that changed the activities.
+    """
+    for period, starts in periods.items():
+        if starts:
+            _rebuild(con, period, starts)
+
+
+def query_rollups(con, period: str, after, before, activity_type: str = None):
+    """
+    Return (columns, rows) of the rollups whose period starts in [after, before).
+
+    Rows are summed over athletes (and types, unless activity_type is given),
+    with the change in distance against the previous period of the result.
+    """
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+    where = "period = ? AND period_start >= ? AND period_start < ?"
+    params = [period, after, before]
+    if activity_type:
+        where += " AND lower(type) = lower(?)"
+        params.append(activity_type)
+    label = ("isoyear(period_start) || '-W' || lpad(CAST(week(period_start) AS VARCHAR), 2, '0')"
+             if period == "week" else "strftime(period_start, '%Y-%m')")
+    cursor = con.execute(f"""
+        WITH totals AS (
+            SELECT period_start, sum(activities) AS activities, sum(distance_m) AS distance_m,
+                   sum(moving_time_sec) AS moving_time_sec, sum(elevation_gain_m) AS elevation_gain_m,
+                   max(max_distance_m) AS max_distance_m
+            FROM activity_rollups WHERE {where}
+            GROUP BY period_start
+        )
+        SELECT {label} AS {period}, period_start AS starts, activities,
+               round(distance_m / 1000, 2) AS total_km,
+               round(moving_time_sec / 3600, 2) AS moving_hours,
+               round(elevation_gain_m, 0) AS elevation_m,
+               round(max_distance_m / 1000, 2) AS max_km,
+               round(100 * (distance_m / nullif(lag(distance_m) OVER (ORDER BY period_start), 0) - 1), 1) AS km_change_pct
+        FROM totals
+        ORDER BY period_start
+    """, params)
+    return [d[0] for d in cursor.description], cursor.fetchall()
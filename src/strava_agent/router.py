@@ -0,0 +1,128 @@
+import re
+import uuid
+from datetime import date
+
+from .periods import resolve_period
+
+COUNT = "count"
+TOTAL = "total"
+LONGEST = "longest"
+FASTEST = "fastest"
+
+# Activity words mapped to Strava activity types; None means every type
+_TYPES = {
+    "run": "Run", "runs": "Run", "running": "Run", "ran": "Run",
+    "ride": "Ride", "rides": "Ride", "riding": "Ride", "rode": "Ride",
+    "cycling": "Ride", "cycled": "Ride", "bike": "Ride", "biked": "Ride",
+    "swim": "Swim", "swims": "Swim", "swimming": "Swim", "swam": "Swim",
+    "walk": "Walk", "walks": "Walk", "walking": "Walk", "walked": "Walk",
+    "hike": "Hike", "hikes": "Hike", "hiking": "Hike", "hiked": "Hike",
+    "activity": None, "activities": None, "workout": None, "workouts": None,
+}
+_TYPE_WORDS = re.compile(r"\b(" + "|".join(sorted(_TYPES, key=len, reverse=True)) + r")\b")
+
+# Ordered so a distance question ("how many km") is not taken for a count
+_INTENTS = [
+    (TOTAL, re.compile(r"\b(how far|total distance|how much distance|distance in total|mileage"
+                       r"|how many (?:km|kms|kilometers|kilometres|miles))\b")),
+    (COUNT, re.compile(r"\b(how many|number of|count)\b")),
+    (LONGEST, re.compile(r"\b(longest|furthest|farthest)\b")),
+    (FASTEST, re.compile(r"\b(fastest|quickest)\b")),
+]
+
+# Race distances named in "fastest 10k" questions, mapped to personal record names
+_DISTANCES = {
+    "1k": "1k", "5k": "5k", "10k": "10k", "half marathon": "half_marathon", "marathon": "marathon",
+    "20k": "20k", "40k": "40k", "100k": "100k", "160k": "160k", "400m": "400m", "1500m": "1500m",
+}
+_DISTANCE_WORDS = re.compile(r"\b(" + "|".join(sorted(_DISTANCES, key=len, reverse=True)) + r")\b")
+
+# Phrases the fast path cannot answer faithfully (comparisons, several periods, follow-ups, splits)
+_UNSUPPORTED = re.compile(r"\b(compare|compared|versus|vs|than|each|per|average|those|these|them|it|splits?)\b")
+
+
+def parse_intent(question: str, today: date = None):
+    """
+    Recognize a templated question that needs no planning by the LLM.
+
+    Handles counts, total distance and the longest activity over one named
+    period, optionally for one activity type ("How many runs last week?",
+    "How far did I ride in June?", "Longest run this year"). Longest/fastest
+    without a period are all-time records ("What's my fastest 10k?"); the
+    fastest activity within a period is left to the LLM.
+
+    Args:
+        question: The user's question.
+        today: Reference date for the period (defaults to the current local date).
+
+    Returns:
+        A dict with intent, activity_type, start_date and end_date (exclusive,
+        'YYYY-MM-DD', both None for all-time records) and the named race
+        distance, or None if the question should go to the LLM.
+    """
+    lowered = question.lower()
+    period = resolve_period(lowered, today)
+    if period is None:
+        start = end = None
+        rest = lowered
+    else:
+        start, end, phrase = period
+        rest = lowered.replace(phrase, " ", 1)
+        if resolve_period(rest, today) is not None:
+            return None
+    if _UNSUPPORTED.search(rest):
+        return None
+
+    intent = next((name for name, pattern in _INTENTS if pattern.search(rest)), None)
+    if intent is None or (period is None and intent not in (LONGEST, FASTEST)):
+        return None
+    if period is not None and intent == FASTEST:
+        # Listed activities carry no pace and post_process_node ranks them by distance
+        return None
+
+    types = {_TYPES[word] for word in _TYPE_WORDS.findall(rest)}
+    if len(types) > 1:
+        return None
+    activity_type = types.pop() if types else None
+    if intent == COUNT and not _TYPE_WORDS.search(rest):
+        # "how many" without an activity word is ambiguous (hours? kudos?)
+        return None
+
+    distance = _DISTANCE_WORDS.search(rest)
+    return {
+        "intent": intent,
+        "activity_type": activity_type,
+        "start_date": start.isoformat() if start else None,
+        "end_date": end.isoformat() if end else None,
+        "distance": _DISTANCES[distance.group(1)] if distance else None,
+    }
+
+
+def plan_tool_calls(intent: dict, tool_names) -> list:
+    """
+    Turn a parsed intent into the tool calls the agent would have made.
+
+    Counts and totals are one aggregate query. Longest is a top-N query over
+    the period, so only the few longest activities reach the prompt instead
+    of the whole period; without a period, longest and fastest are a
+    personal records lookup. Returns an empty list when the needed tool is not bound.
+    """
+    dates = {"start_date": intent["start_date"], "end_date": intent["end_date"]}
+    if intent["start_date"] is None:
+        name = "get_personal_records"
+        if intent["intent"] == LONGEST:
+            record = "longest_distance"
+        else:
+            record = f"fastest_{intent['distance']}" if intent["distance"] else ""
+        args = {"activity_type": intent["activity_type"] or "", "record": record}
+    elif intent["intent"] in (COUNT, TOTAL):
+        name = "aggregate_activities"
+        args = {**dates, "group_by": "none" if intent["activity_type"] else "type",
+                "activity_type": intent["activity_type"] or ""}
+    else:
+        name = "get_top_activities"
+        args = {**dates, "rank_by": "distance", "activity_type": intent["activity_type"] or ""}
+
+    if name not in tool_names:
+        return []
+    return [{"name": name, "args": args, "id": f"route_{uuid.uuid4().hex}", "type": "tool_call"}]
@@ -0,0 +1,449 @@
+import os
+import asyncio
+import threading
+import weakref
+import duckdb
+from datetime import datetime, timedelta, timezone
+
+from .records import init_records, refresh_records, query_records
+from .rollups import init_rollups, affected_periods, refresh_rollups, query_rollups
+
+# Strava filters on UTC epochs while users ask in local dates, so pad older
+# gap fetches by a day to cover any timezone offset.
+_TZ_MARGIN = timedelta(days=1)
+
+_STORES = {}
+
+# Every write updates the single data version row (and the derived indexes), so
+# concurrent DuckDB transactions would conflict: writers take turns instead.
+_WRITE_LOCK = threading.Lock()
+
+# Whitelisted GROUP BY expressions for aggregate(); values are (column name, SQL expression)
+_GROUPINGS = {
+    "none": [],
+    "type": [("type", "type")],
+    "week": [("week", "CAST(date_trunc('week', start_date_local) AS DATE)")],
+    "month": [("month", "CAST(date_trunc('month', start_date_local) AS DATE)")],
+    "type_week": [("type", "type"), ("week", "CAST(date_trunc('week', start_date_local) AS DATE)")],
+    "type_month": [("type", "type"), ("month", "CAST(date_trunc('month', start_date_local) AS DATE)")],
+}
+
+# Whitelisted ORDER BY columns for top_activities(), best first
+_RANKINGS = {
+    "distance": "distance_m",
+    "moving_time": "moving_time_sec",
+    "elevation": "total_elevation_gain_m",
+    "speed": "average_speed_ms",
+}
+
+
+def _naive_utc(value):
+    """Convert an aware datetime to naive UTC; naive values are assumed UTC."""
+    if value is None:
+        return None
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _naive_local(value):
+    """Drop the tzinfo Strava attaches to local timestamps."""
+    if value is None:
+        return None
+    return value.replace(tzinfo=None)
+
+
+def _enum_value(value):
+    """Unwrap stravalib's RootModel enums (e.g. RelaxedActivityType) to their string."""
+    if value is None:
+        return None
+    return str(getattr(value, "root", value))
+
+
+def activity_row(activity):
+    """Convert a stravalib activity into a tuple matching the activities table."""
+    athlete = getattr(activity, "athlete", None)
+    return (
+        activity.id,
+        getattr(athlete, "id", None),
+        activity.name,
+        _enum_value(activity.type),
+        _enum_value(getattr(activity, "sport_type", None)) or _enum_value(activity.type),
+        _naive_utc(activity.start_date),
+        _naive_local(activity.start_date_local),
+        float(activity.distance) if activity.distance else 0.0,
+        int(activity.moving_time) if activity.moving_time else 0,
+        int(activity.elapsed_time) if activity.elapsed_time else 0,
+        float(activity.total_elevation_gain) if activity.total_elevation_gain else 0.0,
+        float(activity.average_speed) if activity.average_speed else 0.0,
+        float(activity.max_speed) if activity.max_speed else 0.0,
+        datetime.now(),
+    )
+
+
+def _fetched_recent(windows) -> bool:
+    """Whether the windows include the open-ended one up to now."""
+    return any(before is None for _, before in windows)
+
+
+class ActivityStore:
+    """
+    Local DuckDB copy of the athlete's activity summaries.
+
+    The store keeps a contiguous coverage window [synced_from, synced_at].
+    Range queries only hit the Strava API for the part of the window that is
+    missing: older history before synced_from, and activities newer than the
+    latest stored start_date once sync_interval has elapsed.
+    """
+
+    def __init__(self, db_path=None, sync_interval=None):
+        if db_path:
+            self.db_path = db_path
+        else:
+            self.db_path = os.getenv("DUCKDB_PATH", "interactions.duckdb")
+        if sync_interval is None:
+            sync_interval = float(os.getenv("STRAVA_SYNC_INTERVAL", "60"))
+        self.sync_interval = sync_interval
+        # One sync at a time, so concurrent tool calls don't fetch the same windows twice:
+        # a thread lock for sync() and an asyncio lock per event loop for async_sync()
+        self._sync_lock = threading.Lock()
+        self._async_sync_locks = weakref.WeakKeyDictionary()
+        self._async_locks_guard = threading.Lock()
+        self._init_db()
+
+    def _init_db(self):
+        """Initialize the activity and sync state tables if they don't exist."""
+        with duckdb.connect(self.db_path) as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS activities (
+                    id BIGINT PRIMARY KEY,
+                    athlete_id BIGINT,
+                    name VARCHAR,
+                    type VARCHAR,
+                    sport_type VARCHAR,
+                    start_date TIMESTAMP,
+                    start_date_local TIMESTAMP,
+                    distance_m DOUBLE,
+                    moving_time_sec INTEGER,
+                    elapsed_time_sec INTEGER,
+                    total_elevation_gain_m DOUBLE,
+                    average_speed_ms DOUBLE,
+                    max_speed_ms DOUBLE,
+                    updated_at TIMESTAMP
+                );
+                -- No secondary index on start_date_local: zonemaps already prune range scans, and with
+                -- an ART index INSERT OR REPLACE keeps the old value of the indexed column on DuckDB 1.4
+                DROP INDEX IF EXISTS idx_activities_start_local;
+                CREATE TABLE IF NOT EXISTS activity_sync_state (
+                    id INTEGER PRIMARY KEY,
+                    synced_from TIMESTAMP,
+                    synced_at TIMESTAMP
+                );
+                CREATE TABLE IF NOT EXISTS activity_data_version (
+                    id INTEGER PRIMARY KEY,
+                    version BIGINT
+                );
+            """)
+            init_records(con)
+            init_rollups(con)
+
+    def coverage(self):
+        """Return (synced_from, synced_at, latest_start_date) or None if never synced."""
+        with duckdb.connect(self.db_path) as con:
+            state = con.execute("SELECT synced_from, synced_at FROM activity_sync_state WHERE id = 1").fetchone()
+            if not state:
+                return None
+            latest = con.execute("SELECT max(start_date) FROM activities").fetchone()[0]
+        return state[0], state[1], latest
+
+    def pending_windows(self, after: datetime, now: datetime = None):
+        """
+        Return the (after, before) windows that must be fetched from Strava so the
+        store covers everything from `after` until now. `before=None` means "until now".
+        """
+        now = now or datetime.now()
+        state = self.coverage()
+        if state is None:
+            return [(after - _TZ_MARGIN, None)]
+
+        synced_from, synced_at, latest = state
+        windows = []
+        if after < synced_from:
+            windows.append((after - _TZ_MARGIN, synced_from))
+        if (now - synced_at).total_seconds() >= self.sync_interval:
+            windows.append((latest or synced_from, None))
+        return windows
+
+    def upsert(self, activities) -> int:
+        """
+        Insert or replace activity summaries. Returns the number of rows written.
+
+        The data version is bumped when a row is new or differs from the stored
+        one, so refetching unchanged activities does not invalidate anything.
+        Writes from all threads are serialized by a process-wide lock.
+        """
+        rows = [activity_row(a) for a in activities]
+        if not rows:
+            return 0
+        with _WRITE_LOCK, duckdb.connect(self.db_path) as con:
+            con.begin()
+            changed = self._changed_rows(con, rows)
+            changed_ids = [r[0] for r in changed]
+            # Periods the changed activities belonged to before this write
+            previous = affected_periods(con, changed_ids)
+            con.executemany("""
+                INSERT OR REPLACE INTO activities VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            if changed:
+                self._bump_version(con)
+                # Derived indexes are updated in the same transaction, from the changed rows only
+                refresh_records(con, changed_ids)
+                current = affected_periods(con, changed_ids)
+                refresh_rollups(con, {period: previous[period] | current[period] for period in current})
+            con.commit()
+        return len(rows)
+
+    def delete(self, activity_ids) -> int:
+        """
+        Remove activities (e.g. deleted on Strava). Returns the number of rows removed.
+
+        Records and rollups are refreshed and the data version bumped in the
+        same transaction, as in upsert().
+        """
+        ids = list(activity_ids)
+        if not ids:
+            return 0
+        with _WRITE_LOCK, duckdb.connect(self.db_path) as con:
+            con.begin()
+            previous = affected_periods(con, ids)
+            removed = con.execute(
+                "DELETE FROM activities WHERE id IN (SELECT unnest(?::BIGINT[]))", (ids,)
+            ).fetchone()[0]
+            if removed:
+                self._bump_version(con)
+                refresh_records(con, ids)
+                refresh_rollups(con, previous)
+            con.commit()
+        return removed
+
+    def _changed_rows(self, con, rows):
+        """Return the rows that are new or differ from the stored ones (ignoring updated_at)."""
+        existing = {
+            row[0]: row
+            for row in con.execute(
+                "SELECT * EXCLUDE (updated_at) FROM activities WHERE id IN (SELECT unnest(?::BIGINT[]))",
+                ([r[0] for r in rows],),
+            ).fetchall()
+        }
+        return [r for r in rows if existing.get(r[0]) != r[:-1]]
+
+    def _bump_version(self, con):
+        con.execute("""
+            INSERT INTO activity_data_version VALUES (1, 1)
+            ON CONFLICT (id) DO UPDATE SET version = version + 1
+        """)
+
+    def data_version(self) -> int:
+        """Return a counter that changes whenever stored activity data changes."""
+        with duckdb.connect(self.db_path) as con:
+            row = con.execute("SELECT version FROM activity_data_version WHERE id = 1").fetchone()
+        return row[0] if row else 0
+
+    def mark_synced(self, after: datetime, synced_at: datetime = None):
+        """
+        Extend the coverage window to start at `after` (if earlier).
+
+        `synced_at` is only given when the recent gap (the open-ended window)
+        was fetched; back-filling older history leaves it unchanged, so the
+        next sync still pulls new activities once sync_interval has elapsed.
+        """
+        with _WRITE_LOCK, duckdb.connect(self.db_path) as con:
+            current = con.execute("SELECT synced_from, synced_at FROM activity_sync_state WHERE id = 1").fetchone()
+            synced_from = min(after, current[0]) if current else after
+            synced_at = synced_at or (current[1] if current else None)
+            con.execute("INSERT OR REPLACE INTO activity_sync_state VALUES (1, ?, ?)", (synced_from, synced_at))
+
+    def sync(self, client, after: datetime, now: datetime = None) -> int:
+        """
+        Fetch the missing windows from Strava so the store covers `after` until now.
+
+        Args:
+            client: A stravalib Client.
+            after: The earliest local date the caller needs.
+            now: Reference time (defaults to now).
+
+        Returns:
+            The number of activities written.
+        """
+        with self._sync_lock:
+            # Computed under the lock: a sync that just finished leaves nothing to fetch
+            now = now or datetime.now()
+            windows = self.pending_windows(after, now)
+            written = 0
+            for window_after, window_before in windows:
+                written += self.upsert(client.get_activities(after=window_after, before=window_before))
+            self.mark_synced(after, now if _fetched_recent(windows) else None)
+        return written
+
+    async def async_sync(self, fetch, after: datetime, now: datetime = None) -> int:
+        """
+        Non-blocking counterpart of sync().
+
+        Args:
+            fetch: Coroutine function (after, before) returning activities, e.g. client.fetch_activities.
+            after: The earliest local date the caller needs.
+            now: Reference time (defaults to now).
+
+        Returns:
+            The number of activities written.
+        """
+        async with self._async_sync_lock():
+            now = now or datetime.now()
+            windows = await asyncio.to_thread(self.pending_windows, after, now)
+            # Independent windows (older history and the recent gap) are fetched concurrently
+            batches = await asyncio.gather(*(fetch(window_after, window_before) for window_after, window_before in windows))
+            written = 0
+            for activities in batches:
+                written += await asyncio.to_thread(self.upsert, activities)
+            await asyncio.to_thread(self.mark_synced, after, now if _fetched_recent(windows) else None)
+        return written
+
+    def _async_sync_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        with self._async_locks_guard:
+            if loop not in self._async_sync_locks:
+                self._async_sync_locks[loop] = asyncio.Lock()
+            return self._async_sync_locks[loop]
+
+    def query_range(self, after: datetime, before: datetime):
+        """Return activity rows (as dicts) with a local start date in [after, before)."""
+        with duckdb.connect(self.db_path) as con:
+            cursor = con.execute("""
+                SELECT * FROM activities
+                WHERE start_date_local >= ? AND start_date_local < ?
+                ORDER BY start_date_local
+            """, (after, before))
+            columns = [d[0] for d in cursor.description]
+            return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    def personal_records(self, activity_type: str = None, record: str = None):
+        """
+        Return the precomputed personal records.
+
+        Args:
+            activity_type: Optional case-insensitive filter on the activity type.
+            record: Optional record name (see records.RECORDS).
+
+        Returns:
+            (columns, rows) with type, record, value, activity_id, name and start_date_local.
+        """
+        with duckdb.connect(self.db_path) as con:
+            return query_records(con, activity_type, record)
+
+    def rollups(self, period: str, after: datetime, before: datetime, activity_type: str = None):
+        """
+        Return the materialized weekly or monthly totals for periods starting in [after, before).
+
+        Args:
+            period: 'week' (ISO weeks, starting Monday) or 'month'.
+            after: Inclusive lower bound on the period start.
+            before: Exclusive upper bound on the period start.
+            activity_type: Optional case-insensitive filter on the activity type.
+
+        Returns:
+            (columns, rows) with one row per period that has activities, oldest first.
+        """
+        with duckdb.connect(self.db_path) as con:
+            return query_rollups(con, period, after, before, activity_type)
+
+    def aggregate(self, after: datetime, before: datetime, group_by: str = "type", activity_type: str = None):
+        """
+        Aggregate activities with a local start date in [after, before).
+
+        Args:
+            after: Inclusive lower bound.
+            before: Exclusive upper bound.
+            group_by: One of the keys of _GROUPINGS ('none', 'type', 'week', 'month', 'type_week', 'type_month').
+            activity_type: Optional case-insensitive filter on type or sport_type.
+
+        Returns:
+            (columns, rows) of the aggregated result, ordered by the group columns.
+        """
+        if group_by not in _GROUPINGS:
+            raise ValueError(f"group_by must be one of {', '.join(_GROUPINGS)}")
+        groups = _GROUPINGS[group_by]
+
+        select = [f"{expr} AS {name}" for name, expr in groups]
+        select += [
+            "count(*) AS activities",
+            "round(sum(distance_m) / 1000, 2) AS total_km",
+            "round(avg(distance_m) / 1000, 2) AS avg_km",
+            "round(max(distance_m) / 1000, 2) AS max_km",
+            "round(sum(moving_time_sec) / 3600, 2) AS moving_hours",
+            "round(sum(total_elevation_gain_m), 0) AS elevation_m",
+        ]
+        where = "start_date_local >= ? AND start_date_local < ?"
+        params = [after, before]
+        if activity_type:
+            where += " AND (lower(type) = lower(?) OR lower(sport_type) = lower(?))"
+            params += [activity_type, activity_type]
+
+        sql = f"SELECT {', '.join(select)} FROM activities WHERE {where}"
+        if groups:
+            names = ", ".join(name for name, _ in groups)
+            sql += f" GROUP BY {names} ORDER BY {names}"
+
+        with duckdb.connect(self.db_path) as con:
+            cursor = con.execute(sql, params)
+            columns = [d[0] for d in cursor.description]
+            rows = cursor.fetchall()
+        # An ungrouped aggregate over no rows still returns one row of NULLs
+        if not groups and rows and rows[0][0] == 0:
+            rows = []
+        return columns, rows
+
+    def top_activities(self, after: datetime, before: datetime, rank_by: str = "distance",
+                       activity_type: str = None, limit: int = 3):
+        """
+        Return the best `limit` activities with a local start date in [after, before).
+
+        Args:
+            after: Inclusive lower bound.
+            before: Exclusive upper bound.
+            rank_by: One of the keys of _RANKINGS ('distance', 'moving_time', 'elevation', 'speed').
+            activity_type: Optional case-insensitive filter on type or sport_type.
+            limit: Number of activities to return.
+
+        Returns:
+            (columns, rows) with id, name, type, date, distance (km), moving time (hours),
+            elevation gain (m) and average pace (min/km), best first.
+        """
+        if rank_by not in _RANKINGS:
+            raise ValueError(f"rank_by must be one of {', '.join(_RANKINGS)}")
+        where = "start_date_local >= ? AND start_date_local < ?"
+        params = [after, before]
+        if activity_type:
+            where += " AND (lower(type) = lower(?) OR lower(sport_type) = lower(?))"
+            params += [activity_type, activity_type]
+
+        with duckdb.connect(self.db_path) as con:
+            cursor = con.execute(f"""
+                SELECT id, name, type, CAST(start_date_local AS DATE) AS date,
+                       round(distance_m / 1000, 2) AS km,
+                       round(moving_time_sec / 3600, 2) AS moving_hours,
+                       round(total_elevation_gain_m, 0) AS elevation_m,
+                       round(moving_time_sec / 60 / nullif(distance_m / 1000, 0), 2) AS pace_min_per_km
+                FROM activities
+                WHERE {where}
+                ORDER BY {_RANKINGS[rank_by]} DESC NULLS LAST, id
+                LIMIT ?
+            """, params + [limit])
+            return [d[0] for d in cursor.description], cursor.fetchall()
+
+
+def get_store(db_path=None) -> ActivityStore:
+    """Return the process-wide ActivityStore for the given (or configured) database path."""
+    db_path = db_path or os.getenv("DUCKDB_PATH", "interactions.duckdb")
+    if db_path not in _STORES:
+        _STORES[db_path] = ActivityStore(db_path)
+    return _STORES[db_path]
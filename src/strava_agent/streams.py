@@ -0,0 +1,200 @@
+import os
+import asyncio
+import duckdb
+from datetime import datetime
+
+from .client import api_get
+
+# Strava stream types, in the order of the activity_streams columns
+STREAM_KEYS = ["time", "distance", "heartrate", "altitude", "velocity_smooth"]
+
+_STREAM_STORES = {}
+
+
+def _zone_bounds():
+    """Lower heart-rate bound of each zone, from HR_ZONE_BOUNDS (Z1 starts at 0)."""
+    return [int(b) for b in os.getenv("HR_ZONE_BOUNDS", "0,123,153,169,184").split(",")]
+
+
+class StreamStore:
+    """
+    DuckDB store of per-second activity streams, fetched once per activity.
+
+    Each activity is one row of typed LIST columns (time, distance, heart
+    rate, altitude, velocity), which DuckDB stores compressed. Analyses run as
+    SQL over the unnested lists, so only their small results reach the LLM.
+    """
+
+    def __init__(self, db_path=None):
+        if db_path:
+            self.db_path = db_path
+        else:
+            self.db_path = os.getenv("DUCKDB_PATH", "interactions.duckdb")
+        self._init_db()
+
+    def _init_db(self):
+        """Initialize the streams table if it doesn't exist."""
+        with duckdb.connect(self.db_path) as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS activity_streams (
+                    activity_id BIGINT PRIMARY KEY,
+                    time_s INTEGER[],
+                    distance_m FLOAT[],
+                    heartrate SMALLINT[],
+                    altitude_m FLOAT[],
+                    velocity_ms FLOAT[],
+                    fetched_at TIMESTAMP
+                )
+            """)
+
+    def missing(self, activity_ids) -> list:
+        """Return the ids (in the given order) that have no stored streams."""
+        if not activity_ids:
+            return []
+        with duckdb.connect(self.db_path) as con:
+            stored = {row[0] for row in con.execute(
+                "SELECT activity_id FROM activity_streams WHERE activity_id IN (SELECT unnest(?::BIGINT[]))",
+                (list(activity_ids),),
+            ).fetchall()}
+        return [i for i in activity_ids if i not in stored]
+
+    def put(self, activity_id: int, streams: dict):
+        """
+        Store the streams of one activity.
+
+        Args:
+            activity_id: The activity id.
+            streams: Stream data lists keyed by Strava stream type; missing types are stored as NULL.
+        """
+        with duckdb.connect(self.db_path) as con:
+            con.execute(
+                "INSERT OR REPLACE INTO activity_streams VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (activity_id, *(streams.get(key) for key in STREAM_KEYS), datetime.now()),
+            )
+
+    def delete(self, activity_id: int):
+        """Drop the streams of one activity."""
+        with duckdb.connect(self.db_path) as con:
+            con.execute("DELETE FROM activity_streams WHERE activity_id = ?", (activity_id,))
+
+    async def async_ensure(self, activity_ids, fetch=None) -> int:
+        """
+        Fetch and store streams for the activities that don't have them yet.
+
+        Args:
+            activity_ids: Activities the caller needs streams for.
+            fetch: Coroutine function (activity_id) returning the streams dict (defaults to fetch_streams).
+
+        Returns:
+            The number of activities fetched.
+        """
+        fetch = fetch or fetch_streams
+        missing = await asyncio.to_thread(self.missing, activity_ids)
+
+        # Concurrency and quota are enforced per request by the shared rate-limit scheduler
+        async def _one(activity_id):
+            streams = await fetch(activity_id)
+            await asyncio.to_thread(self.put, activity_id, streams)
+
+        await asyncio.gather(*(_one(i) for i in missing))
+        return len(missing)
+
+    def ensure(self, client, activity_ids) -> int:
+        """Blocking counterpart of async_ensure() using a stravalib Client."""
+        missing = self.missing(activity_ids)
+        for activity_id in missing:
+            streams = client.get_activity_streams(activity_id, types=STREAM_KEYS)
+            self.put(activity_id, {key: stream.data for key, stream in (streams or {}).items()})
+        return len(missing)
+
+    def best_efforts(self, activity_ids, distance_m: float, limit: int = 5):
+        """
+        Find the fastest continuous `distance_m` within each activity.
+
+        For every stream point, an ASOF join finds the first later point at
+        least `distance_m` further on; the shortest elapsed time wins.
+
+        Returns:
+            (columns, rows) with id, name, date, seconds and pace (min/km), fastest first.
+        """
+        with duckdb.connect(self.db_path) as con:
+            cursor = con.execute("""
+                WITH points AS (
+                    SELECT activity_id, unnest(time_s) AS t, unnest(distance_m) AS d
+                    FROM activity_streams
+                    WHERE activity_id IN (SELECT unnest(?::BIGINT[])) AND distance_m IS NOT NULL
+                ),
+                starts AS (
+                    SELECT activity_id, t, d + ? AS target FROM points
+                ),
+                efforts AS (
+                    SELECT s.activity_id, e.t - s.t AS seconds
+                    FROM starts s ASOF JOIN points e ON s.activity_id = e.activity_id AND s.target <= e.d
+                ),
+                best AS (
+                    SELECT activity_id, min(seconds) AS seconds FROM efforts GROUP BY activity_id
+                )
+                SELECT b.activity_id AS id, a.name, CAST(a.start_date_local AS DATE) AS date, b.seconds,
+                       round(b.seconds / 60 / (? / 1000), 2) AS pace_min_per_km
+                FROM best b LEFT JOIN activities a ON a.id = b.activity_id
+                ORDER BY b.seconds
+                LIMIT ?
+            """, (list(activity_ids), distance_m, distance_m, limit))
+            columns = [d[0] for d in cursor.description]
+            return columns, cursor.fetchall()
+
+    def heart_rate_zones(self, activity_ids, bounds=None, max_gap: int = 30):
+        """
+        Sum the time spent in each heart-rate zone across activities.
+
+        Each sample counts until the next one, capped at `max_gap` seconds so
+        pauses are not counted. Samples without a heart rate (sensor dropouts)
+        are skipped like a pause, as are readings below the first zone.
+
+        Returns:
+            (columns, rows) with zone, bpm range and minutes.
+        """
+        bounds = bounds or _zone_bounds()
+        # Bounds are ints from config, so the CASE can be built directly
+        cases = " ".join(f"WHEN hr >= {int(b)} THEN {i + 1}" for i, b in reversed(list(enumerate(bounds))))
+        with duckdb.connect(self.db_path) as con:
+            cursor = con.execute(f"""
+                WITH unnested AS (
+                    SELECT activity_id, unnest(time_s) AS t, unnest(heartrate) AS hr
+                    FROM activity_streams
+                    WHERE activity_id IN (SELECT unnest(?::BIGINT[])) AND heartrate IS NOT NULL
+                ),
+                points AS (
+                    SELECT * FROM unnested WHERE hr IS NOT NULL
+                ),
+                samples AS (
+                    SELECT hr, least(coalesce(lead(t) OVER (PARTITION BY activity_id ORDER BY t) - t, 0), ?) AS seconds
+                    FROM points
+                )
+                SELECT CASE {cases} END AS zone, round(sum(seconds) / 60, 1) AS minutes
+                FROM samples
+                WHERE zone IS NOT NULL
+                GROUP BY zone
+                ORDER BY zone
+            """, (list(activity_ids), max_gap))
+            rows = cursor.fetchall()
+
+        ranges = [f"{b}-{bounds[i + 1] - 1}" if i + 1 < len(bounds) else f"{b}+" for i, b in enumerate(bounds)]
+        return ["zone", "bpm", "minutes"], [(f"Z{zone}", ranges[zone - 1], minutes) for zone, minutes in rows]
+
+
+async def fetch_streams(activity_id: int) -> dict:
+    """Fetch an activity's streams without blocking, as data lists keyed by stream type."""
+    body = await api_get(
+        f"/activities/{activity_id}/streams",
+        {"keys": ",".join(STREAM_KEYS), "key_by_type": "true"},
+    )
+    return {key: stream.get("data") for key, stream in body.items()}
+
+
+def get_stream_store(db_path=None) -> StreamStore:
+    """Return the process-wide StreamStore for the given (or configured) database path."""
+    db_path = db_path or os.getenv("DUCKDB_PATH", "interactions.duckdb")
+    if db_path not in _STREAM_STORES:
+        _STREAM_STORES[db_path] = StreamStore(db_path)
+    return _STREAM_STORES[db_path]
@@ -0,0 +1,186 @@
+import os
+import sys
+import time
+import asyncio
+import argparse
+import duckdb
+from datetime import datetime, timedelta
+from dotenv import load_dotenv
+
+from .client import fetch_activities, run_async
+from .ratelimit import BACKGROUND, request_priority
+from .store import get_store
+
+# Backfill windows are fetched in UTC while the store's coverage is in local
+# dates, so the covered range starts a day after the first window.
+_LOCAL_MARGIN = timedelta(days=1)
+
+
+class Backfill:
+    """
+    Resumable import of the athlete's full activity history into the ActivityStore.
+
+    The history is split into fixed date windows. Windows are fetched
+    concurrently at background priority, so the rate-limit scheduler keeps
+    quota for interactive questions, and each window is loaded into DuckDB in
+    one transaction. Finished windows are recorded in `backfill_windows`, so an
+    interrupted run picks up where it stopped.
+    """
+
+    def __init__(self, store=None, window_days=None, concurrency=None):
+        self.store = store or get_store()
+        self.db_path = self.store.db_path
+        self.window_days = window_days or int(os.getenv("BACKFILL_WINDOW_DAYS", "180"))
+        self.concurrency = concurrency or int(os.getenv("BACKFILL_CONCURRENCY", "4"))
+        self._init_db()
+
+    def _init_db(self):
+        """Initialize the backfill progress table if it doesn't exist."""
+        with duckdb.connect(self.db_path) as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS backfill_windows (
+                    window_start TIMESTAMP,
+                    window_end TIMESTAMP,
+                    fetched INTEGER,
+                    completed_at TIMESTAMP,
+                    PRIMARY KEY (window_start, window_end)
+                )
+            """)
+
+    def plan(self, since: datetime, now: datetime):
+        """
+        Split [since, now) into windows of `window_days`, newest first.
+
+        The newest window is open-ended (`end=None`) and is fetched on every run,
+        since activities keep arriving in it.
+        """
+        windows = []
+        start = since
+        while start + timedelta(days=self.window_days) < now:
+            end = start + timedelta(days=self.window_days)
+            windows.append((start, end))
+            start = end
+        windows.append((start, None))
+        return list(reversed(windows))
+
+    def completed(self) -> set:
+        """Return the (start, end) windows finished by earlier runs."""
+        with duckdb.connect(self.db_path) as con:
+            return set(con.execute("SELECT window_start, window_end FROM backfill_windows").fetchall())
+
+    def _mark_done(self, start: datetime, end: datetime, fetched: int):
+        with duckdb.connect(self.db_path) as con:
+            con.execute(
+                "INSERT OR REPLACE INTO backfill_windows VALUES (?, ?, ?, ?)",
+                (start, end, fetched, datetime.now()),
+            )
+
+    def reset(self):
+        """Forget the progress of earlier runs."""
+        with duckdb.connect(self.db_path) as con:
+            con.execute("DELETE FROM backfill_windows")
+
+    async def run(self, since: datetime, fetch=fetch_activities, now: datetime = None, progress=None) -> dict:
+        """
+        Fetch every window not finished yet and load it into the store.
+
+        Args:
+            since: Earliest date to import (UTC).
+            fetch: Coroutine function (after, before) returning activities, e.g. client.fetch_activities.
+            now: Reference time (defaults to now).
+            progress: Optional callback (start, end, written) called as each window finishes.
+
+        Returns:
+            A dict with the number of windows fetched, skipped and failed, and activities written.
+        """
+        now = now or datetime.now()
+        done = await asyncio.to_thread(self.completed)
+        windows = self.plan(since, now)
+        pending = [w for w in windows if w[1] is None or w not in done]
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def _window(start, end):
+            async with semaphore:
+                activities = await fetch(start, end)
+            # Loads are serialized by the store's write lock
+            written = await asyncio.to_thread(self.store.upsert, activities)
+            if end is not None:
+                await asyncio.to_thread(self._mark_done, start, end, written)
+            if progress:
+                progress(start, end, written)
+            return written
+
+        # Tasks inherit the priority, so interactive questions keep their share of the quota
+        with request_priority(BACKGROUND):
+            results = await asyncio.gather(*(_window(*w) for w in pending), return_exceptions=True)
+
+        failed = [r for r in results if isinstance(r, BaseException)]
+        if not failed:
+            # The whole history is now local: range queries only sync the recent gap from here on
+            await asyncio.to_thread(self.store.mark_synced, since + _LOCAL_MARGIN, now)
+        return {
+            "fetched": len(pending) - len(failed),
+            "skipped": len(windows) - len(pending),
+            "failed": len(failed),
+            "errors": [str(e) for e in failed],
+            "written": sum(r for r in results if not isinstance(r, BaseException)),
+        }
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(
+        prog="strava-sync",
+        description="Sync Strava activities into the local DuckDB store. Stop the app first: "
+                    "DuckDB lets only one process open the database for writing.",
+    )
+    parser.add_argument("--backfill", action="store_true", help="Import the full history instead of only the recent gap.")
+    parser.add_argument("--since", default=os.getenv("BACKFILL_SINCE", "2009-01-01"),
+                        help="Earliest date to backfill, YYYY-MM-DD (default: %(default)s).")
+    parser.add_argument("--window-days", type=int, help="Days per backfill window (BACKFILL_WINDOW_DAYS).")
+    parser.add_argument("--concurrency", type=int, help="Windows fetched at once (BACKFILL_CONCURRENCY).")
+    parser.add_argument("--restart", action="store_true", help="Ignore the progress of an interrupted backfill.")
+    args = parser.parse_args(argv)
+
+    token = os.getenv("STRAVA_ACCESS_TOKEN")
+    expires_at = os.getenv("STRAVA_EXPIRES_AT")
+    if not token or (expires_at and time.time() > float(expires_at)):
+        print("Strava token missing or expired. Run strava-auth first.")
+        sys.exit(1)
+
+    try:
+        store = get_store()
+    except duckdb.IOException as e:
+        # DuckDB allows one read-write process per file, and the running app holds it
+        print(f"Could not open {os.getenv('DUCKDB_PATH', 'interactions.duckdb')}: {e}")
+        print("Stop the app (Chainlit or strava-agent) before running strava-sync, then start it again.")
+        sys.exit(1)
+    if not args.backfill:
+        coverage = store.coverage()
+        after = coverage[0] if coverage else datetime.now() - timedelta(days=30)
+        written = run_async(store.async_sync(fetch_activities, after))
+        print(f"Synced {written} activities.")
+        return
+
+    backfill = Backfill(store, window_days=args.window_days, concurrency=args.concurrency)
+    if args.restart:
+        backfill.reset()
+
+    def _progress(start, end, written):
+        label = end.strftime("%Y-%m-%d") if end else "now"
+        print(f"{start:%Y-%m-%d} to {label}: {written} activities")
+
+    since = datetime.strptime(args.since, "%Y-%m-%d")
+    result = run_async(backfill.run(since, progress=_progress))
+    print(f"Backfill: {result['written']} activities from {result['fetched']} windows "
+          f"({result['skipped']} already done, {result['failed']} failed).")
+    if result["failed"]:
+        for error in result["errors"]:
+            print(f"Error: {error}")
+        print("Run strava-sync --backfill again to resume.")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
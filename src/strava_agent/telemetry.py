@@ -0,0 +1,269 @@
+import os
+import time
+import uuid
+import inspect
+import threading
+import contextvars
+from contextlib import contextmanager
+from collections import defaultdict
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import duckdb
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from .logger import BufferedWriter
+
+_CURRENT = contextvars.ContextVar("strava_span", default=None)
+
+_RECORDERS = {}
+_RECORDERS_LOCK = threading.Lock()
+
+
+class Span:
+    """Timing and size counters for one node run, tool call or other unit of work."""
+
+    def __init__(self, kind: str, name: str, parent=None, thread_id: str = None):
+        self.id = str(uuid.uuid4())
+        self.kind = kind
+        self.name = name
+        self.parent = parent
+        self.thread_id = thread_id or (parent.thread_id if parent else None)
+        self.started_at = datetime.now()
+        self.duration_ms = 0.0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.payload_bytes = 0
+        self.http_calls = 0
+        self.http_ms = 0.0
+        self.error = None
+
+    def observe(self, result):
+        """Add the token counts and payload size of the messages a node or tool returned."""
+        messages = result.get("messages", []) if isinstance(result, dict) else [result]
+        for message in messages:
+            content = getattr(message, "content", None)
+            if content is not None:
+                self.payload_bytes += len(str(content).encode())
+            if isinstance(message, AIMessage) and message.usage_metadata:
+                self.input_tokens += message.usage_metadata.get("input_tokens", 0)
+                self.output_tokens += message.usage_metadata.get("output_tokens", 0)
+
+    def row(self) -> tuple:
+        return (
+            self.id, self.parent.id if self.parent else None, self.thread_id, self.kind, self.name,
+            self.started_at, self.duration_ms, self.input_tokens, self.output_tokens,
+            self.payload_bytes, self.http_calls, self.http_ms, self.error,
+        )
+
+
+class SpanRecorder:
+    """
+    Writes finished spans to a DuckDB `spans` table next to `interactions`.
+
+    Rows go through a BufferedWriter, so recording never waits on DuckDB. Running
+    totals per (kind, name) are kept in memory for the Prometheus text endpoint.
+    """
+
+    def __init__(self, db_path=None, batch_size=None, flush_interval=None):
+        if db_path:
+            self.db_path = db_path
+        else:
+            self.db_path = os.getenv("DUCKDB_PATH", "interactions.duckdb")
+        self._init_db()
+        self._writer = BufferedWriter(
+            self.db_path,
+            "INSERT INTO spans VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            batch_size=batch_size or int(os.getenv("LOG_BATCH_SIZE", "100")),
+            flush_interval=flush_interval or float(os.getenv("LOG_FLUSH_INTERVAL", "1.0")),
+        )
+        self._lock = threading.Lock()
+        self._totals = defaultdict(lambda: defaultdict(float))
+
+    def _init_db(self):
+        """Initialize the spans table if it doesn't exist."""
+        with duckdb.connect(self.db_path) as con:
+            con.execute("""
+                CREATE TABLE IF NOT EXISTS spans (
+                    id VARCHAR,
+                    parent_id VARCHAR,
+                    thread_id VARCHAR,
+                    kind VARCHAR,
+                    name VARCHAR,
+                    started_at TIMESTAMP,
+                    duration_ms DOUBLE,
+                    input_tokens INTEGER,
+                    output_tokens INTEGER,
+                    payload_bytes BIGINT,
+                    http_calls INTEGER,
+                    http_ms DOUBLE,
+                    error VARCHAR
+                )
+            """)
+
+    def record(self, span: Span):
+        """Queue a finished span and add it to the running totals."""
+        self._writer.write(span.row())
+        with self._lock:
+            totals = self._totals[(span.kind, span.name)]
+            totals["count"] += 1
+            totals["seconds"] += span.duration_ms / 1000
+            totals["input_tokens"] += span.input_tokens
+            totals["output_tokens"] += span.output_tokens
+            totals["payload_bytes"] += span.payload_bytes
+            totals["http_calls"] += span.http_calls
+            totals["http_seconds"] += span.http_ms / 1000
+            totals["errors"] += 1 if span.error else 0
+
+    def metrics_text(self) -> str:
+        """Render the running totals in the Prometheus text exposition format."""
+        metrics = [
+            ("span_seconds", "summary", "Wall time of graph nodes and tool calls.", None),
+            ("tokens_total", "counter", "LLM tokens reported by the model, by direction.", None),
+            ("payload_bytes_total", "counter", "Bytes of message content returned.", "payload_bytes"),
+            ("http_calls_total", "counter", "Strava API requests made.", "http_calls"),
+            ("http_seconds_total", "counter", "Time spent in Strava API requests.", "http_seconds"),
+            ("errors_total", "counter", "Spans that ended in an error or timeout.", "errors"),
+        ]
+        with self._lock:
+            items = sorted((key, dict(values)) for key, values in self._totals.items())
+
+        lines = []
+        for metric, kind, help_text, field in metrics:
+            name = f"strava_agent_{metric}"
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for (span_kind, span_name), totals in items:
+                labels = f'kind="{span_kind}",name="{span_name}"'
+                if metric == "span_seconds":
+                    lines.append(f"{name}_count{{{labels}}} {totals['count']:g}")
+                    lines.append(f"{name}_sum{{{labels}}} {totals['seconds']:.6f}")
+                elif metric == "tokens_total":
+                    lines.append(f'{name}{{{labels},direction="input"}} {totals["input_tokens"]:g}')
+                    lines.append(f'{name}{{{labels},direction="output"}} {totals["output_tokens"]:g}')
+                else:
+                    lines.append(f"{name}{{{labels}}} {totals[field]:g}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        """Block until all queued spans are written."""
+        self._writer.flush()
+
+    def close(self):
+        """Flush pending spans and release the database connection."""
+        self._writer.close()
+
+
+def get_span_recorder(db_path=None):
+    """Return the process-wide SpanRecorder, or None when SPANS_ENABLED=0."""
+    if os.getenv("SPANS_ENABLED", "1") != "1":
+        return None
+    db_path = db_path or os.getenv("DUCKDB_PATH", "interactions.duckdb")
+    with _RECORDERS_LOCK:
+        if db_path not in _RECORDERS:
+            _RECORDERS[db_path] = SpanRecorder(db_path)
+        return _RECORDERS[db_path]
+
+
+def current_span():
+    return _CURRENT.get()
+
+
+@contextmanager
+def span(kind: str, name: str, thread_id: str = None):
+    """
+    Time a block of work as a child of the current span and record it when it ends.
+
+    The span is carried in a context variable, so HTTP calls made inside the
+    block (including in to_thread workers and gathered tasks) are counted on it.
+    """
+    current = Span(kind, name, parent=_CURRENT.get(), thread_id=thread_id)
+    token = _CURRENT.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.error = current.error or type(e).__name__
+        raise
+    finally:
+        current.duration_ms = (time.perf_counter() - started) * 1000
+        _CURRENT.reset(token)
+        recorder = get_span_recorder()
+        if recorder is not None:
+            recorder.record(current)
+
+
+def record_http(seconds: float):
+    """Count one Strava API request on the current span and its ancestors."""
+    current = _CURRENT.get()
+    while current is not None:
+        current.http_calls += 1
+        current.http_ms += seconds * 1000
+        current = current.parent
+
+
+def _thread_id(config):
+    return ((config or {}).get("configurable") or {}).get("thread_id")
+
+
+def _call(func, state, config):
+    if "config" in inspect.signature(func).parameters:
+        return func(state, config=config)
+    return func(state)
+
+
+def traced_node(name: str, func, afunc=None) -> RunnableLambda:
+    """
+    Wrap a graph node so every run is recorded as a "node" span.
+
+    Args:
+        name: The node name, used as the span name.
+        func: The node function, taking the state (and optionally `config`).
+        afunc: Optional async implementation, used by app.ainvoke/astream.
+    """
+    def run(state, config):
+        with span("node", name, _thread_id(config)) as current:
+            result = _call(func, state, config)
+            current.observe(result)
+            return result
+
+    async def arun(state, config):
+        with span("node", name, _thread_id(config)) as current:
+            result = await _call(afunc, state, config)
+            current.observe(result)
+            return result
+
+    return RunnableLambda(run, afunc=arun if afunc else None, name=name)
+
+
+def serve_metrics(port: int = None, recorder: SpanRecorder = None):
+    """
+    Serve the span totals as Prometheus text on http://0.0.0.0:<port>/metrics.
+
+    The port defaults to METRICS_PORT; nothing is started when it is unset.
+
+    Returns:
+        The running server, or None.
+    """
+    port = port or int(os.getenv("METRICS_PORT", "0"))
+    recorder = recorder or get_span_recorder()
+    if not port or recorder is None:
+        return None
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = recorder.metrics_text().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
@@ -2,14 +2,31 @@ import os
 import json
 import asyncio
 from datetime import datetime
-from langchain_core.tools import tool
-from stravalib.client import Client
+from langchain_core.tools import tool, StructuredTool
+from stravalib.model import AthleteStats
 
-# Limit concurrent API calls to prevent hitting rate limits
-_RATE_LIMITER = asyncio.Semaphore(5)
+from .cache import get_activity_cache
+from .client import get_client, get_athlete_id, aget_athlete_id, api_get, fetch_activities
+from .store import get_store
+from .streams import get_stream_store
 
-@tool
-def get_athlete_stats():
+def _activity_details(activity):
+    """Convert a detailed stravalib activity into a JSON-serializable dict."""
+    return {
+        "id": activity.id,
+        "name": activity.name,
+        "type": str(getattr(activity.type, "root", activity.type)),
+        "distance_km": float(activity.distance) / 1000 if activity.distance else 0.0,
+        "start_date": activity.start_date_local.isoformat(),
+        "elapsed_time_sec": int(activity.elapsed_time) if activity.elapsed_time else 0,
+        "average_speed_kmh": (float(activity.average_speed) * 3.6) if activity.average_speed else 0.0
+    }
+
+def _format_athlete_stats(stats):
+    # Return a formatted string so the LLM doesn't have to do unit conversion (m -> km)
+    return f"Biggest Ride: {stats.biggest_ride_distance / 1000}km. All-time Run Distance: {stats.all_run_totals.distance / 1000}km."
+
+def _athlete_stats():
     """
     Fetch the authenticated athlete's lifetime statistics.
     
@@ -17,15 +34,46 @@ def get_athlete_stats():
     Do NOT use this tool for questions about specific activities or time-bound queries like 'this year' or 'last week'.
     """
     try:
-        client = Client(access_token=os.getenv("STRAVA_ACCESS_TOKEN"))
-        stats = client.get_athlete_stats(client.get_athlete().id)
-        # Return a formatted string so the LLM doesn't have to do unit conversion (m -> km)
-        return f"Biggest Ride: {stats.biggest_ride_distance / 1000}km. All-time Run Distance: {stats.all_run_totals.distance / 1000}km."
+        # The athlete id is cached per token, so this is a single API call
+        stats = get_client().get_athlete_stats(get_athlete_id())
+        return _format_athlete_stats(stats)
     except Exception as e:
         return f"Error: {e}"
 
-@tool
-def get_activities_in_range(start_date: str, end_date: str):
+async def _aathlete_stats():
+    try:
+        athlete_id = await aget_athlete_id()
+        stats = AthleteStats.model_validate(await api_get(f"/athletes/{athlete_id}/stats"))
+        return _format_athlete_stats(stats)
+    except Exception as e:
+        return f"Error: {e}"
+
+# Tools that sync the activity store have a blocking implementation (for app.invoke)
+# and a non-blocking one (for app.astream/ainvoke), so the tool executor can run them
+# concurrently with other tool calls without tying up a worker thread.
+get_athlete_stats = StructuredTool.from_function(
+    func=_athlete_stats, coroutine=_aathlete_stats, name="get_athlete_stats"
+)
+
+def _parse_range(start_date: str, end_date: str):
+    return datetime.strptime(start_date, "%Y-%m-%d"), datetime.strptime(end_date, "%Y-%m-%d")
+
+def _format_activity_rows(activities):
+    results = []
+    for activity in activities:
+        # Extract relevant fields and convert to primitives for JSON
+        data = {
+            "id": activity["id"],
+            "name": activity["name"],
+            "type": activity["type"],
+            "distance_km": activity["distance_m"] / 1000,
+            "start_date": activity["start_date_local"].isoformat()
+        }
+        results.append(json.dumps(data))
+        
+    return "\n".join(results) if results else "No activities found in this range."
+
+def _activities_in_range(start_date: str, end_date: str):
     """
     Fetch activities between a start and end date. Returns a summary JSONL string.
     
@@ -37,28 +85,286 @@ def get_activities_in_range(start_date: str, end_date: str):
         end_date: The end date in 'YYYY-MM-DD' format.
     """
     try:
-        client = Client(access_token=os.getenv("STRAVA_ACCESS_TOKEN"))
-        after = datetime.strptime(start_date, "%Y-%m-%d")
-        before = datetime.strptime(end_date, "%Y-%m-%d")
+        after, before = _parse_range(start_date, end_date)
+        
+        # Only the gap since the last sync goes to the API; the range itself is a local scan
+        store = get_store()
+        store.sync(get_client(), after)
+        return _format_activity_rows(store.query_range(after, before))
+    except Exception as e:
+        return f"Error: {e}"
+
+async def _aactivities_in_range(start_date: str, end_date: str):
+    try:
+        after, before = _parse_range(start_date, end_date)
+        
+        store = get_store()
+        await store.async_sync(fetch_activities, after)
+        return _format_activity_rows(await asyncio.to_thread(store.query_range, after, before))
+    except Exception as e:
+        return f"Error: {e}"
+
+get_activities_in_range = StructuredTool.from_function(
+    func=_activities_in_range, coroutine=_aactivities_in_range, name="get_activities_in_range"
+)
+
+def _format_aggregate(columns, rows):
+    if not rows:
+        return "No activities found in this range."
+    
+    lines = [" | ".join(columns)]
+    for row in rows:
+        lines.append(" | ".join("" if v is None else (v.isoformat() if hasattr(v, "isoformat") else str(v)) for v in row))
+    return "\n".join(lines)
+
+def _aggregate_activities(start_date: str, end_date: str, group_by: str = "type", activity_type: str = ""):
+    """
+    Compute totals over activities between a start and end date without listing them.
+    Returns a small table with the activity count and total/average/max distance (km),
+    moving time (hours) and elevation gain (m) per group.
+    
+    Prefer this over get_activities_in_range for "how many" or "how far in total"
+    questions; use get_top_activities for the longest activities and
+    get_training_trends for weekly/monthly trends.
+    
+    Args:
+        start_date: The start date in 'YYYY-MM-DD' format.
+        end_date: The end date in 'YYYY-MM-DD' format.
+        group_by: One of 'type', 'week', 'month', 'type_week', 'type_month', or 'none'.
+        activity_type: Optional activity type to filter on, e.g. 'Run' or 'Ride'.
+    """
+    try:
+        after, before = _parse_range(start_date, end_date)
+        
+        store = get_store()
+        store.sync(get_client(), after)
+        return _format_aggregate(*store.aggregate(after, before, group_by=group_by, activity_type=activity_type or None))
+    except Exception as e:
+        return f"Error: {e}"
+
+async def _aaggregate_activities(start_date: str, end_date: str, group_by: str = "type", activity_type: str = ""):
+    try:
+        after, before = _parse_range(start_date, end_date)
+        
+        store = get_store()
+        await store.async_sync(fetch_activities, after)
+        result = await asyncio.to_thread(store.aggregate, after, before, group_by, activity_type or None)
+        return _format_aggregate(*result)
+    except Exception as e:
+        return f"Error: {e}"
+
+aggregate_activities = StructuredTool.from_function(
+    func=_aggregate_activities, coroutine=_aaggregate_activities, name="aggregate_activities"
+)
+
+def _top_activities(start_date: str, end_date: str, rank_by: str = "distance", activity_type: str = "", limit: int = 3):
+    """
+    Find the best few activities between a start and end date without listing the others.
+    Returns a small table with id, name, type, date, distance (km), moving time (hours),
+    elevation gain (m) and average pace (min/km), best first.
+    
+    Use this for "longest run this year" or "biggest climb last month" questions.
+    
+    Args:
+        start_date: The start date in 'YYYY-MM-DD' format.
+        end_date: The end date in 'YYYY-MM-DD' format.
+        rank_by: One of 'distance', 'moving_time', 'elevation' or 'speed'.
+        activity_type: Optional activity type to filter on, e.g. 'Run' or 'Ride'.
+        limit: Number of activities to return.
+    """
+    try:
+        after, before = _parse_range(start_date, end_date)
+        
+        store = get_store()
+        store.sync(get_client(), after)
+        return _format_aggregate(*store.top_activities(after, before, rank_by, activity_type or None, limit))
+    except Exception as e:
+        return f"Error: {e}"
+
+async def _atop_activities(start_date: str, end_date: str, rank_by: str = "distance", activity_type: str = "", limit: int = 3):
+    try:
+        after, before = _parse_range(start_date, end_date)
+        
+        store = get_store()
+        await store.async_sync(fetch_activities, after)
+        result = await asyncio.to_thread(store.top_activities, after, before, rank_by, activity_type or None, limit)
+        return _format_aggregate(*result)
+    except Exception as e:
+        return f"Error: {e}"
+
+get_top_activities = StructuredTool.from_function(
+    func=_top_activities, coroutine=_atop_activities, name="get_top_activities"
+)
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(round(seconds))
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+def _format_records(rows, synced_from):
+    if not rows:
+        return "No personal records found. The local history may be empty; it can be imported with strava-sync --backfill."
+    lines = ["type | record | value | id | name | date"]
+    for activity_type, record, value, activity_id, name, start_date in rows:
+        if record == "longest_distance":
+            shown = f"{value / 1000:.2f} km"
+        elif record == "most_elevation":
+            shown = f"{value:.0f} m"
+        else:
+            shown = _format_duration(value)
+        lines.append(f"{activity_type} | {record} | {shown} | {activity_id} | {name} | {start_date:%Y-%m-%d}")
+    if synced_from:
+        lines.append(f"Records cover activities since {synced_from:%Y-%m-%d}.")
+    # Fastest times come from whole-activity average pace, not from splits inside longer activities
+    lines.append("fastest_* times are at the activity's average pace; use analyze_streams for splits inside longer activities.")
+    return "\n".join(lines)
+
+def _personal_records(activity_type: str = "", record: str = ""):
+    """
+    Look up the athlete's precomputed personal records in one call.
+    Records per activity type: longest_distance, longest_moving_time, most_elevation, and
+    fastest_<distance> (e.g. fastest_5k, fastest_10k, fastest_half_marathon for runs; fastest_40k, fastest_100k for rides).
+    
+    Use this for "fastest 10k", "longest ride" or "biggest climb" questions over the whole history
+    instead of listing activities and fetching their details.
+    
+    Args:
+        activity_type: Optional activity type, e.g. 'Run' or 'Ride'.
+        record: Optional record name, e.g. 'fastest_10k'.
+    """
+    try:
+        store = get_store()
+        coverage = store.coverage()
+        if coverage:
+            # Pick up activities added since the last sync; the history itself is already local
+            store.sync(get_client(), coverage[0])
+            coverage = store.coverage()
+        _, rows = store.personal_records(activity_type or None, record or None)
+        return _format_records(rows, coverage[0] if coverage else None)
+    except Exception as e:
+        return f"Error: {e}"
+
+async def _apersonal_records(activity_type: str = "", record: str = ""):
+    try:
+        store = get_store()
+        coverage = await asyncio.to_thread(store.coverage)
+        if coverage:
+            await store.async_sync(fetch_activities, coverage[0])
+            coverage = await asyncio.to_thread(store.coverage)
+        _, rows = await asyncio.to_thread(store.personal_records, activity_type or None, record or None)
+        return _format_records(rows, coverage[0] if coverage else None)
+    except Exception as e:
+        return f"Error: {e}"
+
+get_personal_records = StructuredTool.from_function(
+    func=_personal_records, coroutine=_apersonal_records, name="get_personal_records"
+)
+
+def _training_trends(start_date: str, end_date: str, period: str = "week", activity_type: str = ""):
+    """
+    Read precomputed weekly or monthly training totals between a start and end date.
+    Returns one row per ISO week (Monday start) or month with the activity count, total and max
+    distance (km), moving time (hours), elevation gain (m) and the distance change against the previous row (%).
+    
+    Prefer this for weekly mileage, monthly volume and training load trend questions:
+    it costs the same however long the range is.
+    
+    Args:
+        start_date: The start date in 'YYYY-MM-DD' format.
+        end_date: The end date in 'YYYY-MM-DD' format.
+        period: 'week' or 'month'.
+        activity_type: Optional activity type to filter on, e.g. 'Run' or 'Ride'.
+    """
+    try:
+        after, before = _parse_range(start_date, end_date)
         
-        activities = client.get_activities(after=after, before=before)
+        store = get_store()
+        store.sync(get_client(), after)
+        return _format_aggregate(*store.rollups(period, after, before, activity_type or None))
+    except Exception as e:
+        return f"Error: {e}"
+
+async def _atraining_trends(start_date: str, end_date: str, period: str = "week", activity_type: str = ""):
+    try:
+        after, before = _parse_range(start_date, end_date)
         
-        results = []
-        for activity in activities:
-            # Extract relevant fields and convert to primitives for JSON
-            data = {
-                "id": activity.id,
-                "name": activity.name,
-                "type": str(activity.type),
-                "distance_km": float(activity.distance) / 1000 if activity.distance else 0.0,
-                "start_date": activity.start_date_local.isoformat()
-            }
-            results.append(json.dumps(data))
-            
-        return "\n".join(results) if results else "No activities found in this range."
+        store = get_store()
+        await store.async_sync(fetch_activities, after)
+        result = await asyncio.to_thread(store.rollups, period, after, before, activity_type or None)
+        return _format_aggregate(*result)
     except Exception as e:
         return f"Error: {e}"
 
+get_training_trends = StructuredTool.from_function(
+    func=_training_trends, coroutine=_atraining_trends, name="get_training_trends"
+)
+
+_STREAM_ANALYSES = ("best_effort", "hr_zones")
+
+def _stream_activity_ids(rows, activity_type: str):
+    """Pick the activities to analyze, newest first and capped so a long range can't exhaust the quota."""
+    limit = int(os.getenv("STREAMS_MAX_ACTIVITIES", "50"))
+    if activity_type:
+        rows = [r for r in rows if activity_type.lower() in (str(r["type"]).lower(), str(r["sport_type"]).lower())]
+    return [r["id"] for r in reversed(rows)][:limit]
+
+def _run_stream_analysis(streams, activity_ids, analysis: str, distance_km: float):
+    if not activity_ids:
+        return "No activities found in this range."
+    if analysis == "best_effort":
+        return _format_aggregate(*streams.best_efforts(activity_ids, distance_km * 1000))
+    return _format_aggregate(*streams.heart_rate_zones(activity_ids))
+
+def _analyze_streams(start_date: str, end_date: str, analysis: str = "best_effort", distance_km: float = 5.0, activity_type: str = "Run"):
+    """
+    Analyze the per-second streams (time, distance, heart rate) of activities between a start and end date.
+    Returns a small table; the raw streams are never returned.
+    
+    Use analysis='best_effort' for the fastest continuous split of `distance_km` inside any activity
+    (e.g. "my fastest 5k split"), and analysis='hr_zones' for the time spent in each heart-rate zone
+    (e.g. "time in zone 4 last month").
+    
+    Args:
+        start_date: The start date in 'YYYY-MM-DD' format.
+        end_date: The end date in 'YYYY-MM-DD' format.
+        analysis: 'best_effort' or 'hr_zones'.
+        distance_km: Split distance for 'best_effort', in km.
+        activity_type: Activity type to analyze, e.g. 'Run' or 'Ride'; empty for all.
+    """
+    try:
+        if analysis not in _STREAM_ANALYSES:
+            raise ValueError(f"analysis must be one of {', '.join(_STREAM_ANALYSES)}")
+        after, before = _parse_range(start_date, end_date)
+        
+        store = get_store()
+        store.sync(get_client(), after)
+        activity_ids = _stream_activity_ids(store.query_range(after, before), activity_type)
+        # Streams are fetched once per activity and kept in DuckDB
+        streams = get_stream_store()
+        streams.ensure(get_client(), activity_ids)
+        return _run_stream_analysis(streams, activity_ids, analysis, distance_km)
+    except Exception as e:
+        return f"Error: {e}"
+
+async def _aanalyze_streams(start_date: str, end_date: str, analysis: str = "best_effort", distance_km: float = 5.0, activity_type: str = "Run"):
+    try:
+        if analysis not in _STREAM_ANALYSES:
+            raise ValueError(f"analysis must be one of {', '.join(_STREAM_ANALYSES)}")
+        after, before = _parse_range(start_date, end_date)
+        
+        store = get_store()
+        await store.async_sync(fetch_activities, after)
+        rows = await asyncio.to_thread(store.query_range, after, before)
+        activity_ids = _stream_activity_ids(rows, activity_type)
+        streams = get_stream_store()
+        await streams.async_ensure(activity_ids)
+        return await asyncio.to_thread(_run_stream_analysis, streams, activity_ids, analysis, distance_km)
+    except Exception as e:
+        return f"Error: {e}"
+
+analyze_streams = StructuredTool.from_function(
+    func=_analyze_streams, coroutine=_aanalyze_streams, name="analyze_streams"
+)
+
 @tool
 async def get_activity_information(activity_id: int):
     """
@@ -69,22 +375,58 @@ async def get_activity_information(activity_id: int):
     Args:
         activity_id: The ID of the activity to fetch.
     """
-    async with _RATE_LIMITER:
-        try:
-            def _fetch_activity():
-                client = Client(access_token=os.getenv("STRAVA_ACCESS_TOKEN"))
-                activity = client.get_activity(activity_id)
-                return {
-                    "id": activity.id,
-                    "name": activity.name,
-                    "type": str(activity.type),
-                    "distance_km": float(activity.distance) / 1000 if activity.distance else 0.0,
-                    "start_date": activity.start_date_local.isoformat(),
-                    "elapsed_time_sec": activity.elapsed_time if activity.elapsed_time else 0,
-                    "average_speed_kmh": (float(activity.average_speed) * 3.6) if activity.average_speed else 0.0
-                }
-
-            data = await asyncio.to_thread(_fetch_activity)
-            return json.dumps(data)
-        except Exception as e:
-            return f"Error: {e}"
\ No newline at end of file
+    # Cache hits never touch the API, so they never wait on the rate-limit scheduler
+    cache = get_activity_cache()
+    cached = await cache.aget(activity_id)
+    if cached is not None:
+        return json.dumps(cached)
+
+    try:
+        def _fetch_activity():
+            return _activity_details(get_client().get_activity(activity_id))
+
+        data = await asyncio.to_thread(_fetch_activity)
+        await cache.aput(activity_id, data)
+        return json.dumps(data)
+    except Exception as e:
+        return f"Error: {e}"
+
+@tool
+async def get_activities_details(activity_ids: list[int]):
+    """
+    Fetch detailed information about several activities in a single call.
+    Returns one compact JSON line per activity with average speed, elapsed time, and distance.
+    Prefer this over calling get_activity_information repeatedly when comparing candidates.
+    
+    Args:
+        activity_ids: The IDs of the activities to fetch.
+    """
+    # Preserve the requested order while dropping duplicates
+    activity_ids = list(dict.fromkeys(activity_ids))
+    cache = get_activity_cache()
+    
+    results = {}
+    missing = []
+    for activity_id, cached in zip(activity_ids, await asyncio.gather(*(cache.aget(i) for i in activity_ids))):
+        if cached is not None:
+            results[activity_id] = cached
+        else:
+            missing.append(activity_id)
+
+    if missing:
+        client = get_client()
+
+        # Concurrency and quota are enforced per request by the shared rate-limit scheduler
+        async def _fetch(activity_id):
+            try:
+                activity = await asyncio.to_thread(client.get_activity, activity_id)
+                data = _activity_details(activity)
+                await cache.aput(activity_id, data)
+                return data
+            except Exception as e:
+                return {"id": activity_id, "error": str(e)}
+
+        for activity_id, data in zip(missing, await asyncio.gather(*(_fetch(i) for i in missing))):
+            results[activity_id] = data
+
+    return "\n".join(json.dumps(results[i], separators=(",", ":")) for i in activity_ids)
@@ -0,0 +1,301 @@
+import os
+import sys
+import json
+import queue
+import argparse
+import threading
+import requests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from dotenv import load_dotenv
+from stravalib.exc import ObjectNotFound
+
+from .cache import get_activity_cache
+from .client import get_client, get_athlete_id
+from .ratelimit import BACKGROUND, request_priority
+from .store import get_store
+from .streams import get_stream_store
+
+_ASPECTS = ("create", "update", "delete")
+_SUBSCRIPTIONS_URL = "https://www.strava.com/api/v3/push_subscriptions"
+
+
+def _fetch_activity(activity_id: int):
+    return get_client().get_activity(activity_id)
+
+
+def current_subscription_id():
+    """Return the id of the app's push subscription from Strava, or None if there is none."""
+    response = requests.get(_SUBSCRIPTIONS_URL, params={
+        "client_id": os.getenv("STRAVA_CLIENT_ID"),
+        "client_secret": os.getenv("STRAVA_CLIENT_SECRET"),
+    }, timeout=30)
+    response.raise_for_status()
+    subscriptions = response.json()
+    return subscriptions[0]["id"] if subscriptions else None
+
+
+class WebhookProcessor:
+    """
+    Applies Strava push events to the local store and caches on a background thread.
+
+    The endpoint is public, so only events for our subscription and the
+    authenticated athlete are accepted. Created and updated activities are
+    refetched one by one (at background priority, so questions keep their
+    share of the quota) and upserted, which refreshes records and rollups and
+    bumps the data version that keys the answer cache. A delete is applied
+    only once Strava answers 404 for the activity; the activity's streams are
+    dropped too. Either way the cached details are invalidated. Several events
+    for one activity that arrive before it is processed are coalesced into a
+    single refetch.
+    """
+
+    def __init__(self, store=None, activity_cache=None, stream_store=None, fetch=None,
+                 subscription_id=None, owner_id=None):
+        self.store = store or get_store()
+        self.activity_cache = activity_cache or get_activity_cache(self.store.db_path)
+        self.stream_store = stream_store or get_stream_store(self.store.db_path)
+        self.fetch = fetch or _fetch_activity
+        # Looked up on the first event when not given (STRAVA_WEBHOOK_SUBSCRIPTION_ID, then Strava)
+        self.subscription_id = subscription_id
+        self.owner_id = owner_id
+        self.rejected = 0
+        self.processed = 0
+        self.errors = []
+        self._queue = queue.Queue()
+        # activity id -> aspect still to apply; ids already queued are not queued again
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def submit(self, event: dict) -> bool:
+        """
+        Queue the work for one push event. Returns False for events that are ignored.
+
+        Events from another subscription or for another athlete are rejected;
+        athlete events (e.g. deauthorization) and unknown aspects are ignored.
+        """
+        if not self._trusted(event):
+            with self._lock:
+                self.rejected += 1
+            return False
+        if event.get("object_type") != "activity" or event.get("aspect_type") not in _ASPECTS:
+            return False
+        activity_id = int(event["object_id"])
+        aspect = event["aspect_type"]
+        with self._lock:
+            queued = activity_id in self._pending
+            if self._pending.get(activity_id) != "delete":
+                self._pending[activity_id] = aspect
+        if not queued:
+            self._queue.put(activity_id)
+        return True
+
+    def _trusted(self, event: dict) -> bool:
+        """Whether the event carries our subscription id and the authenticated athlete as owner."""
+        if self.subscription_id is None:
+            self.subscription_id = os.getenv("STRAVA_WEBHOOK_SUBSCRIPTION_ID") or current_subscription_id()
+        if self.owner_id is None:
+            self.owner_id = get_athlete_id()
+        return (
+            self.subscription_id is not None
+            and str(event.get("subscription_id")) == str(self.subscription_id)
+            and str(event.get("owner_id")) == str(self.owner_id)
+        )
+
+    def process(self, activity_id: int, aspect: str):
+        """Apply one event synchronously."""
+        self.activity_cache.invalidate(activity_id)
+        try:
+            with request_priority(BACKGROUND):
+                activity = self.fetch(activity_id)
+        except ObjectNotFound:
+            if aspect != "delete":
+                raise
+            # Strava confirms the activity is gone (or no longer visible to us)
+            self.store.delete([activity_id])
+            self.stream_store.delete(activity_id)
+            return
+        # For a delete that Strava does not confirm, the refetch restores the stored row
+        self.store.upsert([activity])
+
+    def start(self):
+        """Start the worker thread (once)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="strava-webhook", daemon=True)
+            self._thread.start()
+        return self
+
+    def join(self):
+        """Block until every queued event has been processed."""
+        self._queue.join()
+
+    def stats(self) -> dict:
+        """Return the processed, failed and rejected event counts and the queue length."""
+        with self._lock:
+            return {"processed": self.processed, "failed": len(self.errors), "rejected": self.rejected,
+                    "pending": len(self._pending)}
+
+    def _run(self):
+        while True:
+            activity_id = self._queue.get()
+            with self._lock:
+                aspect = self._pending.pop(activity_id)
+            try:
+                self.process(activity_id, aspect)
+                with self._lock:
+                    self.processed += 1
+            except Exception as e:
+                # The next sync picks the activity up again, so a failed refetch is only recorded
+                with self._lock:
+                    self.errors.append(f"{aspect} {activity_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+
+class WebhookServer:
+    """
+    HTTP endpoint for a Strava webhook subscription.
+
+    GET answers the subscription handshake when hub.verify_token matches;
+    POST queues the event on the processor and returns at once, since Strava
+    expects a 200 within two seconds.
+    """
+
+    def __init__(self, processor: WebhookProcessor, port: int = 0, host: str = "0.0.0.0",
+                 path: str = "/webhook", verify_token: str = None):
+        self.processor = processor
+        self.port = port
+        self.host = host
+        self.path = path
+        self.verify_token = verify_token
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}{self.path}"
+
+    def start(self):
+        webhook = self
+        self.processor.start()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                query = {k: v[0] for k, v in parse_qs(parsed.query).items()}
+                if parsed.path != webhook.path:
+                    self.send_error(404)
+                elif (query.get("hub.mode") != "subscribe" or not webhook.verify_token
+                      or query.get("hub.verify_token") != webhook.verify_token):
+                    self.send_error(403)
+                else:
+                    self._json(200, {"hub.challenge": query.get("hub.challenge", "")})
+
+            def do_POST(self):
+                if urlparse(self.path).path != webhook.path:
+                    self.send_error(404)
+                    return
+                try:
+                    event = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                    webhook.processor.submit(event)
+                except (ValueError, KeyError, TypeError):
+                    self.send_error(400)
+                    return
+                except Exception:
+                    # The subscription or athlete could not be looked up: ask Strava to retry later
+                    self.send_error(503)
+                    return
+                self._json(200, {})
+
+            def _json(self, status, body):
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        threading.Thread(target=self._server.serve_forever, name="webhook", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def serve_webhook(port: int = None, processor: WebhookProcessor = None):
+    """
+    Serve the webhook endpoint on http://0.0.0.0:<port>/webhook.
+
+    The port defaults to WEBHOOK_PORT; nothing is started when it is unset.
+
+    Returns:
+        The running WebhookServer, or None.
+    """
+    port = port or int(os.getenv("WEBHOOK_PORT", "0"))
+    if not port:
+        return None
+    return WebhookServer(
+        processor or WebhookProcessor(),
+        port=port,
+        path=os.getenv("WEBHOOK_PATH", "/webhook"),
+        verify_token=os.getenv("STRAVA_WEBHOOK_VERIFY_TOKEN"),
+    ).start()
+
+
+def subscribe(callback_url: str) -> dict:
+    """Register `callback_url` as the app's push subscription (Strava allows one per app)."""
+    response = requests.post(_SUBSCRIPTIONS_URL, data={
+        "client_id": os.getenv("STRAVA_CLIENT_ID"),
+        "client_secret": os.getenv("STRAVA_CLIENT_SECRET"),
+        "callback_url": callback_url,
+        "verify_token": os.getenv("STRAVA_WEBHOOK_VERIFY_TOKEN"),
+    }, timeout=30)
+    response.raise_for_status()
+    return response.json()
+
+
+def main(argv=None):
+    load_dotenv()
+    parser = argparse.ArgumentParser(prog="strava-webhook", description="Receive Strava push events.")
+    parser.add_argument("--subscribe", metavar="CALLBACK_URL",
+                        help="Register the public URL of a running endpoint with Strava, then exit.")
+    parser.add_argument("--port", type=int, help="Port to serve on (WEBHOOK_PORT).")
+    args = parser.parse_args(argv)
+
+    if not os.getenv("STRAVA_WEBHOOK_VERIFY_TOKEN"):
+        print("STRAVA_WEBHOOK_VERIFY_TOKEN is not set.")
+        sys.exit(1)
+
+    if args.subscribe:
+        subscription = subscribe(args.subscribe)
+        print(f"Subscribed: id {subscription['id']}")
+        print("Set STRAVA_WEBHOOK_SUBSCRIPTION_ID to this id, or it is looked up from Strava on the first event.")
+        return
+
+    server = serve_webhook(args.port)
+    if server is None:
+        print("Set WEBHOOK_PORT or pass --port.")
+        sys.exit(1)
+    print(f"Listening on {server.url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
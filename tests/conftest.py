@@ -1,6 +1,8 @@
 import pytest
 import json
 import os
+import httpx
+from types import SimpleNamespace
 from unittest.mock import MagicMock, patch
 
 # Fixture to mock user data that might be used across multiple tests
@@ -31,9 +33,16 @@ def it_translation_data():
             return json.load(f)
     return None
 
+@pytest.fixture(autouse=True)
+def isolated_duckdb(monkeypatch, tmp_path):
+    """Keeps every test's DuckDB writes (spans, caches, logs) out of the repo's interactions.duckdb."""
+    monkeypatch.setenv("DUCKDB_PATH", str(tmp_path / "test.duckdb"))
+    monkeypatch.setenv("SPANS_ENABLED", "0")
+
 @pytest.fixture
-def mock_env_vars(monkeypatch):
+def mock_env_vars(monkeypatch, tmp_path):
     """Sets up environment variables for testing."""
+    monkeypatch.setenv("DUCKDB_PATH", str(tmp_path / "test.duckdb"))
     monkeypatch.setenv("STRAVA_ACCESS_TOKEN", "test_token")
     monkeypatch.setenv("STRAVA_REFRESH_TOKEN", "test_refresh")
     monkeypatch.setenv("STRAVA_CLIENT_ID", "123")
@@ -46,7 +55,64 @@ def mock_env_vars(monkeypatch):
 def mock_strava_client():
     """
     Mocks the Strava Client class.
-    We patch it in the tools module where it is primarily used.
+    We patch it in the client module, where the shared client is built,
+    and reset the shared client so every test gets the mock.
+    """
+    from strava_agent.client import reset_client
+    reset_client()
+    with patch("strava_agent.client.Client") as mock:
+        yield mock.return_value
+    reset_client()
+
+@pytest.fixture
+def mock_strava_api():
+    """
+    Routes the async Strava client to an in-process httpx MockTransport.
+    Tests register JSON bodies (or callables taking the request) by URL path
+    in `routes`; every request is recorded in `calls`.
+    """
+    from strava_agent.client import reset_client
+    from strava_agent.ratelimit import RateLimitScheduler
+
+    api = SimpleNamespace(routes={}, calls=[])
+
+    def handler(request):
+        api.calls.append(request)
+        body = api.routes[request.url.path]
+        if callable(body):
+            body = body(request)
+        return httpx.Response(200, json=body, headers={"X-RateLimit-Usage": "1,1", "X-RateLimit-Limit": "100,1000"})
+
+    def build(token):
+        return httpx.AsyncClient(base_url="https://www.strava.com/api/v3", transport=httpx.MockTransport(handler))
+
+    reset_client()
+    # A fresh scheduler keeps quota usage from leaking between tests
+    with patch("strava_agent.client._build_async_client", side_effect=build), \
+         patch("strava_agent.client.get_scheduler", return_value=RateLimitScheduler()):
+        yield api
+    reset_client()
+
+@pytest.fixture
+def make_activity():
+    """
+    Factory for mock stravalib activities with real field values,
+    so they can be written to the DuckDB activity store.
     """
-    with patch("strava_agent.tools.Client") as mock:
-        yield mock.return_value
\ No newline at end of file
+    def _make(activity_id, start, activity_type="Run", distance=5000.0, moving_time=1500, name=None):
+        activity = MagicMock()
+        activity.id = activity_id
+        activity.athlete.id = 1
+        activity.name = name or f"{activity_type} {activity_id}"
+        activity.type = activity_type
+        activity.sport_type = activity_type
+        activity.start_date = start
+        activity.start_date_local = start
+        activity.distance = distance
+        activity.moving_time = moving_time
+        activity.elapsed_time = moving_time + 60
+        activity.total_elevation_gain = 10.0
+        activity.average_speed = distance / moving_time if moving_time else 0.0
+        activity.max_speed = 5.0
+        return activity
+    return _make
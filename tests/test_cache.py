@@ -0,0 +1,111 @@
+import time
+import asyncio
+from unittest.mock import patch
+from strava_agent.cache import ActivityCache, AnswerCache, get_activity_cache, normalize_question
+
+def test_cache_put_get(tmp_path):
+    """Test that a stored payload is returned from memory and counted as a hit."""
+    cache = ActivityCache(str(tmp_path / "cache.duckdb"))
+    assert cache.get(1) is None
+    
+    cache.put(1, {"id": 1, "name": "Ride"})
+    
+    assert cache.get(1) == {"id": 1, "name": "Ride"}
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+def test_cache_disk_tier(tmp_path):
+    """Test that a fresh process-level cache falls back to the DuckDB tier."""
+    path = str(tmp_path / "cache.duckdb")
+    ActivityCache(path).put(1, {"id": 1})
+    
+    cache = ActivityCache(path)
+    assert cache.get(1) == {"id": 1}
+    assert cache.stats()["disk_hits"] == 1
+    # The disk hit is promoted into the LRU
+    assert cache.stats()["memory_entries"] == 1
+
+def test_cache_async_tiers(tmp_path):
+    """Test that the async accessors only move DuckDB work off the event loop."""
+    path = str(tmp_path / "cache.duckdb")
+    
+    async def roundtrip():
+        await ActivityCache(path).aput(1, {"id": 1})
+        cache = ActivityCache(path)
+        from_disk = await cache.aget(1)
+        with patch("strava_agent.cache.asyncio.to_thread") as to_thread:
+            from_memory = await cache.aget(1)
+        to_thread.assert_not_called()
+        return cache, from_disk, from_memory
+    
+    cache, from_disk, from_memory = asyncio.run(roundtrip())
+    
+    assert from_disk == from_memory == {"id": 1}
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.stats()["hits"] == 2
+
+def test_cache_ttl(tmp_path):
+    """Test that expired entries are misses in both tiers."""
+    cache = ActivityCache(str(tmp_path / "cache.duckdb"), ttl=0.05)
+    cache.put(1, {"id": 1})
+    time.sleep(0.1)
+    
+    assert cache.get(1) is None
+    assert cache.stats()["misses"] == 1
+
+def test_cache_lru_eviction(tmp_path):
+    """Test that the in-memory tier evicts the least recently used entry."""
+    cache = ActivityCache(str(tmp_path / "cache.duckdb"), max_entries=2, max_disk_entries=2)
+    cache.put(1, {"id": 1})
+    cache.put(2, {"id": 2})
+    cache.get(1)
+    cache.put(3, {"id": 3})
+    
+    assert list(cache._memory) == [1, 3]
+    # The disk tier is capped too, keeping the most recently fetched entries
+    cache._memory.clear()
+    assert cache.get(1) is None
+    assert cache.get(2) == {"id": 2}
+
+def test_cache_invalidate(tmp_path):
+    """Test that invalidate removes an entry from both tiers."""
+    cache = ActivityCache(str(tmp_path / "cache.duckdb"))
+    cache.put(1, {"id": 1})
+    cache.invalidate(1)
+    assert cache.get(1) is None
+
+def test_get_activity_cache_is_cached(tmp_path):
+    """Test that get_activity_cache returns one instance per database path."""
+    path = str(tmp_path / "cache.duckdb")
+    assert get_activity_cache(path) is get_activity_cache(path)
+
+def test_answer_cache_hit_for_rephrased_question(tmp_path):
+    """Test that case, punctuation and filler differences map to the same cached answer."""
+    cache = AnswerCache(str(tmp_path / "answers.duckdb"))
+    cache.put("How far did I run this week?", 1, "You ran 20 km.")
+    
+    assert cache.get("hey, how far did i run THIS WEEK please", 1) == "You ran 20 km."
+    assert cache.get("How far did I ride this week?", 1) is None
+
+def test_answer_cache_keyed_on_data_version_and_period(tmp_path):
+    """Test that a new data version or a different period is a miss."""
+    cache = AnswerCache(str(tmp_path / "answers.duckdb"))
+    cache.put("How far did I run last week?", 1, "You ran 20 km.")
+    
+    assert cache.get("How far did I run last week?", 2) is None
+    assert cache.get("How far did I run last month?", 1) is None
+    
+    # Entries from older data versions are dropped on the next write
+    cache.put("How many rides in 2024?", 2, "12 rides.")
+    assert cache.get("How far did I run last week?", 1) is None
+
+def test_answer_cache_ttl(tmp_path):
+    """Test that expired answers are misses."""
+    cache = AnswerCache(str(tmp_path / "answers.duckdb"), ttl=0)
+    cache.put("How far did I run this week?", 1, "You ran 20 km.")
+    
+    assert cache.get("How far did I run this week?", 1) is None
+
+def test_normalize_question():
+    """Test that the named period is replaced by a placeholder."""
+    assert normalize_question("Could you tell me my longest run in March 2024?") == "my longest run <period>"
@@ -0,0 +1,109 @@
+import os
+import sys
+import asyncio
+import pytest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+from langgraph.checkpoint.memory import InMemorySaver
+from strava_agent.graph import build_graph
+
+pytest.importorskip("chainlit")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "chainlit"))
+
+
+class _FakeLLM(GenericFakeChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+class _Message:
+    def __init__(self, content=""):
+        self.content = content
+        self.tokens = []
+
+    async def send(self):
+        _SENT.append(self)
+        return self
+
+    async def stream_token(self, token):
+        self.tokens.append(token)
+        self.content += token
+
+    async def update(self):
+        pass
+
+
+class _Step:
+    def __init__(self, name, type):
+        self.name = name
+        self.type = type
+        self.output = None
+
+    async def __aenter__(self):
+        _STEPS.append(self)
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class _Session(dict):
+    def set(self, key, value):
+        self[key] = value
+
+
+def _make_async(func):
+    async def _run(*args, **kwargs):
+        return func(*args, **kwargs)
+    return _run
+
+
+_SENT = []
+_STEPS = []
+
+
+@pytest.fixture
+def chainlit_app(monkeypatch):
+    import chainlit_app
+
+    _SENT.clear()
+    _STEPS.clear()
+    stub = SimpleNamespace(
+        Message=_Message,
+        Step=_Step,
+        user_session=_Session(id="session-1"),
+        context=SimpleNamespace(session=SimpleNamespace(thread_id="thread-1")),
+        make_async=_make_async,
+    )
+    monkeypatch.setattr(chainlit_app, "cl", stub)
+    monkeypatch.setattr(chainlit_app, "logger", MagicMock())
+    monkeypatch.setattr(chainlit_app, "answer_cache", MagicMock(get=MagicMock(return_value=None)))
+    return chainlit_app
+
+
+def test_on_message_streams_agent_tokens_and_shows_tool_steps(chainlit_app, monkeypatch):
+    """Test that only the agent's tokens are streamed and a tool call is rendered as a step."""
+    # A tool that asks its own model: its tokens come from the tools node and must not reach the answer
+    inner_llm = GenericFakeChatModel(messages=iter([AIMessage(content="internal summary text")]))
+
+    @tool
+    async def aggregate_activities(start_date: str, end_date: str, group_by: str = "type", activity_type: str = ""):
+        """Fake aggregate that summarizes with a model."""
+        await inner_llm.ainvoke("summarize")
+        return "activities\n3"
+
+    llm = _FakeLLM(messages=iter([AIMessage(content="You ran 3 times last week.")]))
+    app = build_graph(llm, tools=[aggregate_activities], checkpointer=InMemorySaver())
+    monkeypatch.setattr(chainlit_app, "app", app)
+
+    asyncio.run(chainlit_app.on_message(SimpleNamespace(content="How many runs did I do last week?")))
+
+    answer = _SENT[-1]
+    assert answer.content == "You ran 3 times last week."
+    # Streamed word by word, and nothing from the tool's own model
+    assert len(answer.tokens) > 1
+    assert "".join(answer.tokens) == "You ran 3 times last week."
+    assert [(s.name, s.type, s.output) for s in _STEPS] == [("aggregate_activities", "tool", "activities\n3")]
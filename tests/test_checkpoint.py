@@ -0,0 +1,103 @@
+import asyncio
+import duckdb
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from strava_agent.checkpoint import DuckDBSaver
+from strava_agent.graph import build_graph
+
+
+class _FakeLLM(GenericFakeChatModel):
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+
+def _llm(*answers):
+    return _FakeLLM(messages=iter([AIMessage(content=a) for a in answers]))
+
+
+def test_graph_resumes_thread_from_checkpoint(tmp_path):
+    """Test that a new saver on the same database resumes a thread from only the new message."""
+    db_path = str(tmp_path / "checkpoints.duckdb")
+    config = {"configurable": {"thread_id": "thread-1"}}
+
+    saver = DuckDBSaver(db_path)
+    app = build_graph(_llm("You ran 3 times."), tools=[], checkpointer=saver)
+    app.invoke({"messages": [SystemMessage(content="sys"), HumanMessage(content="How many runs?")]}, config)
+    saver.close()
+
+    # A restarted process picks up the thread
+    saver = DuckDBSaver(db_path)
+    app = build_graph(_llm("You rode 2 times."), tools=[], checkpointer=saver)
+    final_state = app.invoke({"messages": [HumanMessage(content="And rides?")]}, config)
+
+    contents = [m.content for m in final_state["messages"]]
+    assert contents == ["sys", "How many runs?", "You ran 3 times.", "And rides?", "You rode 2 times."]
+    saver.close()
+
+
+def test_list_and_delete_thread(tmp_path):
+    """Test that checkpoints are listed newest first per thread and removed with the thread."""
+    saver = DuckDBSaver(str(tmp_path / "checkpoints.duckdb"))
+    app = build_graph(_llm("a", "b"), tools=[], checkpointer=saver)
+    app.invoke({"messages": [HumanMessage(content="q1")]}, {"configurable": {"thread_id": "t1"}})
+    app.invoke({"messages": [HumanMessage(content="q2")]}, {"configurable": {"thread_id": "t2"}})
+
+    checkpoints = list(saver.list({"configurable": {"thread_id": "t1"}}))
+    ids = [c.config["configurable"]["checkpoint_id"] for c in checkpoints]
+    assert ids and ids == sorted(ids, reverse=True)
+    assert all(c.config["configurable"]["thread_id"] == "t1" for c in checkpoints)
+    assert len(list(saver.list({"configurable": {"thread_id": "t1"}}, limit=1))) == 1
+
+    saver.delete_thread("t1")
+    assert saver.get_tuple({"configurable": {"thread_id": "t1"}}) is None
+    assert saver.get_tuple({"configurable": {"thread_id": "t2"}}) is not None
+    saver.close()
+
+
+
+class _FailingConnection:
+    """Connection proxy whose DELETE on checkpoint_blobs fails."""
+
+    def __init__(self, con):
+        self.con = con
+
+    def __getattr__(self, name):
+        return getattr(self.con, name)
+
+    def execute(self, sql, params=()):
+        if sql.startswith("DELETE FROM checkpoint_blobs"):
+            raise duckdb.Error("boom")
+        return self.con.execute(sql, params)
+
+
+def test_delete_thread_rolls_back_on_error(tmp_path):
+    """Test that a failed delete leaves the thread intact and the shared connection usable."""
+    saver = DuckDBSaver(str(tmp_path / "checkpoints.duckdb"))
+    app = build_graph(_llm("a", "b"), tools=[], checkpointer=saver)
+    app.invoke({"messages": [HumanMessage(content="q1")]}, {"configurable": {"thread_id": "t1"}})
+
+    con = saver._con
+    saver._con = _FailingConnection(con)
+    with pytest.raises(duckdb.Error):
+        saver.delete_thread("t1")
+    saver._con = con
+
+    assert saver.get_tuple({"configurable": {"thread_id": "t1"}}) is not None
+    app.invoke({"messages": [HumanMessage(content="q2")]}, {"configurable": {"thread_id": "t1"}})
+    saver.close()
+
+def test_async_resume(tmp_path):
+    """Test that the async path (used by Chainlit) reads and writes the same checkpoints."""
+    saver = DuckDBSaver(str(tmp_path / "checkpoints.duckdb"))
+    app = build_graph(_llm("first", "second"), tools=[], checkpointer=saver)
+    config = {"configurable": {"thread_id": "async"}}
+
+    async def _run():
+        await app.ainvoke({"messages": [HumanMessage(content="q1")]}, config)
+        await app.ainvoke({"messages": [HumanMessage(content="q2")]}, config)
+        return await app.aget_state(config)
+
+    state = asyncio.run(_run())
+    assert [m.content for m in state.values["messages"]] == ["q1", "first", "q2", "second"]
+    saver.close()
@@ -0,0 +1,80 @@
+from unittest.mock import MagicMock, patch
+import asyncio
+from strava_agent.client import get_client, get_athlete_id, reset_client, get_async_client, run_async
+
+def test_get_client_is_shared(mock_env_vars):
+    """Test that the client is built once and reuses a pooled session."""
+    reset_client()
+    with patch("strava_agent.client.Client") as mock_client:
+        first = get_client()
+        second = get_client()
+        
+        assert first is second
+        mock_client.assert_called_once()
+        _, kwargs = mock_client.call_args
+        assert kwargs["access_token"] == "test_token"
+        assert kwargs["requests_session"] is not None
+    reset_client()
+
+def test_get_client_rebuilds_on_token_change(mock_env_vars, monkeypatch):
+    """Test that a new access token produces a new client."""
+    reset_client()
+    with patch("strava_agent.client.Client") as mock_client:
+        get_client()
+        monkeypatch.setenv("STRAVA_ACCESS_TOKEN", "new_token")
+        get_client()
+        
+        assert mock_client.call_count == 2
+        _, kwargs = mock_client.call_args
+        assert kwargs["access_token"] == "new_token"
+    reset_client()
+
+def test_get_athlete_id_cached_per_token(mock_env_vars, mock_strava_client, monkeypatch):
+    """Test that the athlete id is fetched once per token."""
+    mock_strava_client.get_athlete.return_value.id = 42
+    
+    assert get_athlete_id() == 42
+    assert get_athlete_id() == 42
+    assert mock_strava_client.get_athlete.call_count == 1
+    
+    monkeypatch.setenv("STRAVA_ACCESS_TOKEN", "new_token")
+    get_athlete_id()
+    assert mock_strava_client.get_athlete.call_count == 2
+
+def test_session_schedules_api_requests(mock_env_vars):
+    """Test that API requests go through the scheduler and feed it the rate-limit headers."""
+    from strava_agent.client import _ScheduledAdapter
+    
+    scheduler = MagicMock()
+    adapter = _ScheduledAdapter(scheduler)
+    response = MagicMock()
+    response.headers = {"X-RateLimit-Usage": "1,1", "X-RateLimit-Limit": "100,1000"}
+    response.status_code = 200
+    request = MagicMock()
+    request.method = "GET"
+    
+    with patch("requests.adapters.HTTPAdapter.send", return_value=response):
+        assert adapter.send(request) is response
+    
+    scheduler.slot.assert_called_once()
+    scheduler.update.assert_called_once_with(response.headers, "GET", 200)
+
+def test_async_client_closed_with_private_loop(mock_env_vars, monkeypatch):
+    """Test that run_async() closes the loop's client, and a new token replaces it on the same loop."""
+    reset_client()
+    
+    async def clients():
+        first = get_async_client()
+        assert get_async_client() is first
+        monkeypatch.setenv("STRAVA_ACCESS_TOKEN", "new_token")
+        second = get_async_client()
+        # Let the scheduled aclose() of the replaced client run
+        await asyncio.sleep(0.01)
+        return first, second
+    
+    first, second = run_async(clients())
+    
+    assert first is not second
+    assert first.is_closed
+    assert second.is_closed
+    reset_client()
@@ -0,0 +1,163 @@
+import os
+import sys
+import asyncio
+import pytest
+
+pytest.importorskip("chainlit")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "chainlit"))
+
+from chainlit.types import Pagination, ThreadFilter
+from duckdb_layer import DuckDBDataLayer
+
+
+def _thread(thread_id, created_at, name="Runs", user_id="user-1"):
+    return {"id": thread_id, "createdAt": created_at, "name": name, "userId": user_id,
+            "userIdentifier": "alice", "tags": [], "metadata": {}}
+
+
+def _step(step_id, thread_id="t1", **fields):
+    return {"id": step_id, "threadId": thread_id, "type": "run", "name": "agent",
+            "createdAt": "2026-01-01T00:00:00Z", "metadata": {}, **fields}
+
+
+def test_thread_roundtrip(tmp_path):
+    """Test that a thread is stored with its steps, renamed and deleted."""
+    async def _run():
+        layer = DuckDBDataLayer(str(tmp_path / "chainlit.duckdb"))
+        await layer.create_thread(_thread("t1", "2026-01-01T00:00:00Z"))
+        await layer.create_step(_step("s1", output="3 runs", end="2026-01-01T00:00:05Z"))
+        await layer.update_thread("t1", name="Weekly runs")
+        thread = await layer.get_thread("t1")
+        author = await layer.get_thread_author("t1")
+        await layer.delete_thread("t1")
+        deleted = await layer.get_thread("t1")
+        await layer.close()
+        return thread, author, deleted
+
+    thread, author, deleted = asyncio.run(_run())
+
+    assert thread["name"] == "Weekly runs"
+    assert [s["output"] for s in thread["steps"]] == ["3 runs"]
+    assert author == "alice"
+    assert deleted is None
+
+
+def test_user_and_feedback(tmp_path):
+    """Test that users are looked up by identifier and feedback is upserted by id."""
+    async def _run():
+        layer = DuckDBDataLayer(str(tmp_path / "chainlit.duckdb"))
+        await layer.create_user({"id": "user-1", "identifier": "alice", "metadata": {"role": "admin"},
+                                 "createdAt": "2026-01-01T00:00:00Z"})
+        user = await layer.get_user("alice")
+        missing = await layer.get_user("bob")
+        await layer.upsert_feedback({"id": "f1", "forId": "s1", "value": 0, "comment": None})
+        await layer.upsert_feedback({"id": "f1", "forId": "s1", "value": 1, "comment": "better"})
+        feedback = await layer._fetchall("SELECT value, comment FROM cl_feedback")
+        await layer.close()
+        return user, missing, feedback
+
+    user, missing, feedback = asyncio.run(_run())
+
+    assert user["metadata"] == {"role": "admin"}
+    assert missing is None
+    assert feedback == [(1, "better")]
+
+
+def test_list_threads_pages_through_ties(tmp_path):
+    """Test that keyset pages on (createdAt, id) neither skip nor repeat threads with equal timestamps."""
+    async def _run():
+        layer = DuckDBDataLayer(str(tmp_path / "chainlit.duckdb"))
+        for thread_id, created_at in [("t1", "2026-01-01"), ("t2", "2026-01-02"), ("t3", "2026-01-03"),
+                                      ("t4", "2026-01-03"), ("t5", "2026-01-04")]:
+            await layer.create_thread(_thread(thread_id, created_at))
+        pages, cursor = [], None
+        while True:
+            page = await layer.list_threads(Pagination(first=2, cursor=cursor), None)
+            pages.append(page)
+            if not page.pageInfo.hasNextPage:
+                break
+            cursor = page.pageInfo.endCursor
+        past_end = await layer.list_threads(Pagination(first=2, cursor="t1"), None)
+        await layer.close()
+        return pages, past_end
+
+    pages, past_end = asyncio.run(_run())
+
+    # t4 and t3 share a timestamp and fall on either side of the first page boundary
+    assert [[t["id"] for t in p.data] for p in pages] == [["t5", "t4"], ["t3", "t2"], ["t1"]]
+    assert [p.pageInfo.hasNextPage for p in pages] == [True, True, False]
+    assert pages[-1].pageInfo.endCursor == "t1"
+    assert past_end.data == []
+    assert not past_end.pageInfo.hasNextPage
+    assert past_end.pageInfo.endCursor is None
+
+
+def test_step_updates_are_coalesced(tmp_path):
+    """Test that repeated updates to a running step are merged into one buffered write."""
+    async def _run():
+        layer = DuckDBDataLayer(str(tmp_path / "chainlit.duckdb"), flush_interval=60)
+        await layer.create_thread(_thread("t1", "2026-01-01T00:00:00Z"))
+        await layer.create_step(_step("s1", input="How many runs?"))
+        await layer.update_step(_step("s1", output="You ran"))
+        await layer.update_step(_step("s1", output="You ran 3 times."))
+        buffered = len(layer._pending_steps)
+        stored = await layer._fetchall("SELECT count(*) FROM cl_steps")
+        await layer.flush()
+        rows = await layer._fetchall("SELECT input, output FROM cl_steps")
+        await layer.close()
+        return buffered, stored, rows
+
+    buffered, stored, rows = asyncio.run(_run())
+
+    assert buffered == 1
+    assert stored == [(0,)]
+    # The create and both updates land as one row carrying the latest fields
+    assert rows == [("How many runs?", "You ran 3 times.")]
+
+
+def test_close_writes_buffered_steps(tmp_path):
+    """Test that steps still waiting for the debounce are written on close."""
+    db_path = str(tmp_path / "chainlit.duckdb")
+
+    async def _write():
+        layer = DuckDBDataLayer(db_path, flush_interval=60)
+        await layer.create_thread(_thread("t1", "2026-01-01T00:00:00Z"))
+        await layer.create_step(_step("s1", output="partial"))
+        await layer.close()
+
+    async def _read():
+        layer = DuckDBDataLayer(db_path)
+        thread = await layer.get_thread("t1")
+        await layer.close()
+        return thread
+
+    asyncio.run(_write())
+    thread = asyncio.run(_read())
+
+    assert [s["output"] for s in thread["steps"]] == ["partial"]
+
+
+def test_list_threads_filters_with_cursor(tmp_path):
+    """Test that the user and search filters apply on every page together with the cursor."""
+    async def _run():
+        layer = DuckDBDataLayer(str(tmp_path / "chainlit.duckdb"))
+        for thread_id, created_at, name, user_id in [
+            ("t1", "2026-01-01", "Long runs", "user-1"),
+            ("t2", "2026-01-02", "Rides", "user-1"),
+            ("t3", "2026-01-03", "Tempo runs", "user-1"),
+            ("t4", "2026-01-03", "Easy runs", "user-2"),
+            ("t5", "2026-01-04", "Hill runs", "user-1"),
+        ]:
+            await layer.create_thread(_thread(thread_id, created_at, name, user_id))
+        thread_filter = ThreadFilter(userId="user-1", search="RUNS")
+        first = await layer.list_threads(Pagination(first=2), thread_filter)
+        second = await layer.list_threads(Pagination(first=2, cursor=first.pageInfo.endCursor), thread_filter)
+        await layer.close()
+        return first, second
+
+    first, second = asyncio.run(_run())
+
+    assert [t["id"] for t in first.data] == ["t5", "t3"]
+    assert first.pageInfo.hasNextPage
+    assert [t["id"] for t in second.data] == ["t1"]
+    assert not second.pageInfo.hasNextPage
@@ -0,0 +1,58 @@
+import time
+import asyncio
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.tools import StructuredTool
+from strava_agent.executor import ToolExecutor
+
+def _slow(seconds: float):
+    """Sleep, then report how long it slept."""
+    time.sleep(seconds)
+    return f"slept {seconds}"
+
+async def _aslow(seconds: float):
+    await asyncio.sleep(seconds)
+    return f"slept {seconds}"
+
+slow = StructuredTool.from_function(func=_slow, coroutine=_aslow, name="slow")
+
+def _state(*durations):
+    calls = [{"name": "slow", "args": {"seconds": d}, "id": f"call_{i}", "type": "tool_call"} for i, d in enumerate(durations)]
+    return {"messages": [AIMessage(content="", tool_calls=calls)]}
+
+def test_ainvoke_runs_calls_concurrently(mock_env_vars):
+    """Test that several tool calls take as long as the slowest one, in call order."""
+    executor = ToolExecutor([slow], default_timeout=5)
+    
+    started = time.monotonic()
+    messages = asyncio.run(executor.ainvoke(_state(0.2, 0.2, 0.2)))["messages"]
+    
+    assert time.monotonic() - started < 0.5
+    assert [m.tool_call_id for m in messages] == ["call_0", "call_1", "call_2"]
+    assert all(m.content == "slept 0.2" for m in messages)
+
+def test_ainvoke_times_out_stragglers(mock_env_vars):
+    """Test that a call past its deadline is cancelled and marked, while the others return."""
+    executor = ToolExecutor([slow], default_timeout=0.2)
+    
+    started = time.monotonic()
+    fast, straggler = asyncio.run(executor.ainvoke(_state(0.01, 5)))["messages"]
+    
+    assert time.monotonic() - started < 1
+    assert fast.content == "slept 0.01"
+    assert straggler.content.startswith("Error: slow timed out after 0.2s")
+    assert straggler.status == "error"
+
+def test_invoke_times_out_stragglers(mock_env_vars):
+    """Test the blocking path with a per-tool timeout override."""
+    executor = ToolExecutor([slow], default_timeout=5, timeouts={"slow": 0.2})
+    
+    started = time.monotonic()
+    fast, straggler = executor.invoke(_state(0.01, 2))["messages"]
+    
+    assert time.monotonic() - started < 1
+    assert isinstance(fast, ToolMessage) and fast.content == "slept 0.01"
+    assert "timed out" in straggler.content
+
+def test_unknown_tool():
+    state = {"messages": [AIMessage(content="", tool_calls=[{"name": "missing", "args": {}, "id": "x", "type": "tool_call"}])]}
+    assert ToolExecutor([slow]).invoke(state)["messages"][0].content == "Error: unknown tool missing"
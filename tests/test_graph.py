@@ -1,7 +1,7 @@
 import pytest
 from unittest.mock import MagicMock
-from langchain_core.messages import ToolMessage, HumanMessage, SystemMessage
-from strava_agent.graph import post_process_node, route_tools, build_graph
+from langchain_core.messages import ToolMessage, HumanMessage, SystemMessage, AIMessage, RemoveMessage
+from strava_agent.graph import post_process_node, route_tools, build_graph, compact_node, router_node, route_fast_path
 
 def test_post_process_node_analysis():
     """Test that post_process_node correctly analyzes JSONL output from tools."""
@@ -46,4 +46,89 @@ def test_build_graph():
     """Smoke test to ensure graph builds without errors."""
     mock_llm = MagicMock()
     app = build_graph(mock_llm)
-    assert app is not None
\ No newline at end of file
+    assert app is not None
+
+
+def test_post_process_node_statistics():
+    """Test that the analysis includes distance statistics, date span and the longest candidates."""
+    tool_output = "\n".join([
+        '{"id": 1, "name": "Easy", "type": "Run", "distance_km": 5.0, "start_date": "2024-01-02T08:00:00"}',
+        '{"id": 2, "name": "Long", "type": "Run", "distance_km": 21.1, "start_date": "2024-01-07T08:00:00"}',
+        '{"id": 3, "name": "Commute", "type": "Ride", "distance_km": 12.0, "start_date": "2024-01-05T08:00:00"}',
+    ])
+    message = ToolMessage(content=tool_output, tool_call_id="call_1", name="get_activities_in_range")
+    
+    content = post_process_node({"messages": [message]})["messages"][0].content
+    
+    assert "Date span: 2024-01-02 to 2024-01-07" in content
+    assert "Run: total 26.10 km, mean 13.05 km, max 21.10 km" in content
+    assert content.index('id 2 "Long"') < content.index('id 3 "Commute"')
+
+def test_post_process_node_batches_parallel_calls():
+    """Test that several range results from one tools step are analyzed together, de-duplicated by id."""
+    first = ToolMessage(content='{"id": 1, "type": "Run"}\n{"id": 2, "type": "Run"}', tool_call_id="a", name="get_activities_in_range")
+    second = ToolMessage(content='{"id": 2, "type": "Run"}\n{"id": 3, "type": "Ride"}', tool_call_id="b", name="get_activities_in_range")
+    
+    state = {"messages": [HumanMessage(content="q"), first, second]}
+    content = post_process_node(state)["messages"][0].content
+    
+    assert "3 activities" in content
+    assert "Run: 2, Ride: 1" in content
+    assert route_tools(state) == "post_process"
+
+def _turn(index, payload_lines):
+    payload = "\n".join(
+        f'{{"id": {index * 1000 + i}, "name": "Run", "type": "Run", "distance_km": 5.0, "start_date": "2024-01-01T08:00:00"}}'
+        for i in range(payload_lines)
+    )
+    call_id = f"call_{index}"
+    return [
+        HumanMessage(content=f"question {index}", id=f"h{index}"),
+        AIMessage(content="", tool_calls=[{"name": "get_activities_in_range", "args": {"start_date": "2024-01-01", "end_date": "2024-02-01"}, "id": call_id}], id=f"a{index}"),
+        ToolMessage(content=payload, tool_call_id=call_id, name="get_activities_in_range", id=f"t{index}"),
+        AIMessage(content=f"answer {index}", id=f"r{index}"),
+    ]
+
+def test_compact_node_summarizes_old_tool_payloads():
+    """Test that old tool payloads are replaced in place while recent turns stay verbatim."""
+    messages = [SystemMessage(content="system", id="s")] + _turn(1, 50) + _turn(2, 50) + _turn(3, 50)
+    
+    result = compact_node({"messages": messages}, token_budget=100000, keep_turns=2)
+    
+    updates = result["messages"]
+    assert [m.id for m in updates] == ["t1"]
+    assert updates[0].content.startswith("[compacted] The tool returned 50 activities")
+
+def test_compact_node_drops_oldest_turns_over_budget():
+    """Test that whole old turns are removed when the history is over budget."""
+    messages = [SystemMessage(content="system", id="s")] + _turn(1, 50) + _turn(2, 50) + _turn(3, 50)
+    
+    result = compact_node({"messages": messages}, token_budget=1, keep_turns=1)
+    
+    removed = {m.id for m in result["messages"] if isinstance(m, RemoveMessage)}
+    assert removed == {"h1", "a1", "t1", "r1", "h2", "a2", "t2", "r2"}
+
+def test_compact_node_noop_for_short_history():
+    """Test that a short conversation is left untouched."""
+    messages = [SystemMessage(content="system", id="s"), HumanMessage(content="hi", id="h")]
+    assert compact_node({"messages": messages}, token_budget=6000, keep_turns=2) == {}
+
+def test_router_node_emits_tool_calls():
+    """Test that a templated question skips the LLM planning step."""
+    state = {"messages": [SystemMessage(content="system"), HumanMessage(content="How many runs did I do last week?")]}
+    
+    message = router_node(state, tool_names={"aggregate_activities"})["messages"][0]
+    
+    assert message.tool_calls[0]["name"] == "aggregate_activities"
+    assert route_fast_path({"messages": state["messages"] + [message]}) == "tools"
+
+def test_router_node_defers_to_agent():
+    """Test that other questions go to the agent unchanged."""
+    state = {"messages": [HumanMessage(content="Which of my runs felt hardest?")]}
+    assert router_node(state, tool_names={"aggregate_activities"}) == {}
+    assert route_fast_path(state) == "agent"
+
+def test_build_graph_fast_path_toggle():
+    """Test that the router node is only added when the fast path is enabled."""
+    assert "router" in build_graph(MagicMock(), fast_path=True).get_graph().nodes
+    assert "router" not in build_graph(MagicMock(), fast_path=False).get_graph().nodes
@@ -0,0 +1,55 @@
+import duckdb
+from strava_agent.logger import InteractionLogger, BufferedWriter
+
+def _count(db_path):
+    with duckdb.connect(db_path) as con:
+        return con.execute("SELECT count(*) FROM interactions").fetchone()[0]
+
+def test_log_and_flush(tmp_path):
+    """Test that queued interactions are written once flushed."""
+    db_path = str(tmp_path / "log.duckdb")
+    logger = InteractionLogger(db_path, flush_interval=60)
+    
+    logger.log("session", "user", "How many runs?")
+    logger.log("session", "assistant", "Five.")
+    logger.log("session", "assistant", "")
+    logger.flush()
+    
+    with duckdb.connect(db_path) as con:
+        rows = con.execute("SELECT role, content FROM interactions ORDER BY timestamp").fetchall()
+    assert rows == [("user", "How many runs?"), ("assistant", "Five.")]
+    logger.close()
+
+def test_batch_size_triggers_write(tmp_path):
+    """Test that a full batch is written without waiting for the flush interval."""
+    db_path = str(tmp_path / "log.duckdb")
+    logger = InteractionLogger(db_path, batch_size=2, flush_interval=60)
+    
+    logger.log("session", "user", "one")
+    logger.log("session", "user", "two")
+    logger._writer._queue.join()
+    
+    assert _count(db_path) == 2
+    logger.close()
+
+def test_close_flushes_pending(tmp_path):
+    """Test that closing the logger writes everything still queued."""
+    db_path = str(tmp_path / "log.duckdb")
+    logger = InteractionLogger(db_path, batch_size=1000, flush_interval=60)
+    for i in range(10):
+        logger.log("session", "user", f"message {i}")
+    
+    logger.close()
+    
+    assert _count(db_path) == 10
+
+def test_write_errors_are_logged(tmp_path, caplog):
+    """Test that a failed batch is reported through logging and the writer keeps running."""
+    writer = BufferedWriter(str(tmp_path / "log.duckdb"), "INSERT INTO missing_table VALUES (?)", flush_interval=60)
+    
+    writer.write((1,))
+    writer.flush()
+    writer.close()
+    
+    assert "Error writing 1 rows to DuckDB" in caplog.text
+    assert caplog.records[0].exc_info is not None
@@ -0,0 +1,27 @@
+from datetime import date
+from strava_agent.periods import resolve_period
+
+TODAY = date(2024, 3, 14)  # a Thursday
+
+def test_resolve_relative_periods():
+    """Test calendar weeks (starting Monday), months and years relative to today."""
+    assert resolve_period("How far did I run this week?", TODAY)[:2] == (date(2024, 3, 11), date(2024, 3, 18))
+    assert resolve_period("runs last week", TODAY)[:2] == (date(2024, 3, 4), date(2024, 3, 11))
+    assert resolve_period("volume last month", TODAY)[:2] == (date(2024, 2, 1), date(2024, 3, 1))
+    assert resolve_period("rides this year", TODAY)[:2] == (date(2024, 1, 1), date(2025, 1, 1))
+    assert resolve_period("what did I do yesterday", TODAY)[:2] == (date(2024, 3, 13), date(2024, 3, 14))
+
+def test_resolve_rolling_periods():
+    """Test trailing windows that end today."""
+    assert resolve_period("runs in the last 10 days", TODAY)[:2] == (date(2024, 3, 5), date(2024, 3, 15))
+    assert resolve_period("the past week", TODAY)[:2] == (date(2024, 3, 8), date(2024, 3, 15))
+
+def test_resolve_named_month_and_year():
+    """Test that a bare month means its most recent occurrence."""
+    assert resolve_period("longest ride in June", TODAY)[:2] == (date(2023, 6, 1), date(2023, 7, 1))
+    assert resolve_period("longest ride in February", TODAY)[:2] == (date(2024, 2, 1), date(2024, 3, 1))
+    assert resolve_period("runs in may 2022", TODAY) == (date(2022, 5, 1), date(2022, 6, 1), "in may 2022")
+    assert resolve_period("total distance in 2021", TODAY)[:2] == (date(2021, 1, 1), date(2022, 1, 1))
+
+def test_resolve_no_period():
+    assert resolve_period("What is my biggest ride ever?", TODAY) is None
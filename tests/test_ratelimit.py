@@ -0,0 +1,116 @@
+import time
+import asyncio
+import threading
+from strava_agent.ratelimit import RateLimitScheduler, INTERACTIVE, BACKGROUND, request_priority, _PRIORITY
+
+class FakeClock:
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def test_update_from_headers():
+    """Test that usage and limits are taken from Strava's response headers."""
+    scheduler = RateLimitScheduler(clock=FakeClock())
+    scheduler.update({"X-RateLimit-Usage": "50,300", "X-RateLimit-Limit": "200,2000"})
+    
+    stats = scheduler.stats()
+    assert stats["short_usage"] == 50
+    assert stats["short_limit"] == 200
+    assert stats["long_usage"] == 300
+    assert stats["long_limit"] == 2000
+
+def test_interactive_backs_off_before_limit():
+    """Test that requests stop before the quota is exhausted, not after a 429."""
+    scheduler = RateLimitScheduler(short_limit=10, long_limit=1000, safety_margin=2, clock=FakeClock(900.0 * 1000))
+    scheduler.update({"X-RateLimit-Usage": "7,7", "X-RateLimit-Limit": "10,1000"})
+    
+    assert scheduler.try_acquire(INTERACTIVE) == 0
+    scheduler.release()
+    # 8 used out of 10 with a margin of 2: wait for the next quarter hour
+    assert scheduler.try_acquire(INTERACTIVE) == 900
+
+def test_background_uses_smaller_share():
+    """Test that background requests stop at their share of the quota while interactive ones continue."""
+    scheduler = RateLimitScheduler(short_limit=100, long_limit=1000, background_share=0.5, clock=FakeClock())
+    scheduler.update({"X-RateLimit-Usage": "60,60", "X-RateLimit-Limit": "100,1000"})
+    
+    assert scheduler.try_acquire(BACKGROUND) > 0
+    assert scheduler.try_acquire(INTERACTIVE) == 0
+
+def test_window_refill():
+    """Test that the short bucket refills at the quarter-hour boundary."""
+    clock = FakeClock(900.0 * 1000)
+    scheduler = RateLimitScheduler(short_limit=10, long_limit=1000, clock=clock)
+    scheduler.update({"X-RateLimit-Usage": "10,10", "X-RateLimit-Limit": "10,1000"})
+    assert scheduler.try_acquire(INTERACTIVE) > 0
+    
+    clock.now += 900
+    assert scheduler.try_acquire(INTERACTIVE) == 0
+
+def test_429_blocks_until_refill():
+    """Test that a 429 response holds further requests."""
+    scheduler = RateLimitScheduler(short_limit=100, long_limit=1000, clock=FakeClock())
+    scheduler.update({}, status_code=429)
+    assert scheduler.try_acquire(INTERACTIVE) > 0
+
+def test_concurrency_cap():
+    """Test that no more than max_concurrency requests are in flight."""
+    scheduler = RateLimitScheduler(max_concurrency=1, clock=FakeClock())
+    assert scheduler.try_acquire(INTERACTIVE) == 0
+    assert scheduler.try_acquire(INTERACTIVE) > 0
+    scheduler.release()
+    assert scheduler.try_acquire(INTERACTIVE) == 0
+
+def test_background_yields_to_waiting_interactive():
+    """Test that background requests wait while interactive ones are queued."""
+    scheduler = RateLimitScheduler(max_concurrency=1, clock=FakeClock())
+    scheduler.acquire(INTERACTIVE)
+    
+    waiter = threading.Thread(target=scheduler.acquire, args=(INTERACTIVE,))
+    waiter.start()
+    while scheduler.stats()["waiting_interactive"] == 0:
+        pass
+    
+    scheduler.release()
+    waiter.join(timeout=5)
+    # The queued interactive request got the slot; background is still refused
+    assert scheduler.stats()["in_flight"] == 1
+    assert scheduler.try_acquire(BACKGROUND) > 0
+
+def test_aslot():
+    """Test the async slot acquires and releases."""
+    scheduler = RateLimitScheduler(clock=FakeClock())
+    
+    async def _run():
+        async with scheduler.aslot(INTERACTIVE):
+            assert scheduler.stats()["in_flight"] == 1
+    
+    asyncio.run(_run())
+    assert scheduler.stats()["in_flight"] == 0
+
+def test_async_waiter_wakes_on_release():
+    """Test that an async waiter blocked by the concurrency cap wakes as soon as a slot is released."""
+    scheduler = RateLimitScheduler(max_concurrency=1, clock=FakeClock())
+    scheduler.acquire(INTERACTIVE)
+    
+    async def _run():
+        waiter = asyncio.create_task(scheduler.aacquire(INTERACTIVE))
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        started = time.perf_counter()
+        # Released from another thread, as the blocking client does
+        threading.Thread(target=scheduler.release).start()
+        await waiter
+        return time.perf_counter() - started
+    
+    assert asyncio.run(_run()) < 0.5
+    assert scheduler.stats()["in_flight"] == 1
+
+def test_request_priority_context():
+    """Test that request_priority sets the default priority for the block."""
+    assert _PRIORITY.get() == INTERACTIVE
+    with request_priority(BACKGROUND):
+        assert _PRIORITY.get() == BACKGROUND
+    assert _PRIORITY.get() == INTERACTIVE
@@ -0,0 +1,54 @@
+import pytest
+from datetime import datetime
+import duckdb
+from strava_agent.store import ActivityStore
+
+def _records(store, **filters):
+    _, rows = store.personal_records(**filters)
+    return {(r[0], r[1]): r[3] for r in rows}
+
+def test_records_update_incrementally(tmp_path, make_activity):
+    """Test that a new activity only replaces the records it beats."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"))
+    store.upsert([
+        make_activity(1, datetime(2024, 1, 1, 8, 0), distance=10000.0, moving_time=3000),
+        make_activity(2, datetime(2024, 1, 2, 8, 0), distance=21100.0, moving_time=7000),
+    ])
+    
+    records = _records(store, activity_type="Run")
+    assert records[("Run", "longest_distance")] == 2
+    assert records[("Run", "fastest_10k")] == 1
+    assert ("Run", "fastest_marathon") not in records
+    
+    # A faster 10k that is not the longest run
+    store.upsert([make_activity(3, datetime(2024, 1, 3, 8, 0), distance=10000.0, moving_time=2700)])
+    
+    records = _records(store, activity_type="Run")
+    assert records[("Run", "fastest_10k")] == 3
+    assert records[("Run", "longest_distance")] == 2
+    _, rows = store.personal_records(record="fastest_10k")
+    assert rows[0][2] == pytest.approx(2700)
+
+def test_records_recomputed_when_holder_changes(tmp_path, make_activity):
+    """Test that editing a record holder falls back to the next best activity."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"))
+    store.upsert([
+        make_activity(1, datetime(2024, 1, 1, 8, 0), distance=10000.0),
+        make_activity(2, datetime(2024, 1, 2, 8, 0), distance=30000.0),
+    ])
+    
+    # The long run was actually a ride
+    store.upsert([make_activity(2, datetime(2024, 1, 2, 8, 0), activity_type="Ride", distance=30000.0)])
+    
+    records = _records(store)
+    assert records[("Run", "longest_distance")] == 1
+    assert records[("Ride", "longest_distance")] == 2
+
+def test_records_built_for_existing_history(tmp_path, make_activity):
+    """Test that a database created before the index gets it built on open."""
+    path = str(tmp_path / "store.duckdb")
+    ActivityStore(path).upsert([make_activity(1, datetime(2024, 1, 1, 8, 0))])
+    with duckdb.connect(path) as con:
+        con.execute("DELETE FROM personal_records")
+    
+    assert _records(ActivityStore(path))[("Run", "longest_distance")] == 1
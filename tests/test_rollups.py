@@ -0,0 +1,48 @@
+from datetime import datetime, date
+import duckdb
+from strava_agent.store import ActivityStore
+
+def _weeks(store, activity_type=None):
+    _, rows = store.rollups("week", datetime(2024, 1, 1), datetime(2024, 3, 1), activity_type)
+    return {row[1]: (row[2], row[3]) for row in rows}
+
+def test_weekly_and_monthly_rollups(tmp_path, make_activity):
+    """Test that rollups are per ISO week and month, with the change against the previous period."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"))
+    store.upsert([
+        make_activity(1, datetime(2024, 1, 1, 8, 0)),
+        make_activity(2, datetime(2024, 1, 7, 8, 0)),
+        make_activity(3, datetime(2024, 1, 8, 8, 0), distance=15000.0),
+        make_activity(4, datetime(2024, 1, 9, 8, 0), activity_type="Ride", distance=40000.0),
+    ])
+    
+    columns, rows = store.rollups("week", datetime(2024, 1, 1), datetime(2024, 2, 1), "run")
+    assert columns[:4] == ["week", "starts", "activities", "total_km"]
+    assert [row[0] for row in rows] == ["2024-W01", "2024-W02"]
+    assert [row[3] for row in rows] == [10.0, 15.0]
+    assert rows[0][-1] is None
+    assert rows[1][-1] == 50.0
+    
+    _, months = store.rollups("month", datetime(2024, 1, 1), datetime(2024, 2, 1))
+    assert months == [("2024-01", date(2024, 1, 1), 4, 65.0, 1.67, 40.0, 40.0, None)]
+
+def test_rollups_follow_edits(tmp_path, make_activity):
+    """Test that moving an activity to another week updates both weeks."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"))
+    store.upsert([
+        make_activity(1, datetime(2024, 1, 1, 8, 0)),
+        make_activity(2, datetime(2024, 1, 2, 8, 0)),
+    ])
+    
+    store.upsert([make_activity(2, datetime(2024, 1, 15, 8, 0), distance=8000.0)])
+    
+    assert _weeks(store) == {date(2024, 1, 1): (1, 5.0), date(2024, 1, 15): (1, 8.0)}
+
+def test_rollups_built_for_existing_history(tmp_path, make_activity):
+    """Test that a database created before the rollups gets them built on open."""
+    path = str(tmp_path / "store.duckdb")
+    ActivityStore(path).upsert([make_activity(1, datetime(2024, 1, 3, 8, 0))])
+    with duckdb.connect(path) as con:
+        con.execute("DELETE FROM activity_rollups")
+    
+    assert _weeks(ActivityStore(path)) == {date(2024, 1, 1): (1, 5.0)}
@@ -0,0 +1,54 @@
+from datetime import date
+from strava_agent.router import parse_intent, plan_tool_calls
+
+TODAY = date(2024, 3, 14)  # a Thursday
+TOOLS = {"aggregate_activities", "get_activities_in_range", "get_top_activities"}
+
+def test_parse_count_and_total():
+    """Test that counts and distance totals are recognized with their period and type."""
+    assert parse_intent("How many runs did I do last week?", TODAY) == {
+        "intent": "count", "activity_type": "Run", "start_date": "2024-03-04", "end_date": "2024-03-11", "distance": None,
+    }
+    assert parse_intent("How far did I ride in June?", TODAY)["intent"] == "total"
+    assert parse_intent("How many km did I run this month?", TODAY)["intent"] == "total"
+    assert parse_intent("How many activities in 2023?", TODAY)["activity_type"] is None
+
+def test_parse_longest_and_fastest():
+    assert parse_intent("What was my longest run this year?", TODAY)["intent"] == "longest"
+    assert parse_intent("What's my fastest 10k?", TODAY)["intent"] == "fastest"
+    # Listed activities can't be ranked by pace, so the fastest within a period goes to the LLM
+    assert parse_intent("fastest ride in the last 30 days", TODAY) is None
+
+def test_parse_falls_back_to_llm():
+    """Test that questions the fast path can't answer faithfully are left to the LLM."""
+    assert parse_intent("What is my biggest ride ever?", TODAY) is None
+    assert parse_intent("How many runs last week compared to last month?", TODAY) is None
+    assert parse_intent("How many hours last week?", TODAY) is None
+    assert parse_intent("How many runs and rides this week?", TODAY) is None
+    assert parse_intent("What was my average pace last week?", TODAY) is None
+    assert parse_intent("What was my fastest 5k split last month?", TODAY) is None
+    assert parse_intent("How many runs?", TODAY) is None
+
+def test_plan_tool_calls():
+    """Test that counts use one aggregate query and longest a top-N query over the period."""
+    count = plan_tool_calls(parse_intent("How many runs last week?", TODAY), TOOLS)
+    assert count[0]["name"] == "aggregate_activities"
+    assert count[0]["args"] == {"start_date": "2024-03-04", "end_date": "2024-03-11", "group_by": "none", "activity_type": "Run"}
+    
+    longest = plan_tool_calls(parse_intent("longest ride in June", TODAY), TOOLS)
+    assert longest[0]["name"] == "get_top_activities"
+    assert longest[0]["args"] == {"start_date": "2023-06-01", "end_date": "2023-07-01",
+                                  "rank_by": "distance", "activity_type": "Ride"}
+    
+    assert plan_tool_calls(parse_intent("How many runs last week?", TODAY), {"get_activities_in_range"}) == []
+
+def test_all_time_records_use_the_index():
+    """Test that longest/fastest without a period become one personal records lookup."""
+    tools = TOOLS | {"get_personal_records"}
+    
+    fastest = plan_tool_calls(parse_intent("What's my fastest half marathon?", TODAY), tools)
+    assert fastest[0]["name"] == "get_personal_records"
+    assert fastest[0]["args"] == {"activity_type": "", "record": "fastest_half_marathon"}
+    
+    longest = plan_tool_calls(parse_intent("longest ride ever", TODAY), tools)
+    assert longest[0]["args"] == {"activity_type": "Ride", "record": "longest_distance"}
@@ -0,0 +1,212 @@
+import pytest
+import asyncio
+from datetime import datetime, timedelta
+from unittest.mock import MagicMock
+from concurrent.futures import ThreadPoolExecutor
+from strava_agent.store import ActivityStore, get_store
+
+def test_sync_and_query_range(tmp_path, make_activity):
+    """Test that synced activities can be queried by local date range."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"))
+    client = MagicMock()
+    client.get_activities.return_value = [
+        make_activity(1, datetime(2024, 1, 5, 8, 0)),
+        make_activity(2, datetime(2024, 2, 5, 8, 0), activity_type="Ride", distance=40000.0),
+    ]
+    
+    written = store.sync(client, datetime(2024, 1, 1))
+    rows = store.query_range(datetime(2024, 1, 1), datetime(2024, 2, 1))
+    
+    assert written == 2
+    assert [r["id"] for r in rows] == [1]
+    assert rows[0]["type"] == "Run"
+    assert rows[0]["distance_m"] == 5000.0
+
+def test_upsert_moves_activity_date(tmp_path, make_activity):
+    """Test that refetching an activity with an edited start date stores the new date."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"))
+    store.upsert([make_activity(1, datetime(2024, 1, 5, 8, 0))])
+    
+    store.upsert([make_activity(1, datetime(2024, 1, 20, 8, 0))])
+    
+    assert store.query_range(datetime(2024, 1, 1), datetime(2024, 1, 10)) == []
+    rows = store.query_range(datetime(2024, 1, 15), datetime(2024, 2, 1))
+    assert [(r["id"], r["start_date_local"]) for r in rows] == [(1, datetime(2024, 1, 20, 8, 0))]
+
+def test_pending_windows_first_sync(tmp_path):
+    """Test that an empty store fetches everything from the requested start until now."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"))
+    windows = store.pending_windows(datetime(2024, 1, 1))
+    
+    assert len(windows) == 1
+    after, before = windows[0]
+    assert after <= datetime(2024, 1, 1)
+    assert before is None
+
+def test_pending_windows_incremental(tmp_path, make_activity):
+    """Test that later syncs only fetch older history and activities newer than the latest stored one."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"), sync_interval=60)
+    now = datetime(2024, 3, 1, 12, 0)
+    store.upsert([make_activity(1, datetime(2024, 2, 20, 8, 0))])
+    store.mark_synced(datetime(2024, 1, 1), now)
+    
+    # Within the sync interval and inside the covered window: nothing to fetch
+    assert store.pending_windows(datetime(2024, 2, 1), now + timedelta(seconds=10)) == []
+    
+    # After the interval: only the gap since the latest stored start_date
+    assert store.pending_windows(datetime(2024, 2, 1), now + timedelta(minutes=5)) == [(datetime(2024, 2, 20, 8, 0), None)]
+    
+    # Older history extends the window backwards up to the previous start
+    windows = store.pending_windows(datetime(2023, 6, 1), now + timedelta(seconds=10))
+    assert len(windows) == 1
+    assert windows[0][1] == datetime(2024, 1, 1)
+
+def test_frequent_syncs_still_fetch_new_activities(tmp_path):
+    """Test that calls more often than the sync interval still pull the recent gap once it has elapsed."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"), sync_interval=60)
+    client = MagicMock()
+    client.get_activities.return_value = []
+    start = datetime(2024, 3, 1, 12, 0)
+    
+    for i in range(11):
+        store.sync(client, datetime(2024, 2, 1), now=start + timedelta(seconds=30 * i))
+    
+    recent = [c for c in client.get_activities.call_args_list if c.kwargs["before"] is None]
+    assert len(recent) == 6
+
+def test_backfill_does_not_advance_synced_at(tmp_path):
+    """Test that fetching only older history keeps the time of the last recent sync."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"), sync_interval=60)
+    client = MagicMock()
+    client.get_activities.return_value = []
+    start = datetime(2024, 3, 1, 12, 0)
+    store.sync(client, datetime(2024, 2, 1), now=start)
+    
+    store.sync(client, datetime(2023, 6, 1), now=start + timedelta(seconds=30))
+    
+    assert store.coverage()[1] == start
+    assert store.pending_windows(datetime(2023, 6, 1), start + timedelta(seconds=60))[-1][1] is None
+
+def test_upsert_replaces_existing(tmp_path, make_activity):
+    """Test that re-syncing an edited activity replaces the stored row."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"))
+    store.upsert([make_activity(1, datetime(2024, 1, 5, 8, 0), name="Old")])
+    store.upsert([make_activity(1, datetime(2024, 1, 5, 8, 0), name="New")])
+    
+    rows = store.query_range(datetime(2024, 1, 1), datetime(2024, 2, 1))
+    assert len(rows) == 1
+    assert rows[0]["name"] == "New"
+
+def test_get_store_is_cached(tmp_path):
+    """Test that get_store returns one instance per database path."""
+    path = str(tmp_path / "store.duckdb")
+    assert get_store(path) is get_store(path)
+
+def test_aggregate_by_type(tmp_path, make_activity):
+    """Test grouped totals per activity type."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"))
+    store.upsert([
+        make_activity(1, datetime(2024, 1, 1, 8, 0), distance=5000.0),
+        make_activity(2, datetime(2024, 1, 3, 8, 0), distance=10000.0),
+        make_activity(3, datetime(2024, 1, 4, 8, 0), activity_type="Ride", distance=40000.0),
+    ])
+    
+    columns, rows = store.aggregate(datetime(2024, 1, 1), datetime(2024, 2, 1), group_by="type")
+    result = {row[0]: dict(zip(columns, row)) for row in rows}
+    
+    assert result["Run"]["activities"] == 2
+    assert result["Run"]["total_km"] == 15.0
+    assert result["Run"]["max_km"] == 10.0
+    assert result["Ride"]["activities"] == 1
+
+def test_aggregate_by_week_with_filter(tmp_path, make_activity):
+    """Test weekly buckets filtered by activity type."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"))
+    store.upsert([
+        make_activity(1, datetime(2024, 1, 1, 8, 0)),
+        make_activity(2, datetime(2024, 1, 9, 8, 0)),
+        make_activity(3, datetime(2024, 1, 10, 8, 0), activity_type="Ride"),
+    ])
+    
+    columns, rows = store.aggregate(datetime(2024, 1, 1), datetime(2024, 2, 1), group_by="week", activity_type="run")
+    
+    assert columns[:2] == ["week", "activities"]
+    assert [(row[0].isoformat(), row[1]) for row in rows] == [("2024-01-01", 1), ("2024-01-08", 1)]
+
+def test_aggregate_rejects_unknown_grouping(tmp_path):
+    """Test that only whitelisted groupings reach the SQL."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"))
+    with pytest.raises(ValueError):
+        store.aggregate(datetime(2024, 1, 1), datetime(2024, 2, 1), group_by="name; DROP TABLE activities")
+
+def test_aggregate_empty(tmp_path):
+    """Test that an ungrouped aggregate over no activities returns no rows."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"))
+    _, rows = store.aggregate(datetime(2024, 1, 1), datetime(2024, 2, 1), group_by="none")
+    assert rows == []
+
+def test_data_version_changes_only_with_data(tmp_path, make_activity):
+    """Test that the data version is bumped by new or edited activities but not by identical refetches."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"))
+    assert store.data_version() == 0
+    
+    store.upsert([make_activity(1, datetime(2024, 1, 5, 8, 0))])
+    version = store.data_version()
+    assert version > 0
+    
+    store.upsert([make_activity(1, datetime(2024, 1, 5, 8, 0))])
+    assert store.data_version() == version
+    
+    store.upsert([make_activity(1, datetime(2024, 1, 5, 8, 0), name="Renamed")])
+    assert store.data_version() > version
+
+def test_delete(tmp_path, make_activity):
+    """Test that deleting activities bumps the data version and ignores unknown ids."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"))
+    store.upsert([make_activity(1, datetime(2024, 1, 5, 8, 0)), make_activity(2, datetime(2024, 1, 6, 8, 0))])
+    version = store.data_version()
+    
+    assert store.delete([2]) == 1
+    assert store.data_version() == version + 1
+    assert store.delete([2]) == 0
+    assert store.data_version() == version + 1
+    assert [r["id"] for r in store.query_range(datetime(2024, 1, 1), datetime(2024, 2, 1))] == [1]
+
+def test_concurrent_upserts(tmp_path, make_activity):
+    """Test that writers on several threads don't conflict on the data version row."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"))
+    
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        results = list(pool.map(
+            lambda i: store.upsert([make_activity(i, datetime(2024, 1, 1 + i, 8, 0), distance=1000.0 * i)]),
+            range(1, 9),
+        ))
+    
+    assert results == [1] * 8
+    assert store.data_version() == 8
+    assert len(store.query_range(datetime(2024, 1, 1), datetime(2024, 2, 1))) == 8
+
+def test_concurrent_syncs_fetch_once(tmp_path):
+    """Test that syncs started together wait for each other instead of fetching the same windows."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"), sync_interval=60)
+    calls = []
+    
+    async def fetch(after, before):
+        calls.append((after, before))
+        await asyncio.sleep(0.05)
+        return []
+    
+    async def main():
+        await asyncio.gather(*(store.async_sync(fetch, datetime(2024, 1, 1)) for _ in range(3)))
+    
+    asyncio.run(main())
+    
+    assert len(calls) == 1
+    
+    client = MagicMock()
+    client.get_activities.return_value = []
+    later = datetime.now() + timedelta(minutes=5)
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        list(pool.map(lambda _: store.sync(client, datetime(2024, 1, 1), now=later), range(3)))
+    
+    assert client.get_activities.call_count == 1
@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime
+from strava_agent.store import ActivityStore
+from strava_agent.streams import StreamStore, fetch_streams
+
+def _steady(seconds, speed, heartrate, interval=10):
+    """Streams for a constant-pace activity sampled every `interval` seconds."""
+    times = list(range(0, seconds + 1, interval))
+    return {
+        "time": times,
+        "distance": [t * speed for t in times],
+        "heartrate": [heartrate] * len(times),
+        "altitude": [100.0] * len(times),
+        "velocity_smooth": [speed] * len(times),
+    }
+
+def test_put_and_missing(tmp_path):
+    """Test that stored activities are not fetched again."""
+    streams = StreamStore(str(tmp_path / "streams.duckdb"))
+    streams.put(1, _steady(600, 3.0, 150))
+    
+    assert streams.missing([1, 2, 3]) == [2, 3]
+
+def test_best_efforts(tmp_path, make_activity):
+    """Test that the fastest continuous split is found per activity, fastest first."""
+    path = str(tmp_path / "streams.duckdb")
+    ActivityStore(path).upsert([make_activity(1, datetime(2024, 1, 1, 8, 0)), make_activity(2, datetime(2024, 1, 2, 8, 0))])
+    streams = StreamStore(path)
+    streams.put(1, _steady(3600, 2.5, 140))
+    # A second run with a fast middle section
+    fast = _steady(3600, 2.5, 150)
+    fast["distance"] = [t * 2.5 if t < 600 else 1500 + (t - 600) * 5.0 if t < 1600 else 6500 + (t - 1600) * 2.5 for t in fast["time"]]
+    streams.put(2, fast)
+    
+    columns, rows = streams.best_efforts([1, 2], 5000)
+    
+    assert columns == ["id", "name", "date", "seconds", "pace_min_per_km"]
+    assert [r[0] for r in rows] == [2, 1]
+    assert rows[0][3] == 1000
+    assert rows[1][3] == 2000
+
+def test_heart_rate_zones(tmp_path):
+    """Test that time is summed per zone and pauses are capped."""
+    streams = StreamStore(str(tmp_path / "streams.duckdb"))
+    streams.put(1, _steady(600, 3.0, 130))
+    streams.put(2, _steady(300, 3.0, 175))
+    # A 10 minute pause counts for at most max_gap seconds
+    streams.put(3, {"time": [0, 600], "distance": [0, 10], "heartrate": [100, 100]})
+    
+    columns, rows = streams.heart_rate_zones([1, 2, 3], bounds=[0, 123, 153, 169, 184], max_gap=30)
+    
+    assert columns == ["zone", "bpm", "minutes"]
+    assert rows == [("Z1", "0-122", 0.5), ("Z2", "123-152", 10.0), ("Z4", "169-183", 5.0)]
+
+def test_heart_rate_zones_skip_dropouts(tmp_path):
+    """Test that samples without a heart rate are skipped instead of failing the analysis."""
+    streams = StreamStore(str(tmp_path / "streams.duckdb"))
+    activity = _steady(600, 3.0, 130)
+    # The strap drops out for two minutes
+    activity["heartrate"][20:32] = [None] * 12
+    streams.put(1, activity)
+    
+    _, rows = streams.heart_rate_zones([1], bounds=[100, 123, 153, 169, 184], max_gap=30)
+    
+    # The last sample before the dropout counts for max_gap seconds, the dropout itself not at all
+    assert rows == [("Z2", "123-152", 8.3)]
+
+def test_fetch_streams(mock_env_vars, mock_strava_api):
+    """Test that streams are requested keyed by type and returned as data lists."""
+    mock_strava_api.routes["/api/v3/activities/7/streams"] = {
+        "time": {"data": [0, 1]}, "heartrate": {"data": [120, 121]},
+    }
+    
+    assert asyncio.run(fetch_streams(7)) == {"time": [0, 1], "heartrate": [120, 121]}
+    assert mock_strava_api.calls[0].url.params["key_by_type"] == "true"
@@ -0,0 +1,80 @@
+import asyncio
+import duckdb
+import pytest
+from unittest.mock import patch
+from datetime import datetime, timezone
+from strava_agent.store import ActivityStore
+from strava_agent.sync import Backfill, main
+from strava_agent.client import fetch_activities
+
+def _summary(activity_id, start):
+    return {
+        "id": activity_id, "athlete": {"id": 1}, "name": f"Run {activity_id}", "type": "Run", "sport_type": "Run",
+        "start_date": start, "start_date_local": start, "distance": 5000.0, "moving_time": 1500,
+        "elapsed_time": 1600, "total_elevation_gain": 10.0, "average_speed": 3.3, "max_speed": 5.0,
+    }
+
+def test_plan_windows(tmp_path):
+    """Test that the history is split into fixed windows, newest (open-ended) first."""
+    backfill = Backfill(ActivityStore(str(tmp_path / "store.duckdb")), window_days=30)
+    windows = backfill.plan(datetime(2024, 1, 1), datetime(2024, 3, 15))
+    
+    assert windows == [
+        (datetime(2024, 3, 1), None),
+        (datetime(2024, 1, 31), datetime(2024, 3, 1)),
+        (datetime(2024, 1, 1), datetime(2024, 1, 31)),
+    ]
+
+def test_backfill_loads_and_resumes(tmp_path, mock_env_vars, mock_strava_api):
+    """Test that windows are loaded into the store and finished ones are skipped on the next run."""
+    activities = [_summary(1, "2024-01-10T08:00:00Z"), _summary(2, "2024-02-10T08:00:00Z")]
+    
+    def _list(request):
+        after, before = int(request.url.params["after"]), int(request.url.params.get("before", 2 ** 62))
+        if request.url.params["page"] != "1":
+            return []
+        return [a for a in activities
+                if after < datetime.strptime(a["start_date"], "%Y-%m-%dT%H:%M:%SZ").replace(tzinfo=timezone.utc).timestamp() < before]
+    
+    mock_strava_api.routes["/api/v3/athlete/activities"] = _list
+    store = ActivityStore(str(tmp_path / "store.duckdb"))
+    backfill = Backfill(store, window_days=30, concurrency=2)
+    now = datetime(2024, 3, 15)
+    
+    first = asyncio.run(backfill.run(datetime(2024, 1, 1), fetch=fetch_activities, now=now))
+    
+    assert first["written"] == 2 and first["failed"] == 0
+    assert [r["id"] for r in store.query_range(datetime(2024, 1, 1), datetime(2024, 3, 1))] == [1, 2]
+    assert store.coverage()[0] == datetime(2024, 1, 2)
+    
+    calls = len(mock_strava_api.calls)
+    second = asyncio.run(backfill.run(datetime(2024, 1, 1), fetch=fetch_activities, now=now))
+    
+    # Only the open-ended newest window is fetched again
+    assert second["skipped"] == 2 and second["fetched"] == 1
+    assert len(mock_strava_api.calls) == calls + 1
+
+def test_backfill_failed_window_is_retried(tmp_path):
+    """Test that a failed window is not marked done and coverage is not extended."""
+    store = ActivityStore(str(tmp_path / "store.duckdb"))
+    backfill = Backfill(store, window_days=30)
+    
+    async def fetch(after, before):
+        if before is None:
+            raise RuntimeError("boom")
+        return []
+    
+    result = asyncio.run(backfill.run(datetime(2024, 1, 1), fetch=fetch, now=datetime(2024, 2, 15)))
+    
+    assert result["failed"] == 1 and result["errors"] == ["boom"]
+    assert store.coverage() is None
+    assert backfill.completed() == {(datetime(2024, 1, 1), datetime(2024, 1, 31))}
+
+def test_cli_reports_locked_database(mock_env_vars, capsys):
+    """Test that the CLI explains the DuckDB lock held by a running app instead of crashing."""
+    with patch("strava_agent.sync.get_store", side_effect=duckdb.IOException("Conflicting lock is held")):
+        with pytest.raises(SystemExit) as exit_info:
+            main([])
+    
+    assert exit_info.value.code == 1
+    assert "Stop the app" in capsys.readouterr().out
@@ -0,0 +1,47 @@
+import duckdb
+from langchain_core.messages import AIMessage
+from strava_agent.telemetry import span, record_http, traced_node, get_span_recorder
+
+def test_span_nesting_and_http_counts(mock_env_vars):
+    """Test that HTTP calls are counted on the current span and its ancestors."""
+    with span("node", "tools", thread_id="t1") as node:
+        with span("tool", "get_activities_in_range") as tool:
+            record_http(0.25)
+            record_http(0.25)
+        record_http(0.1)
+    
+    assert tool.parent is node
+    assert tool.thread_id == "t1"
+    assert tool.http_calls == 2 and node.http_calls == 3
+    assert round(node.http_ms) == 600
+
+def test_traced_node_records_tokens_and_payload(mock_env_vars, monkeypatch):
+    """Test that a wrapped node is written to the spans table with its token counts."""
+    monkeypatch.setenv("SPANS_ENABLED", "1")
+    def node(state):
+        message = AIMessage(content="hello", usage_metadata={"input_tokens": 12, "output_tokens": 3, "total_tokens": 15})
+        return {"messages": [message]}
+    
+    traced_node("agent", node).invoke({"messages": []}, {"configurable": {"thread_id": "t1"}})
+    recorder = get_span_recorder()
+    recorder.flush()
+    
+    with duckdb.connect(recorder.db_path) as con:
+        row = con.execute("SELECT kind, name, thread_id, input_tokens, output_tokens, payload_bytes FROM spans").fetchone()
+    assert row == ("node", "agent", "t1", 12, 3, 5)
+    
+    text = recorder.metrics_text()
+    assert 'strava_agent_span_seconds_count{kind="node",name="agent"} 1' in text
+    assert 'strava_agent_tokens_total{kind="node",name="agent",direction="input"} 12' in text
+
+def test_span_records_errors(mock_env_vars):
+    try:
+        with span("tool", "broken") as failed:
+            raise ValueError("boom")
+    except ValueError:
+        pass
+    assert failed.error == "ValueError"
+
+def test_spans_disabled(mock_env_vars, monkeypatch):
+    monkeypatch.setenv("SPANS_ENABLED", "0")
+    assert get_span_recorder() is None
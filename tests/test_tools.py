@@ -1,8 +1,10 @@
 import pytest
 import json
 import asyncio
+from datetime import datetime, timedelta
+from types import SimpleNamespace
 from unittest.mock import MagicMock
-from strava_agent.tools import get_athlete_stats, get_activities_in_range, get_activity_information
+from strava_agent.tools import get_athlete_stats, get_activities_in_range, get_activity_information, get_activities_details, aggregate_activities, get_top_activities, analyze_streams, get_personal_records, get_training_trends
 
 def test_get_athlete_stats(mock_env_vars, mock_strava_client):
     """Test fetching athlete stats."""
@@ -19,15 +21,10 @@ def test_get_athlete_stats(mock_env_vars, mock_strava_client):
     assert "Biggest Ride: 120.0km" in result
     assert "All-time Run Distance: 50.0km" in result
 
-def test_get_activities_in_range(mock_env_vars, mock_strava_client):
+def test_get_activities_in_range(mock_env_vars, mock_strava_client, make_activity):
     """Test fetching activities in a date range."""
     # Setup mock activity
-    mock_activity = MagicMock()
-    mock_activity.id = 123
-    mock_activity.name = "Morning Run"
-    mock_activity.type = "Run"
-    mock_activity.distance = 5000.0
-    mock_activity.start_date_local.isoformat.return_value = "2023-01-01T10:00:00"
+    mock_activity = make_activity(123, datetime(2023, 1, 1, 10, 0), name="Morning Run")
     
     mock_strava_client.get_activities.return_value = [mock_activity]
     
@@ -40,6 +37,19 @@ def test_get_activities_in_range(mock_env_vars, mock_strava_client):
     assert data["name"] == "Morning Run"
     assert data["id"] == 123
     assert data["distance_km"] == 5.0
+    assert data["type"] == "Run"
+    assert data["start_date"] == "2023-01-01T10:00:00"
+
+def test_get_activities_in_range_uses_local_store(mock_env_vars, mock_strava_client, make_activity):
+    """Test that a repeated range query is answered from the local store."""
+    mock_strava_client.get_activities.return_value = [make_activity(123, datetime(2023, 1, 1, 10, 0))]
+    
+    first = get_activities_in_range.invoke({"start_date": "2023-01-01", "end_date": "2023-01-02"})
+    second = get_activities_in_range.invoke({"start_date": "2023-01-01", "end_date": "2023-01-02"})
+    
+    assert first == second
+    # The second call is within the sync interval and inside the synced window
+    assert mock_strava_client.get_activities.call_count == 1
 
 def test_get_activities_in_range_empty(mock_env_vars, mock_strava_client):
     """Test fetching activities when none exist."""
@@ -71,4 +81,195 @@ def test_get_activity_information(mock_env_vars, mock_strava_client):
     assert data["id"] == 456
     assert data["name"] == "Long Ride"
     assert data["elapsed_time_sec"] == 3600
-    assert data["average_speed_kmh"] == 36.0 # 10 m/s * 3.6
\ No newline at end of file
+    assert data["average_speed_kmh"] == 36.0 # 10 m/s * 3.6
+
+def test_get_activity_information_cached(mock_env_vars, mock_strava_client):
+    """Test that repeated lookups of the same activity are served from the cache."""
+    mock_activity = MagicMock()
+    mock_activity.id = 789
+    mock_activity.name = "Tempo"
+    mock_activity.type = "Run"
+    mock_activity.distance = 10000.0
+    mock_activity.start_date_local.isoformat.return_value = "2023-01-01T10:00:00"
+    mock_activity.elapsed_time = 2400
+    mock_activity.average_speed = 4.0
+    mock_strava_client.get_activity.return_value = mock_activity
+
+    first = asyncio.run(get_activity_information.ainvoke({"activity_id": 789}))
+    second = asyncio.run(get_activity_information.ainvoke({"activity_id": 789}))
+
+    assert first == second
+    assert mock_strava_client.get_activity.call_count == 1
+
+def test_get_activities_details(mock_env_vars, mock_strava_client):
+    """Test that the batch tool returns one JSON line per id and serves cached ids without a request."""
+    def _activity(activity_id):
+        activity = MagicMock()
+        activity.id = activity_id
+        activity.name = f"Run {activity_id}"
+        activity.type = "Run"
+        activity.distance = 5000.0
+        activity.start_date_local.isoformat.return_value = "2023-01-01T10:00:00"
+        activity.elapsed_time = 1500
+        activity.average_speed = 3.5
+        return activity
+
+    mock_strava_client.get_activity.side_effect = _activity
+
+    asyncio.run(get_activities_details.ainvoke({"activity_ids": [1]}))
+    result = asyncio.run(get_activities_details.ainvoke({"activity_ids": [2, 1, 3, 2]}))
+
+    lines = [json.loads(line) for line in result.split("\n")]
+    assert [line["id"] for line in lines] == [2, 1, 3]
+    # Activity 1 came from the cache on the second call
+    assert mock_strava_client.get_activity.call_count == 3
+
+def test_get_activities_details_partial_error(mock_env_vars, mock_strava_client):
+    """Test that one failing id does not fail the whole batch."""
+    mock_strava_client.get_activity.side_effect = Exception("Not Found")
+    result = asyncio.run(get_activities_details.ainvoke({"activity_ids": [5]}))
+    assert json.loads(result) == {"id": 5, "error": "Not Found"}
+
+def test_get_athlete_stats_reuses_athlete_id(mock_env_vars, mock_strava_client):
+    """Test that repeated stats calls only look up the athlete once."""
+    mock_stats = MagicMock()
+    mock_stats.biggest_ride_distance = 1000.0
+    mock_stats.all_run_totals.distance = 1000.0
+    mock_strava_client.get_athlete_stats.return_value = mock_stats
+    
+    get_athlete_stats.invoke({})
+    get_athlete_stats.invoke({})
+    
+    assert mock_strava_client.get_athlete.call_count == 1
+    assert mock_strava_client.get_athlete_stats.call_count == 2
+
+def test_aggregate_activities(mock_env_vars, mock_strava_client, make_activity):
+    """Test that the aggregate tool returns a small table instead of one line per activity."""
+    mock_strava_client.get_activities.return_value = [
+        make_activity(i, datetime(2023, 1, 1 + i, 10, 0)) for i in range(10)
+    ]
+    
+    result = aggregate_activities.invoke({"start_date": "2023-01-01", "end_date": "2023-02-01"})
+    lines = result.split("\n")
+    
+    assert len(lines) == 2
+    assert lines[0].startswith("type | activities | total_km")
+    assert lines[1].startswith("Run | 10 | 50.0")
+
+def test_get_top_activities(mock_env_vars, mock_strava_client, make_activity):
+    """Test that only the longest few activities of the period are returned, not the whole list."""
+    mock_strava_client.get_activities.return_value = [
+        make_activity(i, datetime(2023, 1, 1, 10, 0) + timedelta(days=i), name=f"Run {i}", distance=5000.0 + i * 100)
+        for i in range(60)
+    ] + [make_activity(100, datetime(2023, 1, 10, 18, 0), activity_type="Ride", distance=90000.0)]
+    args = {"start_date": "2023-01-01", "end_date": "2023-04-01"}
+    
+    result = get_top_activities.invoke({**args, "activity_type": "Run"})
+    listing = get_activities_in_range.invoke(args)
+    lines = result.split("\n")
+    
+    assert lines[0] == "id | name | type | date | km | moving_hours | elevation_m | pace_min_per_km"
+    assert [line.split(" | ")[0] for line in lines[1:]] == ["59", "58", "57"]
+    assert lines[1].startswith("59 | Run 59 | Run | 2023-03-01 | 10.9")
+    assert len(result) * 10 < len(listing)
+
+def test_get_training_trends(mock_env_vars, mock_strava_client, make_activity):
+    """Test that trends come from the weekly rollups, one row per week."""
+    mock_strava_client.get_activities.return_value = [
+        make_activity(i, datetime(2023, 1, 2 + i, 10, 0)) for i in range(10)
+    ]
+    
+    result = get_training_trends.invoke({"start_date": "2023-01-01", "end_date": "2023-02-01", "period": "week"})
+    lines = result.split("\n")
+    
+    assert lines[0].startswith("week | starts | activities | total_km")
+    assert lines[1].startswith("2023-W01 | 2023-01-02 | 7 | 35.0")
+    assert lines[2].startswith("2023-W02 | 2023-01-09 | 3 | 15.0")
+
+def _activity_json(activity_id, day):
+    return {
+        "id": activity_id, "name": f"Run {activity_id}", "type": "Run", "sport_type": "Run",
+        "distance": 5000.0, "moving_time": 1500, "elapsed_time": 1600,
+        "start_date": f"2023-01-{day:02d}T10:00:00Z", "start_date_local": f"2023-01-{day:02d}T10:00:00Z",
+    }
+
+def test_get_athlete_stats_async(mock_env_vars, mock_strava_api):
+    """Test the non-blocking athlete stats path."""
+    mock_strava_api.routes["/api/v3/athlete"] = {"id": 42}
+    mock_strava_api.routes["/api/v3/athletes/42/stats"] = {
+        "biggest_ride_distance": 120000.0, "all_run_totals": {"distance": 50000.0},
+    }
+    
+    result = asyncio.run(get_athlete_stats.ainvoke({}))
+    
+    assert "Biggest Ride: 120.0km" in result
+    assert "All-time Run Distance: 50.0km" in result
+
+def test_get_activities_in_range_async_prefetches_pages(mock_env_vars, mock_strava_api):
+    """Test that the async path pages concurrently and stops at the first short page."""
+    activities = [_activity_json(i, 1 + i % 28) for i in range(250)]
+    
+    def _page(request):
+        page = int(request.url.params["page"])
+        per_page = int(request.url.params["per_page"])
+        return activities[(page - 1) * per_page:page * per_page]
+    
+    mock_strava_api.routes["/api/v3/athlete/activities"] = _page
+    
+    result = asyncio.run(get_activities_in_range.ainvoke({"start_date": "2023-01-01", "end_date": "2023-02-01"}))
+    
+    assert len(result.split("\n")) == 250
+    # Page 1 alone, then one prefetch wave of pages 2-5
+    pages = sorted(int(r.url.params["page"]) for r in mock_strava_api.calls)
+    assert pages == [1, 2, 3, 4, 5]
+
+def test_get_activities_in_range_async_single_page(mock_env_vars, mock_strava_api):
+    """Test that a short range costs a single request."""
+    mock_strava_api.routes["/api/v3/athlete/activities"] = [_activity_json(1, 1)]
+    
+    result = asyncio.run(get_activities_in_range.ainvoke({"start_date": "2023-01-01", "end_date": "2023-01-02"}))
+    
+    assert json.loads(result)["id"] == 1
+    assert len(mock_strava_api.calls) == 1
+
+def test_aggregate_activities_async(mock_env_vars, mock_strava_api):
+    """Test the non-blocking aggregate path."""
+    mock_strava_api.routes["/api/v3/athlete/activities"] = [_activity_json(1, 1), _activity_json(2, 2)]
+    
+    result = asyncio.run(aggregate_activities.ainvoke({"start_date": "2023-01-01", "end_date": "2023-02-01"}))
+    
+    assert result.split("\n")[1].startswith("Run | 2 | 10.0")
+
+def test_analyze_streams_best_effort(mock_env_vars, mock_strava_client, make_activity):
+    """Test that streams are fetched once per activity and only the analysis is returned."""
+    mock_strava_client.get_activities.return_value = [make_activity(1, datetime(2024, 1, 5, 8, 0), distance=6000.0)]
+    times = list(range(0, 2401, 10))
+    mock_strava_client.get_activity_streams.return_value = {
+        "time": SimpleNamespace(data=times),
+        "distance": SimpleNamespace(data=[t * 2.5 for t in times]),
+    }
+    
+    args = {"start_date": "2024-01-01", "end_date": "2024-02-01", "analysis": "best_effort", "distance_km": 5.0}
+    first = analyze_streams.invoke(args)
+    second = analyze_streams.invoke(args)
+    
+    assert first == second
+    assert first.splitlines()[0] == "id | name | date | seconds | pace_min_per_km"
+    assert first.splitlines()[1].startswith("1 | Run 1 | 2024-01-05 | 2000 | 6.67")
+    assert mock_strava_client.get_activity_streams.call_count == 1
+
+def test_analyze_streams_rejects_unknown_analysis(mock_env_vars):
+    result = analyze_streams.invoke({"start_date": "2024-01-01", "end_date": "2024-02-01", "analysis": "vo2max"})
+    assert result.startswith("Error: analysis must be one of")
+
+def test_get_personal_records(mock_env_vars, mock_strava_client, make_activity):
+    """Test that records are a single lookup with readable values."""
+    mock_strava_client.get_activities.return_value = [
+        make_activity(1, datetime(2024, 1, 5, 8, 0), distance=10000.0, moving_time=2700, name="Race"),
+    ]
+    get_activities_in_range.invoke({"start_date": "2024-01-01", "end_date": "2024-02-01"})
+    
+    result = get_personal_records.invoke({"activity_type": "Run", "record": "fastest_10k"})
+    
+    assert "Run | fastest_10k | 0:45:00 | 1 | Race | 2024-01-05" in result
+    assert "Records cover activities since" in result
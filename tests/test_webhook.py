@@ -0,0 +1,149 @@
+import json
+import pytest
+import urllib.request
+import urllib.error
+from datetime import datetime
+from stravalib.exc import ObjectNotFound
+from strava_agent.cache import ActivityCache, AnswerCache
+from strava_agent.store import ActivityStore
+from strava_agent.streams import StreamStore
+from strava_agent.webhook import WebhookProcessor, WebhookServer
+
+def _event(activity_id, aspect, owner_id=1, subscription_id=99, **updates):
+    return {
+        "object_type": "activity", "object_id": activity_id, "aspect_type": aspect,
+        "updates": updates, "owner_id": owner_id, "subscription_id": subscription_id, "event_time": 1704100000,
+    }
+
+def _processor(path, remote, fetched=None):
+    """A processor for subscription 99 and athlete 1 whose refetches are served from `remote` (404 when absent)."""
+    def fetch(activity_id):
+        if fetched is not None:
+            fetched.append(activity_id)
+        if activity_id not in remote:
+            raise ObjectNotFound("Record Not Found")
+        return remote[activity_id]
+    
+    return WebhookProcessor(
+        store=ActivityStore(path), activity_cache=ActivityCache(path), stream_store=StreamStore(path),
+        fetch=fetch, subscription_id=99, owner_id=1,
+    )
+
+def _replay(url, events):
+    """Post recorded push events to a running endpoint, as Strava would."""
+    statuses = []
+    for event in events:
+        request = urllib.request.Request(
+            url, data=json.dumps(event).encode(), headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request) as response:
+            statuses.append(response.status)
+    return statuses
+
+@pytest.fixture
+def webhook(tmp_path):
+    """A webhook endpoint on a free port whose refetches are served from `remote`."""
+    remote = {}
+    processor = _processor(str(tmp_path / "webhook.duckdb"), remote)
+    with WebhookServer(processor, host="127.0.0.1", verify_token="secret") as server:
+        yield server, processor, remote
+
+def test_replayed_events_update_store_and_caches(webhook, make_activity):
+    """Test that create, update and delete events refetch single activities and invalidate what depends on them."""
+    server, processor, remote = webhook
+    store = processor.store
+    answers = AnswerCache(store.db_path)
+    remote[1] = make_activity(1, datetime(2024, 1, 1, 8, 0), distance=10000.0)
+    remote[2] = make_activity(2, datetime(2024, 1, 2, 8, 0), distance=20000.0)
+    
+    assert _replay(server.url, [_event(1, "create"), _event(2, "create")]) == [200, 200]
+    processor.join()
+    
+    assert [r["id"] for r in store.query_range(datetime(2024, 1, 1), datetime(2024, 2, 1))] == [1, 2]
+    _, records = store.personal_records("Run", "longest_distance")
+    assert records[0][3] == 2
+    
+    version = store.data_version()
+    answers.put("How far did I run in January 2024?", version, "30 km")
+    processor.activity_cache.put(2, {"id": 2})
+    processor.stream_store.put(2, {"time": [0, 5], "distance": [0.0, 20.0]})
+    
+    remote[1] = make_activity(1, datetime(2024, 1, 1, 8, 0), distance=10000.0, name="Renamed")
+    del remote[2]
+    # A forged delete from outside the subscription is answered but never applied
+    _replay(server.url, [_event(1, "update", title="Renamed"), _event(2, "delete"), _event(1, "delete", subscription_id=1)])
+    processor.join()
+    
+    rows = store.query_range(datetime(2024, 1, 1), datetime(2024, 2, 1))
+    assert [(r["id"], r["name"]) for r in rows] == [(1, "Renamed")]
+    _, records = store.personal_records("Run", "longest_distance")
+    assert records[0][3] == 1
+    _, weeks = store.rollups("week", datetime(2024, 1, 1), datetime(2024, 2, 1))
+    assert [w[3] for w in weeks] == [10.0]
+    assert store.data_version() > version
+    assert answers.get("How far did I run in January 2024?", store.data_version()) is None
+    assert processor.activity_cache.get(2) is None
+    assert processor.stream_store.missing([2]) == [2]
+    assert processor.stats() == {"processed": 4, "failed": 0, "rejected": 1, "pending": 0}
+
+def test_events_for_one_activity_are_coalesced(tmp_path, make_activity):
+    """Test that repeated events queued before processing cost one refetch each, and a delete wins."""
+    fetched = []
+    remote = {1: make_activity(1, datetime(2024, 1, 1, 8, 0))}
+    processor = _processor(str(tmp_path / "webhook.duckdb"), remote, fetched)
+    
+    for event in [_event(1, "create"), _event(1, "update"), _event(2, "create"), _event(2, "delete")]:
+        processor.submit(event)
+    processor.start().join()
+    
+    assert fetched == [1, 2]
+    assert processor.stats()["processed"] == 2
+
+def test_foreign_events_are_rejected(tmp_path, make_activity):
+    """Test that events from another subscription or for another athlete are never applied."""
+    fetched = []
+    processor = _processor(str(tmp_path / "webhook.duckdb"), {}, fetched)
+    processor.store.upsert([make_activity(1, datetime(2024, 1, 1, 8, 0))])
+    
+    assert processor.submit(_event(1, "delete", subscription_id=12345)) is False
+    assert processor.submit(_event(1, "delete", owner_id=2)) is False
+    assert processor.submit(_event(7, "create", subscription_id=None)) is False
+    processor.start().join()
+    
+    assert fetched == []
+    assert processor.stats()["rejected"] == 3
+    assert len(processor.store.query_range(datetime(2024, 1, 1), datetime(2024, 2, 1))) == 1
+
+def test_unconfirmed_delete_keeps_the_activity(tmp_path, make_activity):
+    """Test that a delete for an activity Strava still returns refreshes it instead of removing it."""
+    activity = make_activity(1, datetime(2024, 1, 1, 8, 0))
+    processor = _processor(str(tmp_path / "webhook.duckdb"), {1: activity})
+    processor.store.upsert([activity])
+    
+    processor.submit(_event(1, "delete"))
+    processor.start().join()
+    
+    assert [r["id"] for r in processor.store.query_range(datetime(2024, 1, 1), datetime(2024, 2, 1))] == [1]
+
+def test_ignored_and_failed_events(tmp_path):
+    """Test that athlete events are ignored and a failed refetch is recorded without stopping the worker."""
+    processor = _processor(str(tmp_path / "webhook.duckdb"), {})
+    
+    assert processor.submit({"object_type": "athlete", "object_id": 1, "aspect_type": "update", "owner_id": 1,
+                             "subscription_id": 99, "updates": {"authorized": "false"}}) is False
+    assert processor.submit(_event(5, "create")) is True
+    processor.start().join()
+    
+    assert processor.stats() == {"processed": 0, "failed": 1, "rejected": 0, "pending": 0}
+    assert "Record Not Found" in processor.errors[0]
+
+def test_subscription_handshake(webhook):
+    """Test that the challenge is echoed only for the configured verify token."""
+    server, _, _ = webhook
+    query = "?hub.mode=subscribe&hub.challenge=abc123&hub.verify_token="
+    
+    with urllib.request.urlopen(server.url + query + "secret") as response:
+        assert json.loads(response.read()) == {"hub.challenge": "abc123"}
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(server.url + query + "wrong")
+    assert error.value.code == 403